@@ -1,31 +1,56 @@
 import os
 import sys
-import django
-from django.core.management import call_command
-from django.core.wsgi import get_wsgi_application
-from waitress import serve
+import time
 
 def start_server():
+    boot_started_at = time.perf_counter()
+
     # 1. Configura o path para garantir que o Python ache seus módulos
     path = os.path.dirname(__file__)
     if path not in sys.path:
         sys.path.append(path)
 
+    from config import boot
+    timer = boot.BootTimer(started_at=boot_started_at)
+
+    # GUILDA_BOOT_PROFILE=1 logs an import-time tree of the cold start
+    profiler = None
+    if os.environ.get('GUILDA_BOOT_PROFILE') == '1':
+        profiler = boot.ImportProfiler()
+        profiler.install()
+
     # 2. Aponta para o settings do seu projeto
     # IMPORTANTE: Verifique se a pasta 'config' é mesmo onde está seu settings.py
     os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
-    # 3. Setup Django and run migrations
-    django.setup()
-    try:
-        call_command('migrate')
-    except Exception as e:
-        print(f"Error running migrations: {e}")
+    # 3. Setup Django and run migrations (skipped when nothing changed, see config/boot.py)
+    with timer.phase('django.setup'):
+        import django
+        django.setup()
+
+    from django.conf import settings
+    boot.migrate_for_boot(settings.BOOT_MODE, timer)
 
     # 4. Inicia a aplicação WSGI
-    application = get_wsgi_application()
+    # DRF, the admin and the views are only imported after the first page (config/lazy_urls.py)
+    if settings.BOOT_LAZY_URLS:
+        from config import lazy_urls
+        lazy_urls.enable_deferral()
+
+    with timer.phase('wsgi'):
+        from django.core.wsgi import get_wsgi_application
+        application = boot.BootApplication(
+            get_wsgi_application(), timer,
+            after_first_byte=lambda: boot.warm_up(timer, profiler),
+        )
 
     print("--- INICIANDO SERVIDOR DJANGO NO ANDROID ---")
 
     # 5. Roda o servidor bloqueando a thread (o Kotlin cuida de rodar isso em background)
-    serve(application, host='0.0.0.0', port=8000)
\ No newline at end of file
+    # Threads, connection limits and buffers of SERVING_PROFILE (config/serving.py),
+    # over TCP or a Unix socket (SERVING_TRANSPORT, config/transport.py)
+    from config import transport
+    from config.serving import server_options
+    options = server_options()
+    boot.logger.info("Serving profile %s over %s: %s", settings.SERVING_PROFILE, settings.SERVING_TRANSPORT, options)
+    transport.serve(application, options)
@@ -0,0 +1,69 @@
+"""
+Reproducible benchmarks for the app, run from app/src/main/python:
+
+    python -m benchmarks.<name> --help
+
+Each benchmark works on its own temporary SQLite database (GUILDA_DB_PATH),
+never on the app database.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+PYTHON_ROOT = Path(__file__).resolve().parent.parent
+
+
+def limit_cpu(cpus):
+    """
+    Pins the current process to ``cpus`` cores to approximate a phone.
+    Only Linux supports affinity; elsewhere this is a no-op.
+    """
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        available = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, set(available[:cpus]))
+
+
+def temporary_database():
+    """Returns (tempdir, db_path) for a throwaway database."""
+    tmp = tempfile.TemporaryDirectory(prefix='guilda-bench-')
+    return tmp, Path(tmp.name) / 'db.sqlite3'
+
+
+def child_env(db_path, **extra):
+    env = dict(os.environ)
+    env['DJANGO_SETTINGS_MODULE'] = 'config.settings'
+    env['GUILDA_DB_PATH'] = str(db_path)
+    env['PYTHONPATH'] = str(PYTHON_ROOT)
+    env.update({key: str(value) for key, value in extra.items()})
+    return env
+
+
+def run_child(module, args, db_path, **extra_env):
+    """Runs ``python -m module args`` against the benchmark database."""
+    return subprocess.run(
+        [sys.executable, '-m', module, *args],
+        cwd=PYTHON_ROOT, env=child_env(db_path, **extra_env),
+        check=True, capture_output=True, text=True,
+    ).stdout
+
+
+def setup_django(db_path):
+    """Configures Django in this process against the benchmark database."""
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'config.settings'
+    os.environ['GUILDA_DB_PATH'] = str(db_path)
+    if str(PYTHON_ROOT) not in sys.path:
+        sys.path.insert(0, str(PYTHON_ROOT))
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
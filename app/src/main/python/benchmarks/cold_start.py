@@ -0,0 +1,107 @@
+"""
+Cold-start benchmark: time to serve the first page (GET / then /sede/) in a
+fresh interpreter, with every view/DRF/admin module imported up front
+("eager", the previous behaviour) versus lazy URL resolution ("lazy").
+
+    python -m benchmarks.cold_start --runs 10 --cpus 1
+
+--cpus pins every run to that many cores to approximate a phone.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from wsgiref.util import setup_testing_defaults
+from benchmarks import limit_cpu, run_child, setup_django, temporary_database
+
+MODES = ('eager', 'lazy')
+
+
+def request(application, path):
+    environ = {'PATH_INFO': path, 'REQUEST_METHOD': 'GET'}
+    setup_testing_defaults(environ)
+    statuses = []
+    body = b''.join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+    return statuses[0], body
+
+
+def measure(mode):
+    """Runs in the child interpreter; prints the timings as JSON."""
+    started_at = time.perf_counter()
+    timings = {}
+
+    import django
+    django.setup()
+    timings['django.setup'] = time.perf_counter() - started_at
+
+    from config import lazy_urls
+    if mode == 'lazy':
+        lazy_urls.enable_deferral()
+    else:
+        lazy_urls.warm_up()
+    timings['imports'] = time.perf_counter() - started_at - timings['django.setup']
+
+    from django.core.wsgi import get_wsgi_application
+    application = get_wsgi_application()
+
+    status, _ = request(application, '/')
+    timings['first-byte /'] = time.perf_counter() - started_at
+    status, _ = request(application, '/sede/')
+    timings['first-byte /sede/'] = time.perf_counter() - started_at
+    assert status.startswith('200'), status
+
+    timings['modules'] = len(sys.modules)
+    timings['rest_framework loaded'] = 'rest_framework.viewsets' in sys.modules
+    print(json.dumps(timings))
+
+
+def prepare(db_path):
+    setup_django(db_path)
+    from guilda_manager.models import Guild
+    Guild.objects.create(name="Guilda de Benchmark")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--cpus', type=int, default=1)
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--prepare', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    limit_cpu(args.cpus)
+
+    if args.prepare:
+        import os
+        return prepare(os.environ['GUILDA_DB_PATH'])
+    if args.child:
+        return measure(args.child)
+
+    tmp, db_path = temporary_database()
+    with tmp:
+        run_child('benchmarks.cold_start', ['--prepare', '--cpus', str(args.cpus)], db_path)
+
+        results = {mode: [] for mode in MODES}
+        for _ in range(args.runs):
+            # Interleave modes so that machine noise affects both equally
+            for mode in MODES:
+                out = run_child('benchmarks.cold_start', ['--child', mode, '--cpus', str(args.cpus)], db_path)
+                results[mode].append(json.loads(out))
+
+    print(f"Cold start, {args.runs} runs per mode, pinned to {args.cpus} CPU(s). Median ms:")
+    keys = ['django.setup', 'imports', 'first-byte /', 'first-byte /sede/']
+    print(f"{'mode':<8}" + ''.join(f"{key:>20}" for key in keys) + f"{'modules':>10}")
+    medians = {}
+    for mode in MODES:
+        medians[mode] = {key: statistics.median(run[key] for run in results[mode]) * 1000 for key in keys}
+        modules = statistics.median(run['modules'] for run in results[mode])
+        print(f"{mode:<8}" + ''.join(f"{medians[mode][key]:>20.1f}" for key in keys) + f"{modules:>10.0f}")
+
+    delta = medians['eager']['first-byte /sede/'] - medians['lazy']['first-byte /sede/']
+    print(f"Lazy URL resolution serves the first page {delta:.1f}ms sooner "
+          f"({delta / medians['eager']['first-byte /sede/'] * 100:.0f}%).")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Dispatch resolution throughput: resolving N due dispatches one by one through
+Dispatch.resolve() (one transaction each, what the Mestre "resolve" button
+does) versus DispatchResolver.resolve_due() (one batch, one transaction).
+
+    python -m benchmarks.dispatch_resolution --dispatches 10000 --cpus 1
+
+Each mode runs in its own interpreter on its own fresh database, seeded with
+the same guilds, squads, members and dispatches.
+"""
+import argparse
+import json
+import random
+import time
+from benchmarks import limit_cpu, run_child, setup_django, temporary_database
+
+MODES = ('one-by-one', 'batch')
+
+
+def populate(dispatches, guilds, seed):
+    from django.utils import timezone
+    from guilda_manager.models import Building, Dispatch, Guild, GuildBuilding, Member, Quest, Squad, SquadRank
+
+    rng = random.Random(seed)
+    past = timezone.now() - timezone.timedelta(days=30)
+    ranks = [
+        SquadRank.objects.create(name=name, order=order, missions_required=order * 50)
+        for order, name in enumerate('FEDCBAS')
+    ]
+    war_room = Building.objects.create(name='Sala de Guerra', slug='sala-de-guerra', description='', cost=0)
+
+    squads, missions = [], []
+    for g in range(guilds):
+        guild = Guild.objects.create(name=f"Guilda {g}", level=5, dice_seed=seed * 1000 + g)
+        if g % 2:
+            GuildBuilding.objects.create(guild=guild, building=war_room)
+        for s in range(10):
+            squad = Squad.objects.create(name=f"Esquadrão {g}-{s}", guild=guild, rank=ranks[0])
+            Member.objects.bulk_create([
+                Member(name=f"Membro {g}-{s}-{m}", guild=guild, squad=squad) for m in range(6)
+            ])
+            squads.append(squad)
+        Member.objects.bulk_create([Member(name=f"NPC {g}-{m}", guild=guild) for m in range(100)])
+        missions.extend(Quest.objects.bulk_create([
+            Quest(title=f"Missão {g}-{m}", description='', rank='E', guild=guild, gold_reward=50, gxp_reward=5)
+            for m in range(50)
+        ]))
+
+    rows = []
+    for i in range(dispatches):
+        if rng.random() < 0.7:
+            rows.append(Dispatch(squad=rng.choice(squads), rank='F', start_date=past, target_date=past))
+        else:
+            rows.append(Dispatch(mission=rng.choice(missions), npc_count=3, start_date=past, target_date=past))
+    Dispatch.objects.bulk_create(rows, batch_size=500)
+
+
+def measure(mode, dispatches, guilds, seed):
+    """Runs in the child interpreter; prints the timings as JSON."""
+    import os
+    setup_django(os.environ['GUILDA_DB_PATH'])
+    populate(dispatches, guilds, seed)
+
+    from django.db import connection
+    from guilda_manager.models import Dispatch
+    from guilda_manager.resolution import DispatchResolver
+
+    queries = []
+
+    def count_query(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count_query):
+        started_at = time.perf_counter()
+        if mode == 'batch':
+            resolved = DispatchResolver().resolve_due()['resolved']
+        else:
+            resolved = 0
+            due = DispatchResolver.due_dispatches().select_related('squad__guild', 'squad__rank', 'mission__guild')
+            for dispatch in due:
+                resolved += dispatch.resolve() is not None
+        elapsed = time.perf_counter() - started_at
+
+    assert not Dispatch.objects.filter(status=Dispatch.Status.PENDING).exists()
+    print(json.dumps({'resolved': resolved, 'seconds': elapsed, 'queries': len(queries)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dispatches', type=int, default=10000)
+    parser.add_argument('--guilds', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--cpus', type=int, default=1)
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    limit_cpu(args.cpus)
+
+    if args.child:
+        return measure(args.child, args.dispatches, args.guilds, args.seed)
+
+    child_args = ['--dispatches', str(args.dispatches), '--guilds', str(args.guilds),
+                  '--seed', str(args.seed), '--cpus', str(args.cpus)]
+    results = {}
+    for mode in MODES:
+        tmp, db_path = temporary_database()
+        with tmp:
+            out = run_child('benchmarks.dispatch_resolution', ['--child', mode, *child_args], db_path)
+        results[mode] = json.loads(out)
+
+    print(f"{args.dispatches} due dispatches over {args.guilds} guilds, pinned to {args.cpus} CPU(s):")
+    print(f"{'mode':<12}{'seconds':>10}{'dispatches/s':>15}{'queries':>10}")
+    for mode in MODES:
+        result = results[mode]
+        print(f"{mode:<12}{result['seconds']:>10.2f}{result['resolved'] / result['seconds']:>15.0f}{result['queries']:>10}")
+    speedup = results['one-by-one']['seconds'] / results['batch']['seconds']
+    print(f"Batch resolution is {speedup:.1f}x faster.")
+
+
+if __name__ == '__main__':
+    main()
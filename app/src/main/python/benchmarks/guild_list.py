@@ -0,0 +1,92 @@
+"""
+GET /api/guilds/ with many guilds: the plain queryset (stats aggregated per
+guild, buildings loaded per guild and per building, the previous behaviour)
+versus the annotated and prefetched GuildViewSet queryset.
+
+    python -m benchmarks.guild_list --guilds 1000 --runs 5 --cpus 1
+"""
+import argparse
+import statistics
+import time
+from benchmarks import limit_cpu, setup_django, temporary_database
+
+
+def populate(guilds):
+    from guilda_manager.models import Building, Guild, GuildBuilding
+
+    buildings = Building.objects.bulk_create([
+        Building(name=name, slug=slug, description='', cost=100)
+        for name, slug in [('Caixa-Forte', 'caixa-forte'), ('Arsenal', 'arsenal'),
+                           ('Sala de Guerra', 'sala-de-guerra'), ('Enfermaria', 'enfermaria')]
+    ])
+    rows = Guild.objects.bulk_create([Guild(name=f"Guilda {i}", code=f"BEN-{i:04d}") for i in range(guilds)])
+    GuildBuilding.objects.bulk_create([
+        GuildBuilding(guild=guild, building=building)
+        for i, guild in enumerate(rows) for building in buildings[:1 + i % len(buildings)]
+    ], batch_size=500)
+
+
+def list_guilds(viewset):
+    from rest_framework.test import APIRequestFactory
+
+    request = APIRequestFactory().get('/api/guilds/')
+    response = viewset.as_view({'get': 'list'})(request)
+    response.render()
+    return response
+
+
+def measure(viewset, runs):
+    from django.db import connection
+
+    queries = []
+
+    def count_query(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    timings = []
+    for _ in range(runs):
+        queries.clear()
+        with connection.execute_wrapper(count_query):
+            started_at = time.perf_counter()
+            response = list_guilds(viewset)
+            timings.append(time.perf_counter() - started_at)
+    return statistics.median(timings), len(queries), response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--guilds', type=int, default=1000)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--cpus', type=int, default=1)
+    args = parser.parse_args()
+
+    limit_cpu(args.cpus)
+    tmp, db_path = temporary_database()
+    with tmp:
+        setup_django(db_path)
+        populate(args.guilds)
+
+        from guilda_manager.api import GuildViewSet
+        from guilda_manager.models import Guild
+
+        class PlainGuildViewSet(GuildViewSet):
+            queryset = Guild.objects.order_by('id')
+
+        results = {
+            'plain': measure(PlainGuildViewSet, args.runs),
+            'annotated': measure(GuildViewSet, args.runs),
+        }
+
+    plain_data, annotated_data = results['plain'][2].data, results['annotated'][2].data
+    assert plain_data == annotated_data, "Both querysets must serialize the same data"
+
+    print(f"GET /api/guilds/ with {args.guilds} guilds, median of {args.runs} runs, pinned to {args.cpus} CPU(s):")
+    print(f"{'queryset':<12}{'ms':>10}{'queries':>10}")
+    for name, (seconds, queries, _) in results.items():
+        print(f"{name:<12}{seconds * 1000:>10.1f}{queries:>10}")
+    print(f"Annotated queryset is {results['plain'][0] / results['annotated'][0]:.1f}x faster.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Pathfinding and spatial queries on large hex maps: building a map's HexGrid
+(one query, then cached), A* between random passable hexes on the cached
+grid, and radius / ring / range queries served by the (map, q, r) index.
+
+    python -m benchmarks.hex_paths --radii 29 57 --blocked 0.2 --paths 200 --cpus 1
+
+A radius-57 map has 9 919 hexes, about a 100 x 100 map. Every cell gets a
+Hexagon row (``--blocked`` of them impassable), as on a fully described map.
+"""
+import argparse
+import random
+import statistics
+import time
+from benchmarks import limit_cpu, percentile, setup_django, temporary_database
+
+
+def populate(radius, blocked, seed):
+    from guilda_manager.hexmap import HexGrid, hex_range
+    from guilda_manager.models import Hexagon, Map
+
+    rng = random.Random(seed)
+    game_map = Map.objects.create(name=f"Mapa {radius}", radius=radius)
+    cells = hex_range((0, 0), radius)
+    Hexagon.objects.bulk_create([
+        Hexagon(map=game_map, q=q, r=r, title=f"{q},{r}", blocked=(q, r) != (0, 0) and rng.random() < blocked)
+        for q, r in cells
+    ], batch_size=2000)
+    HexGrid.invalidate(game_map.pk)
+    return game_map, cells
+
+
+def timed(function, runs):
+    timings = []
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started_at)
+    return statistics.median(timings) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--radii', type=int, nargs='+', default=[29, 57])
+    parser.add_argument('--blocked', type=float, default=0.2)
+    parser.add_argument('--paths', type=int, default=200)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--cpus', type=int, default=1)
+    args = parser.parse_args()
+
+    limit_cpu(args.cpus)
+    tmp, db_path = temporary_database()
+    with tmp:
+        setup_django(db_path)
+        from guilda_manager.hexmap import HexGrid, Region
+        from guilda_manager.models import Hexagon
+
+        print(f"{args.blocked:.0%} blocked, {args.paths} random paths, pinned to {args.cpus} CPU(s):")
+        print(f"{'radius':>7}{'hexes':>8}{'grid ms':>9}{'cached ms':>10}"
+              f"{'path p50':>10}{'path p95':>10}{'found':>7}{'range ms':>10}{'ring ms':>9}")
+        for radius in args.radii:
+            game_map, cells = populate(radius, args.blocked, args.seed)
+            hexagons = Hexagon.objects.filter(map=game_map)
+
+            def build():
+                HexGrid.invalidate(game_map.pk)
+                return HexGrid.for_map(game_map)
+
+            build_ms, grid = timed(build, args.runs)
+            cached_ms, _ = timed(lambda: HexGrid.for_map(game_map), args.runs)
+
+            rng = random.Random(args.seed)
+            passable = [cell for cell in cells if grid.passable(cell)]
+            path_timings, found = [], 0
+            for _ in range(args.paths):
+                start, goal = rng.choice(passable), rng.choice(passable)
+                started_at = time.perf_counter()
+                path = grid.path(start, goal)
+                path_timings.append((time.perf_counter() - started_at) * 1000)
+                found += path is not None
+
+            center = rng.choice(cells)
+            range_ms, _ = timed(lambda: list(Region.around(*center, 8).filter(hexagons)), args.runs)
+            ring_ms, _ = timed(lambda: list(Region.around(*center, 8, ring=True).filter(hexagons)), args.runs)
+
+            print(f"{radius:>7}{len(cells):>8}{build_ms:>9.1f}{cached_ms:>10.3f}"
+                  f"{percentile(path_timings, 50):>10.2f}{percentile(path_timings, 95):>10.2f}"
+                  f"{found:>7}{range_ms:>10.2f}{ring_ms:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Size and decode time of each pin model: the source GLB versus its LOD
+variants from `manage.py optimize_pins`.
+
+    python -m benchmarks.pin_models --runs 5 --cpus 1
+
+"gzip" is the transfer size with the compressed copy WhiteNoise serves.
+"decode" mirrors what GLTFLoader does before upload: parse the JSON chunk
+and copy every accessor's buffer view into a typed array (quantized
+attributes stay quantized; the GPU dequantizes them).
+"""
+import argparse
+import gzip
+import os
+import statistics
+import time
+from benchmarks import limit_cpu, setup_django, temporary_database
+
+
+def decode(data):
+    from array import array
+    from guilda_manager import gltf
+
+    document, binary = gltf.read_glb(data)
+    for accessor in document['accessors']:
+        view = document['bufferViews'][accessor['bufferView']]
+        start = view.get('byteOffset', 0)
+        array(gltf.COMPONENT_FORMATS[accessor['componentType']]).frombytes(
+            binary[start:start + view['byteLength'] // 4 * 4]
+        )
+
+
+def decode_ms(data, runs):
+    timings = []
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        decode(data)
+        timings.append(time.perf_counter() - started_at)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--cpus', type=int, default=1)
+    args = parser.parse_args()
+
+    limit_cpu(args.cpus)
+    tmp, db_path = temporary_database()
+    with tmp:
+        setup_django(db_path)
+        from django.conf import settings
+        from guilda_manager.pins import PINS_DIR, load_manifest, pin_model
+
+        manifest = load_manifest()
+        if not manifest['pins']:
+            raise SystemExit("No manifest: run `python manage.py optimize_pins` first.")
+
+        print(f"Pin models, median of {args.runs} decodes, pinned to {args.cpus} CPU(s):")
+        print(f"{'model':<14}{'KB':>8}{'gzip KB':>9}{'tris':>8}{'decode ms':>11}")
+        for name, entry in manifest['pins'].items():
+            print(name)
+            served = pin_model(name, settings.PIN_MAP_MAX_TRIANGLES)
+            rows = [('source', name, entry.get('triangles', 0))] + [
+                (f"LOD {variant['lod']}", variant['file'], variant['triangles']) for variant in entry['variants']
+            ]
+            for label, path, count in rows:
+                with open(os.path.join(PINS_DIR, path), 'rb') as handle:
+                    data = handle.read()
+                label = f"  {label}{' *' if path == served else ''}"
+                print(f"{label:<14}{len(data) / 1024:>8.0f}{len(gzip.compress(data)) / 1024:>9.0f}"
+                      f"{count:>8}{decode_ms(data, args.runs):>11.2f}")
+        print(f"* served on the map (PIN_MAP_MAX_TRIANGLES={settings.PIN_MAP_MAX_TRIANGLES})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+GET /api/quests/ as the quest table grows: the first page, a page deep into
+the history (reached through its cursor) and the projected card fields used
+by sede.html, for each table size.
+
+    python -m benchmarks.quest_list --sizes 10000 100000 300000 --runs 5 --cpus 1
+"""
+import argparse
+import statistics
+import time
+from benchmarks import limit_cpu, setup_django, temporary_database
+
+CARD_FIELDS = 'id,title,description,status,status_display,rank,duration_days,gold_reward,gxp_reward'
+
+
+def grow(total, guild):
+    from guilda_manager.models import Member, Quest
+
+    ranks = Quest.Rank.values
+    members = list(Member.objects.filter(guild=guild)[:3])
+    Through = Quest.assigned_members.through
+    start = Quest.objects.count()
+    for offset in range(start, total, 5000):
+        quests = Quest.objects.bulk_create([
+            Quest(title=f"Missão {i}", description='', rank=ranks[i % len(ranks)], guild=guild,
+                  type=Quest.Type.INTERNAL, status=Quest.Status.COMPLETED)
+            for i in range(offset, min(offset + 5000, total))
+        ])
+        Through.objects.bulk_create([
+            Through(quest_id=quest.pk, member_id=member.pk) for quest in quests for member in members
+        ])
+
+
+def get(path, runs):
+    from rest_framework.test import APIRequestFactory
+    from guilda_manager.api import QuestViewSet
+
+    view = QuestViewSet.as_view({'get': 'list'})
+    timings = []
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        response = view(APIRequestFactory(SERVER_NAME='localhost').get(path))
+        response.render()
+        timings.append(time.perf_counter() - started_at)
+    return statistics.median(timings) * 1000, response
+
+
+def deep_page(total):
+    """Path of the page starting at about 90% of the history."""
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+    from guilda_manager.api import QuestCursorPagination
+    from guilda_manager.models import Quest
+
+    anchor = Quest.objects.order_by('created_at', 'id')[int(total * 0.9)]
+    paginator = QuestCursorPagination()
+    request = Request(APIRequestFactory(SERVER_NAME='localhost').get('/api/quests/'))
+    paginator.paginate_queryset(Quest.objects.filter(pk__gte=anchor.pk), request)
+    return paginator.get_next_link() or '/api/quests/'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 300000])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--cpus', type=int, default=1)
+    args = parser.parse_args()
+
+    limit_cpu(args.cpus)
+    tmp, db_path = temporary_database()
+    with tmp:
+        setup_django(db_path)
+        from guilda_manager.models import Guild, Member
+
+        guild = Guild.objects.create(name="Guilda")
+        Member.objects.bulk_create([Member(name=f"Membro {i}", guild=guild) for i in range(3)])
+
+        print(f"GET /api/quests/ (50 per page), median of {args.runs} runs, pinned to {args.cpus} CPU(s):")
+        print(f"{'quests':>10}{'first ms':>12}{'deep ms':>12}{'fields ms':>12}")
+        for size in sorted(args.sizes):
+            grow(size, guild)
+            first, response = get('/api/quests/', args.runs)
+            assert len(response.data['results']) == 50
+            deep, _ = get(deep_page(size), args.runs)
+            projected, _ = get(f'/api/quests/?fields={CARD_FIELDS}', args.runs)
+            print(f"{size:>10}{first:>12.1f}{deep:>12.1f}{projected:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
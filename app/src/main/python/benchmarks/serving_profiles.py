@@ -0,0 +1,144 @@
+"""
+Load test of the waitress serving profiles (config/serving.py) on a device
+class, to pick the profile app_main should use there.
+
+    python -m benchmarks.serving_profiles --device mid --clients 16 --seconds 5
+
+The server runs in a child process pinned to the device class' cores (low:
+2, mid: 4, high: 8, capped to this machine) with each profile in turn; the
+clients, in this process, loop over what a WebView session asks for: the
+map page, hex regions, the quest API, a static file and, for one request in
+ten, the dispatch resolution POST (a write). The recommended profile has the
+most requests per second among those whose p95 is within 20% of the best.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from benchmarks import PYTHON_ROOT, child_env, limit_cpu, percentile, setup_django, temporary_database
+
+DEVICE_CORES = {'low': 2, 'mid': 4, 'high': 8}
+REQUESTS = [
+    ('GET', '/mapa/'),
+    ('GET', '/api/hex-regions/?q_min=-8&q_max=8&r_min=-8&r_max=8'),
+    ('GET', '/api/quests/?status=OPEN'),
+    ('GET', '/static/guilda_manager/images/party_token.svg'),
+    ('GET', '/api/hex-regions/?q_min=-4&q_max=4&r_min=-4&r_max=4'),
+    ('GET', '/api/quests/'),
+    ('GET', '/mapa/'),
+    ('GET', '/api/hex-regions/?q_min=0&q_max=8&r_min=-8&r_max=0'),
+    ('GET', '/api/quests/?status=COMPLETED'),
+    ('POST', '/api/dispatches/resolve_due/'),
+]
+
+
+def serve(profile, cores):
+    """Child: serves the app with ``profile`` on an ephemeral port, printed first."""
+    limit_cpu(cores)
+    import django
+    django.setup()
+    from django.core.wsgi import get_wsgi_application
+    from waitress.server import create_server
+    from config.serving import server_options
+
+    options = server_options(profile)
+    server = create_server(get_wsgi_application(), host='127.0.0.1', port=0, **options)
+    print(server.effective_port, options.get('threads', 4), flush=True)
+    server.run()
+
+
+def client(origin, deadline, offset, timings, errors):
+    i = offset
+    while time.perf_counter() < deadline:
+        method, path = REQUESTS[i % len(REQUESTS)]
+        i += 1
+        request = urllib.request.Request(origin + path, method=method, data=b'' if method == 'POST' else None)
+        started_at = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+            timings.append(time.perf_counter() - started_at)
+        except OSError:
+            errors.append(path)
+
+
+def measure(db_path, profile, cores, clients, seconds):
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.serving_profiles', '--serve', profile, '--cores', str(cores)],
+        cwd=PYTHON_ROOT, env=child_env(db_path, GUILDA_QUERY_METRICS=0), text=True,
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,  # waitress' queue depth warnings
+    )
+    try:
+        port, threads = process.stdout.readline().split()
+        origin = f"http://127.0.0.1:{port}"
+        # Warm-up: lazy URLconf, templates, first connections
+        client(origin, time.perf_counter() + 1, 0, [], [])
+
+        timings, errors = [], []
+        deadline = time.perf_counter() + seconds
+        workers = [
+            threading.Thread(target=client, args=(origin, deadline, i, timings, errors)) for i in range(clients)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    finally:
+        process.terminate()
+        process.wait()
+    return {
+        'threads': int(threads),
+        'rps': len(timings) / seconds,
+        'p50': statistics.median(timings) if timings else 0.0,
+        'p95': percentile(timings, 95),
+        'errors': len(errors),
+    }
+
+
+def recommend(results):
+    best_p95 = min(result['p95'] for result in results.values())
+    eligible = {name: result for name, result in results.items() if result['p95'] <= best_p95 * 1.2}
+    return max(eligible, key=lambda name: eligible[name]['rps'])
+
+
+def main():
+    from config.serving import PROFILES
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--device', default='mid', choices=list(DEVICE_CORES))
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--profiles', nargs='*', default=list(PROFILES))
+    parser.add_argument('--serve', help=argparse.SUPPRESS)
+    parser.add_argument('--cores', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.cores)
+        return
+
+    from config.serving import available_cores
+    cores = min(DEVICE_CORES[args.device], available_cores())
+    tmp, db_path = temporary_database()
+    with tmp:
+        setup_django(db_path)
+        from django.db import connections
+        from benchmarks.sqlite_concurrency import populate
+        populate()
+        connections.close_all()
+
+        print(f"'{args.device}' device ({cores} cores), {args.clients} clients, {args.seconds:g} s per profile:")
+        print(f"{'':<12}{'threads':>8}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}")
+        results = {}
+        for profile in args.profiles:
+            result = results[profile] = measure(db_path, profile, cores, args.clients, args.seconds)
+            print(f"{profile:<12}{result['threads']:>8}{result['rps']:>8.0f}{result['p50'] * 1000:>9.1f}"
+                  f"{result['p95'] * 1000:>9.1f}{result['errors']:>8}")
+        print(f"Recommended for '{args.device}': GUILDA_SERVING_PROFILE={recommend(results)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Mixed read/write load on SQLite from several threads, as waitress serves
+it: the map and the sede reading while the Mestre screen writes. Compares
+the rollback journal with a new connection per request (before) and the
+'wal' profile with persistent connections (config/sqlite.py).
+
+    python -m benchmarks.sqlite_concurrency --threads 4 --seconds 5 --writes 20 --cpus 2
+
+Every thread loops over "requests" (close_old_connections around each one,
+as Django does on request_started / request_finished); --writes percent of
+them are writes. Each profile runs in a child process on its own database,
+since journal_mode=WAL sticks to the file. "locked" counts the requests
+that failed with "database is locked".
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from benchmarks import limit_cpu, percentile, run_child, setup_django, temporary_database
+
+PROFILES = {
+    'before': {'GUILDA_SQLITE_PROFILE': 'default', 'GUILDA_DB_CONN_MAX_AGE': '0'},
+    'after': {'GUILDA_SQLITE_PROFILE': 'wal', 'GUILDA_DB_CONN_MAX_AGE': ''},
+}
+
+
+def populate():
+    from guilda_manager.models import Guild, Hexagon, Map, Quest
+
+    guild = Guild.objects.create(name="Guilda", code='BEN-0001')
+    Quest.objects.bulk_create([
+        Quest(title=f"Quest {i}", description='', rank='F', guild=guild, gxp_reward=5) for i in range(500)
+    ])
+    game_map = Map.objects.create(name="Mapa")
+    Hexagon.objects.bulk_create([
+        Hexagon(map=game_map, q=q, r=r, title=f"{q},{r}") for q in range(-10, 11) for r in range(-10, 11)
+    ])
+
+
+def read(rng):
+    from guilda_manager.models import Hexagon, Quest
+
+    q, r = rng.randrange(-8, 8), rng.randrange(-8, 8)
+    list(Hexagon.objects.filter(q__range=(q - 2, q + 2), r__range=(r - 2, r + 2)).values('q', 'r', 'title'))
+    list(Quest.objects.filter(status=Quest.Status.OPEN).order_by('-id').values('id', 'title')[:50])
+
+
+def write(rng):
+    from django.db import transaction
+    from guilda_manager.models import Hexagon, Quest
+
+    with transaction.atomic():
+        Hexagon.objects.filter(q=rng.randrange(-10, 11), r=rng.randrange(-10, 11)).update(title=f"{rng.random():.6f}")
+        Quest.objects.filter(pk=Quest.objects.order_by('?').values('pk')[:1]).update(gxp_reward=rng.randrange(100))
+
+
+def worker(seed, deadline, write_pct, results):
+    from django.db import OperationalError, close_old_connections
+
+    rng = random.Random(seed)
+    timings, locked = [], 0
+    while time.perf_counter() < deadline:
+        close_old_connections()
+        started_at = time.perf_counter()
+        try:
+            (write if rng.randrange(100) < write_pct else read)(rng)
+            timings.append(time.perf_counter() - started_at)
+        except OperationalError as error:
+            if 'locked' not in str(error):
+                raise
+            locked += 1
+        finally:
+            close_old_connections()
+    results.append((timings, locked))
+
+
+def child(args):
+    """Runs the load in this process (profile from the environment); prints JSON."""
+    from django.db import connections
+
+    results = []
+    deadline = time.perf_counter() + args.seconds
+    threads = [
+        threading.Thread(target=worker, args=(i, deadline, args.writes, results)) for i in range(args.threads)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    connections.close_all()
+    timings = [t for thread_timings, _ in results for t in thread_timings]
+    print(json.dumps({
+        'requests': len(timings),
+        'locked': sum(locked for _, locked in results),
+        'p50': percentile(timings, 50),
+        'p95': percentile(timings, 95),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--writes', type=int, default=20, help='percent of requests that write')
+    parser.add_argument('--cpus', type=int, default=2)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    limit_cpu(args.cpus)
+    if args.child:
+        setup_django(os.environ['GUILDA_DB_PATH'])
+        populate()
+        child(args)
+        return
+
+    print(f"{args.threads} threads, {args.writes}% writes, {args.seconds:g} s per profile:")
+    print(f"{'':<8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'locked':>10}")
+    for label, env in PROFILES.items():
+        tmp, db_path = temporary_database()
+        with tmp:
+            output = run_child('benchmarks.sqlite_concurrency', [
+                '--child', '--threads', str(args.threads), '--seconds', str(args.seconds),
+                '--writes', str(args.writes), '--cpus', str(args.cpus),
+            ], db_path, **env)
+            result = json.loads(output.strip().splitlines()[-1])
+        print(f"{label:<8}{result['requests'] / args.seconds:>10.0f}{result['p50'] * 1000:>10.2f}"
+              f"{result['p95'] * 1000:>10.2f}{result['locked']:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Load time of Three.js for the 3D pages: the vendored bundle from
+`manage.py vendor_three`, served locally by waitress + WhiteNoise, versus
+the unpkg module graph the import map pointed to before.
+
+    python -m benchmarks.three_loading --page mapa --runs 5
+
+A browser only discovers a module's imports once it has it, so the unpkg
+graph is fetched in waves: every module of a wave in parallel, the next wave
+from their imports. "wire KB" is what crossed the network (gzip where the
+server offers it). Without network the unpkg row says so; the bundle row
+needs the bundle to have been built.
+"""
+import argparse
+import re
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+from benchmarks import setup_django, temporary_database
+
+IMPORT_RE = re.compile(r"""(?:^|[;\s}])(?:import|export)\s*(?:[^'";]*?\sfrom\s*)?['"]([^'"]+)['"]""")
+
+
+def fetch(url):
+    request = urllib.request.Request(url, headers={'Accept-Encoding': 'gzip'})
+    with urllib.request.urlopen(request, timeout=20) as response:
+        body = response.read()
+        if response.headers.get('Content-Encoding') == 'gzip':
+            import gzip
+            return len(body), gzip.decompress(body).decode('utf-8')
+        return len(body), body.decode('utf-8')
+
+
+def resolve(specifier, base, imports):
+    if specifier in imports:
+        return imports[specifier]
+    for prefix, target in imports.items():
+        if prefix.endswith('/') and specifier.startswith(prefix):
+            return target + specifier[len(prefix):]
+    return urljoin(base, specifier)
+
+
+def load_graph(specifiers, imports):
+    """(requests, wire bytes, seconds) to load ``specifiers`` and everything they import."""
+    started_at = time.perf_counter()
+    seen = set()
+    wave = {resolve(specifier, '', imports) for specifier in specifiers}
+    requests = wire = 0
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        while wave:
+            seen |= wave
+            results = list(pool.map(lambda url: (url, fetch(url)), sorted(wave)))
+            wave = set()
+            for url, (size, text) in results:
+                requests += 1
+                wire += size
+                wave.update(resolve(specifier, url, imports) for specifier in IMPORT_RE.findall(text))
+            wave -= seen
+    return requests, wire, time.perf_counter() - started_at
+
+
+def page_specifiers(page):
+    from guilda_manager.threejs import ADDON_IMPORT_RE, TEMPLATES_DIR
+    import os
+    with open(os.path.join(TEMPLATES_DIR, 'guilda_manager', f"{page}.html"), encoding='utf-8') as handle:
+        text = handle.read()
+    return ['three'] + sorted({specifier for _, specifier in ADDON_IMPORT_RE.findall(text)})
+
+
+def serve_locally():
+    from django.core.wsgi import get_wsgi_application
+    from waitress.server import create_server
+
+    server = create_server(get_wsgi_application(), host='127.0.0.1', port=0)
+    threading.Thread(target=server.run, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.effective_port}"
+
+
+def measure(label, load, runs):
+    timings = []
+    try:
+        for _ in range(runs):
+            requests, wire, seconds = load()
+            timings.append(seconds)
+    except (urllib.error.URLError, OSError) as error:
+        print(f"{label:<10} unreachable ({getattr(error, 'reason', error)})")
+        return
+    print(f"{label:<10}{requests:>10}{wire / 1024:>10.1f}{statistics.median(timings) * 1000:>12.1f}{max(timings) * 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--page', default='mapa', choices=['mapa', 'landing', 'upgrades'])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    tmp, db_path = temporary_database()
+    with tmp:
+        setup_django(db_path)
+        from guilda_manager.threejs import import_map, vendored_manifest
+
+        specifiers = page_specifiers(args.page)
+        print(f"{args.page}.html imports {', '.join(specifiers)}; median of {args.runs} cold loads:")
+        print(f"{'':<10}{'requests':>10}{'wire KB':>10}{'median ms':>12}{'max ms':>10}")
+
+        cdn = import_map(None)['imports']
+        measure('unpkg', lambda: load_graph(specifiers, cdn), args.runs)
+
+        manifest = vendored_manifest()
+        if manifest is None:
+            print("bundle     not built (python manage.py vendor_three)")
+            return
+        server, origin = serve_locally()
+        try:
+            local = {specifier: origin + url for specifier, url in import_map(manifest)['imports'].items()}
+            measure('bundle', lambda: load_graph(specifiers, local), args.runs)
+        finally:
+            server.close()
+
+
+if __name__ == '__main__':
+    main()
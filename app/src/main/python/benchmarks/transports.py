@@ -0,0 +1,117 @@
+"""
+Latency of a small JSON response over the local server's transports
+(config/transport.py): TCP on loopback, the Unix socket, and TCP through
+LocalProxy to the Unix socket (what the WebView uses in 'unix' mode).
+
+    python -m benchmarks.transports --requests 2000 --cpus 2
+
+A child process serves the app on all of them (one waitress server per
+socket family, 4 threads each). Requests are sequential, first on one
+keep-alive connection (the WebView's usual case), then with a new
+connection per request.
+"""
+import argparse
+import http.client
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from benchmarks import PYTHON_ROOT, child_env, limit_cpu, percentile, setup_django, temporary_database
+
+URL = '/api/'
+
+
+def serve(socket_path, cpus):
+    """Child: serves the app on TCP and ``socket_path`` (plus the proxy); prints the addresses."""
+    limit_cpu(cpus)
+    import django
+    django.setup()
+    from django.core.wsgi import get_wsgi_application
+    from waitress.server import create_server
+    from config.transport import LocalProxy, bind_unix_socket
+
+    # waitress does not mix socket families in one server: one server each
+    application = get_wsgi_application()
+    tcp_server = create_server(application, host='127.0.0.1', port=0, threads=4)
+    unix_server = create_server(application, sockets=[bind_unix_socket(socket_path)], threads=4)
+    threading.Thread(target=tcp_server.run, daemon=True).start()
+    proxy = LocalProxy(socket_path, port=0).start()
+    print(json.dumps({'tcp': tcp_server.effective_port, 'proxy': proxy.port}), flush=True)
+    unix_server.run()
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        super().__init__('localhost')
+        self.socket_path = path
+
+    def connect(self):
+        from config.transport import connect_unix
+        self.sock = connect_unix(self.socket_path)
+
+
+def measure(connect, requests, keep_alive):
+    timings = []
+    connection = connect()
+    for _ in range(requests):
+        if not keep_alive:
+            connection = connect()
+        started_at = time.perf_counter()
+        connection.request('GET', URL, headers={'Accept': 'application/json', 'Host': '127.0.0.1'})
+        response = connection.getresponse()
+        response.read()
+        timings.append(time.perf_counter() - started_at)
+        if not keep_alive:
+            connection.close()
+    connection.close()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--cpus', type=int, default=2)
+    parser.add_argument('--serve', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.cpus)
+        return
+
+    tmp, db_path = temporary_database()
+    with tmp, tempfile.TemporaryDirectory(prefix='guilda-sock-') as socket_dir:
+        setup_django(db_path)
+        socket_path = str(Path(socket_dir) / 'guilda.sock')
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'benchmarks.transports', '--serve', socket_path, '--cpus', str(args.cpus)],
+            cwd=PYTHON_ROOT, env=child_env(db_path, GUILDA_QUERY_METRICS=0), stdout=subprocess.PIPE, text=True,
+        )
+        try:
+            ports = json.loads(process.stdout.readline())
+            transports = {
+                'tcp': lambda: http.client.HTTPConnection('127.0.0.1', ports['tcp']),
+                'unix': lambda: UnixHTTPConnection(socket_path),
+                'proxy': lambda: http.client.HTTPConnection('127.0.0.1', ports['proxy']),
+            }
+            for connect in transports.values():
+                measure(connect, 50, True)  # Warm-up
+
+            print(f"GET {URL}, {args.requests} sequential requests per row:")
+            print(f"{'':<8}{'connection':<12}{'p50 us':>9}{'p95 us':>9}{'p99 us':>9}{'mean us':>9}")
+            for keep_alive in (True, False):
+                for name, connect in transports.items():
+                    timings = measure(connect, args.requests, keep_alive)
+                    print(f"{name:<8}{'keep-alive' if keep_alive else 'new':<12}"
+                          f"{percentile(timings, 50) * 1e6:>9.0f}{percentile(timings, 95) * 1e6:>9.0f}"
+                          f"{percentile(timings, 99) * 1e6:>9.0f}{statistics.mean(timings) * 1e6:>9.0f}")
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
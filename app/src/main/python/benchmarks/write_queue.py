@@ -0,0 +1,118 @@
+"""
+Latency of mixed traffic with the single-writer queue (config/write_queue.py)
+off, every thread writing on its own connection, and on.
+
+    python -m benchmarks.write_queue --threads 8 --seconds 5 --writes 30 --cpus 2
+
+Same load as benchmarks.sqlite_concurrency (map and quest reads, small
+write transactions; --writes percent of the requests), the writes going
+through @serialized_write like the console actions. --sqlite-profile picks
+the pragmas of both runs ('default' shows the rollback journal, where the
+lock contention is worst).
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from benchmarks import limit_cpu, percentile, run_child, setup_django, temporary_database
+
+MODES = {'direct': '0', 'queue': '1'}
+
+
+def worker(seed, deadline, write_pct, results):
+    from django.db import OperationalError, close_old_connections
+    from benchmarks.sqlite_concurrency import read
+
+    write = queued_write()
+    rng = random.Random(seed)
+    reads, writes, locked = [], [], 0
+    while time.perf_counter() < deadline:
+        close_old_connections()
+        is_write = rng.randrange(100) < write_pct
+        started_at = time.perf_counter()
+        try:
+            (write if is_write else read)(rng)
+            (writes if is_write else reads).append(time.perf_counter() - started_at)
+        except OperationalError as error:
+            if 'locked' not in str(error):
+                raise
+            locked += 1
+        finally:
+            close_old_connections()
+    results.append((reads, writes, locked))
+
+
+def queued_write():
+    from config.write_queue import serialized_write
+    from benchmarks.sqlite_concurrency import write
+    return serialized_write(write)
+
+
+def child(args):
+    from django.db import connections
+    from config.write_queue import get_writer
+
+    results = []
+    deadline = time.perf_counter() + args.seconds
+    threads = [
+        threading.Thread(target=worker, args=(i, deadline, args.writes, results)) for i in range(args.threads)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer = get_writer()
+    writer.stop()
+    connections.close_all()
+    reads = [t for thread_reads, _, _ in results for t in thread_reads]
+    writes = [t for _, thread_writes, _ in results for t in thread_writes]
+    print(json.dumps({
+        'requests': len(reads) + len(writes),
+        'locked': sum(locked for _, _, locked in results),
+        'read_p99': percentile(reads, 99),
+        'write_p50': percentile(writes, 50),
+        'write_p99': percentile(writes, 99),
+        'all_p99': percentile(reads + writes, 99),
+        'batches': writer.stats['batches'],
+        'units': writer.stats['units'],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--writes', type=int, default=30, help='percent of requests that write')
+    parser.add_argument('--sqlite-profile', default='wal', choices=['wal', 'default'])
+    parser.add_argument('--cpus', type=int, default=2)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    limit_cpu(args.cpus)
+    if args.child:
+        from benchmarks.sqlite_concurrency import populate
+        setup_django(os.environ['GUILDA_DB_PATH'])
+        populate()
+        child(args)
+        return
+
+    print(f"{args.threads} threads, {args.writes}% writes, '{args.sqlite_profile}' profile, {args.seconds:g} s per mode:")
+    print(f"{'':<8}{'req/s':>8}{'read p99':>10}{'write p50':>11}{'write p99':>11}{'all p99':>9}{'locked':>8}{'units/batch':>13}")
+    for label, enabled in MODES.items():
+        tmp, db_path = temporary_database()
+        with tmp:
+            output = run_child('benchmarks.write_queue', [
+                '--child', '--threads', str(args.threads), '--seconds', str(args.seconds),
+                '--writes', str(args.writes), '--cpus', str(args.cpus),
+            ], db_path, GUILDA_WRITE_QUEUE=enabled, GUILDA_SQLITE_PROFILE=args.sqlite_profile)
+            result = json.loads(output.strip().splitlines()[-1])
+        per_batch = f"{result['units'] / result['batches']:.1f}" if result['batches'] else '-'
+        print(f"{label:<8}{result['requests'] / args.seconds:>8.0f}{result['read_p99'] * 1000:>10.2f}"
+              f"{result['write_p50'] * 1000:>11.2f}{result['write_p99'] * 1000:>11.2f}"
+              f"{result['all_p99'] * 1000:>9.2f}{result['locked']:>8}{per_batch:>13}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+"""
+Boot helpers for app_main.start_server.
+
+Running ``migrate`` on every launch imports every migration module and
+introspects the SQLite schema before waitress binds its port. The fast boot
+path instead compares a fingerprint of the migration graph on disk with the
+one recorded after the last successful migrate, and skips the command when
+nothing changed.
+"""
+import hashlib
+import logging
+import pkgutil
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from importlib import import_module
+from pathlib import Path
+
+logger = logging.getLogger('guilda.boot')
+
+BOOT_MODE_FAST = 'fast'
+BOOT_MODE_FULL = 'full'
+
+_migrating = threading.Event()
+
+
+class BootTimer:
+    """
+    Collects the duration of each cold-start phase and writes them as a
+    single report line to the log.
+    """
+
+    def __init__(self, started_at=None):
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        self.phases.append((name, seconds))
+
+    def skip(self, name, reason):
+        self.phases.append((name, reason))
+
+    def elapsed(self):
+        return time.perf_counter() - self.started_at
+
+    def report(self):
+        parts = []
+        for name, value in self.phases:
+            if isinstance(value, str):
+                parts.append(f"{name}=({value})")
+            else:
+                parts.append(f"{name}={value * 1000:.1f}ms")
+        line = "Cold start: " + " ".join(parts)
+        logger.info(line)
+        return line
+
+
+class _TimedLoader:
+    """Loader proxy that times exec_module for ImportProfiler."""
+
+    def __init__(self, loader, profiler, name):
+        self._loader = loader
+        self._profiler = profiler
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        # Hide the proxy from the module itself
+        module.__loader__ = self._loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self._loader
+        self._profiler.enter(self._name)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler.exit()
+
+
+class ImportProfiler:
+    """
+    In-process equivalent of ``python -X importtime`` (the flag cannot be
+    passed to the embedded interpreter on Android).
+
+    Installed first in sys.meta_path, it times the execution of every module
+    imported while it is active and keeps the nesting, so report() can log an
+    import-time tree with self and cumulative times per module.
+    """
+
+    def __init__(self):
+        self.records = []
+        self._local = threading.local()
+
+    def install(self):
+        sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                spec.loader = _TimedLoader(spec.loader, self, fullname)
+            return spec
+        return None
+
+    def enter(self, name):
+        stack = self._local.__dict__.setdefault('stack', [])
+        # [name, depth, started_at, time spent in nested imports]
+        stack.append([name, len(stack), time.perf_counter(), 0.0])
+
+    def exit(self):
+        stack = self._local.stack
+        name, depth, started_at, nested = stack.pop()
+        cumulative = time.perf_counter() - started_at
+        if stack:
+            stack[-1][3] += cumulative
+        self.records.append((depth, name, cumulative - nested, cumulative))
+
+    def report(self, min_ms=1.0):
+        """Logs the import tree, children before parents like -X importtime."""
+        lines = ["Import time (self ms | cumulative ms | module):"]
+        for depth, name, self_time, cumulative in self.records:
+            if cumulative * 1000 >= min_ms:
+                lines.append(f"{self_time * 1000:9.1f} | {cumulative * 1000:9.1f} | {'  ' * depth}{name}")
+        text = "\n".join(lines)
+        logger.info(text)
+        return text
+
+
+def migration_fingerprint():
+    """
+    Hashes the names of every migration of every installed app.
+
+    Names are listed with pkgutil so that no migration module is imported
+    and the listing also works for zip/asset importers (Chaquopy).
+    """
+    from django import VERSION
+    from django.apps import apps
+
+    digest = hashlib.sha256(repr(VERSION).encode('utf-8'))
+    for app_config in sorted(apps.get_app_configs(), key=lambda a: a.label):
+        try:
+            package = import_module(f"{app_config.name}.migrations")
+        except ImportError:
+            continue
+        names = sorted(
+            name for _, name, is_pkg in pkgutil.iter_modules(package.__path__)
+            if not is_pkg and name[0] not in '_~'
+        )
+        for name in names:
+            digest.update(f"{app_config.label}:{name}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def fingerprint_path():
+    from django.conf import settings
+    return settings.BOOT_FINGERPRINT_PATH
+
+
+def database_exists():
+    from django.conf import settings
+    from django.db import connection
+
+    if connection.vendor != 'sqlite':
+        return True
+    name = str(settings.DATABASES['default']['NAME'])
+    if name == ':memory:':
+        return False
+    return Path(name).exists()
+
+
+def read_recorded_fingerprint():
+    """Returns the fingerprint of the last successful migrate, if any."""
+    if not database_exists():
+        return None
+    try:
+        return fingerprint_path().read_text().strip() or None
+    except OSError:
+        return None
+
+
+def record_fingerprint(fingerprint):
+    try:
+        fingerprint_path().write_text(fingerprint)
+    except OSError as e:
+        logger.warning("Could not record migration fingerprint: %s", e)
+
+
+def run_migrations(fingerprint):
+    """Runs migrate and records the fingerprint once it succeeded."""
+    from django.core.management import call_command
+
+    try:
+        call_command('migrate', verbosity=0)
+    except Exception:
+        logger.exception("Error running migrations")
+        return False
+    record_fingerprint(fingerprint)
+    return True
+
+
+def migrations_running():
+    return _migrating.is_set()
+
+
+def start_background_migrations(fingerprint, timer):
+    """
+    Runs migrate in a daemon thread. While it runs, BootApplication answers
+    every request with a loading page: new migrations usually add columns
+    the views already select.
+    """
+    _migrating.set()
+
+    def target():
+        succeeded = False
+        try:
+            with timer.phase('migrate(background)'):
+                succeeded = run_migrations(fingerprint)
+        finally:
+            _migrating.clear()
+            # The boot report was logged at the first byte, before this ended
+            logger.info(
+                "Background migrations %s in %.1fms.",
+                'finished' if succeeded else 'failed', timer.phases[-1][1] * 1000,
+            )
+
+    thread = threading.Thread(target=target, name='boot-migrate', daemon=True)
+    thread.start()
+    return thread
+
+
+def migrate_for_boot(mode, timer):
+    """
+    Brings the schema up to date according to the boot mode.
+
+    - ``full``: always runs migrate before serving (previous behaviour).
+    - ``fast``: skips migrate when the migration graph fingerprint matches the
+      recorded one. When it changed, migrations run in the background after
+      the server starts, unless the database was never migrated, in which case
+      there is nothing to serve yet and they run in the foreground.
+    """
+    with timer.phase('fingerprint'):
+        current = migration_fingerprint()
+        recorded = read_recorded_fingerprint() if mode == BOOT_MODE_FAST else None
+
+    if mode == BOOT_MODE_FAST and recorded == current:
+        timer.skip('migrate', 'skipped')
+        return None
+
+    if mode == BOOT_MODE_FAST and recorded is not None:
+        timer.skip('migrate', 'background')
+        return start_background_migrations(current, timer)
+
+    with timer.phase('migrate'):
+        run_migrations(current)
+    return None
+
+
+class BootApplication:
+    """
+    WSGI wrapper used by start_server.
+
+    It records the time to the first response byte in the boot report, then
+    runs ``after_first_byte`` in a background thread (see warm_up below).
+    While background migrations run it answers every request with a 503
+    loading page that reloads itself, so the WebView lands on the app once
+    the schema is up to date.
+    """
+
+    LOADING_PAGE = (
+        '<!DOCTYPE html><html lang="pt-br"><head><meta charset="utf-8">'
+        '<meta http-equiv="refresh" content="2"><title>Guilda</title></head>'
+        '<body><p>Atualizando o banco de dados, tente novamente em instantes.</p></body></html>'
+    ).encode('utf-8')
+
+    def __init__(self, application, timer, after_first_byte=None):
+        self.application = application
+        self.timer = timer
+        self.after_first_byte = after_first_byte
+        self._first_byte_lock = threading.Lock()
+        self._first_byte_seen = False
+
+    def __call__(self, environ, start_response):
+        if migrations_running():
+            start_response('503 Service Unavailable', [
+                ('Content-Type', 'text/html; charset=utf-8'),
+                ('Content-Length', str(len(self.LOADING_PAGE))),
+                ('Retry-After', '2'),
+                ('Cache-Control', 'no-store'),
+            ])
+            return [self.LOADING_PAGE]
+
+        if self._first_byte_seen:
+            return self.application(environ, start_response)
+
+        def timed_start_response(status, headers, exc_info=None):
+            with self._first_byte_lock:
+                if not self._first_byte_seen:
+                    self._first_byte_seen = True
+                    self.timer.record('first-byte', self.timer.elapsed())
+                    self.timer.report()
+                    if self.after_first_byte is not None:
+                        threading.Thread(target=self.after_first_byte, name='boot-warm-up', daemon=True).start()
+            return start_response(status, headers, exc_info)
+
+        return self.application(environ, timed_start_response)
+
+
+def warm_up(timer, profiler=None):
+    """
+    Runs once the first page was served: logs the import profile, if any,
+    and loads everything config/lazy_urls.py deferred.
+    """
+    from config import lazy_urls
+
+    if profiler is not None:
+        profiler.uninstall()
+        profiler.report()
+
+    with timer.phase('warm-up'):
+        lazy_urls.warm_up()
+    logger.info("Warm-up finished in %.1fms.", timer.phases[-1][1] * 1000)
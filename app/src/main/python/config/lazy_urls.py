@@ -0,0 +1,146 @@
+"""
+Lazy URL resolution used by config/urls.py.
+
+Page views are referenced by dotted path and only imported when their URL is
+first requested, and the API (Django REST Framework) and admin URLconfs are
+wrapped in DeferredURLResolver. When deferral is enabled by the boot path,
+those URLconfs stay unloaded until the first page has been served and
+warm_up() runs, so the first page never pays for importing them.
+
+Without deferral (tests, manage.py) every deferred URLconf is loaded the
+first time the URL tree is read, which behaves like a regular include().
+"""
+import threading
+from importlib import import_module
+from django.urls import NoReverseMatch, URLResolver, clear_url_caches, reverse as django_reverse
+from django.urls.resolvers import RoutePattern
+
+_deferring = threading.Event()
+_deferred_resolvers = []
+_lazy_view_modules = set()
+
+
+def enable_deferral():
+    _deferring.set()
+
+
+def lazy_view(dotted_path):
+    """Returns a view that imports ``dotted_path`` on its first call."""
+    module_path, name = dotted_path.rsplit('.', 1)
+    _lazy_view_modules.add(module_path)
+
+    def view(request, *args, **kwargs):
+        return getattr(import_module(module_path), name)(request, *args, **kwargs)
+
+    view.__module__ = module_path
+    view.__name__ = view.__qualname__ = name
+    return view
+
+
+class DeferredURLResolver(URLResolver):
+    """
+    URLResolver whose patterns are built by ``loader`` on first use.
+
+    While deferral is enabled and the loader has not run, it exposes no
+    patterns, so reversing the main URLconf does not load it. A request whose
+    path falls under its prefix loads it synchronously.
+    """
+
+    def __init__(self, route, loader, app_name=None, namespace=None):
+        super().__init__(RoutePattern(route, is_endpoint=False), None, app_name=app_name, namespace=namespace)
+        self.loader = loader
+        self._patterns = None
+        self._load_lock = threading.Lock()
+        _deferred_resolvers.append(self)
+
+    @property
+    def loaded(self):
+        return self._patterns is not None
+
+    @property
+    def url_patterns(self):
+        if not self.loaded and _deferring.is_set():
+            return []
+        return self.load()
+
+    def load(self):
+        if self._patterns is not None:
+            return self._patterns
+
+        with self._load_lock:
+            if self._patterns is None:
+                self._patterns = list(self.loader())
+                # Drop whatever was populated while the patterns were hidden
+                self._reverse_dict.clear()
+                self._namespace_dict.clear()
+                self._app_dict.clear()
+                self._callback_strs = set()
+                self._populated = False
+                clear_url_caches()
+        return self._patterns
+
+    def _populate(self):
+        patterns_seen = self._patterns
+        super()._populate()
+        if self._patterns is not patterns_seen:
+            # Loaded by another thread while populating; populate again on next use
+            self._populated = False
+
+    def resolve(self, path):
+        if not self.loaded and self.pattern.match(str(path)):
+            self.load()
+        return super().resolve(path)
+
+
+def deferred_include(route, module_path, app_name=None, namespace=None):
+    """Deferred counterpart of ``path(route, include(module_path))``."""
+    return DeferredURLResolver(
+        route,
+        lambda: import_module(module_path).urlpatterns,
+        app_name=app_name,
+        namespace=namespace,
+    )
+
+
+def deferred_admin(route):
+    """Deferred counterpart of ``path(route, admin.site.urls)``."""
+    def loader():
+        from django.contrib import admin
+        admin.autodiscover()
+        return admin.site.urls[0]
+
+    return DeferredURLResolver(route, loader, app_name='admin', namespace='admin')
+
+
+def reverse(viewname, *args, **kwargs):
+    """
+    ``django.urls.reverse()`` that also finds names of deferred URLconfs.
+
+    While deferral hides them, a miss loads the unloaded resolvers one at a
+    time and tries again, so pages that link to the API can be rendered
+    before warm_up() has run.
+    """
+    try:
+        return django_reverse(viewname, *args, **kwargs)
+    except NoReverseMatch:
+        pending = [resolver for resolver in _deferred_resolvers if not resolver.loaded]
+        if not pending:
+            raise
+    for resolver in pending:
+        resolver.load()
+        try:
+            return django_reverse(viewname, *args, **kwargs)
+        except NoReverseMatch:
+            continue
+    raise NoReverseMatch(f"Reverse for '{viewname}' not found in any URLconf.")
+
+
+def warm_up():
+    """Loads every deferred URLconf and imports every lazy view module."""
+    from django.conf import settings
+    import_module(settings.ROOT_URLCONF)
+    for resolver in _deferred_resolvers:
+        resolver.load()
+    for module_path in sorted(_lazy_view_modules):
+        import_module(module_path)
+    _deferring.clear()
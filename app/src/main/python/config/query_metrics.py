@@ -0,0 +1,75 @@
+"""
+Per-request SQL instrumentation.
+
+QueryMetricsMiddleware wraps every query of the request (connection
+execute_wrapper, so it also works with DEBUG off) and reports the number of
+queries, the total SQL time and the time of the slowest statement as
+response headers. The SQL of the slowest statement only goes to the log
+line on the 'guilda.queries' logger, logged at DEBUG, or at WARNING when the
+request exceeds QUERY_METRICS_WARN_COUNT queries.
+
+Writes handed to the write queue run on the writer thread's connection; the
+queue installs the request's wrapper there for the unit
+(config/write_queue.py), so they are counted too.
+
+On with DEBUG only, unless GUILDA_QUERY_METRICS=1: the headers are public.
+"""
+import logging
+import time
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger('guilda.queries')
+
+
+class QueryMetrics:
+    """execute_wrapper collecting the statements of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.slowest_sql = ''
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.total += elapsed
+            if elapsed >= self.slowest:
+                self.slowest = elapsed
+                self.slowest_sql = sql
+
+    def headers(self):
+        return {
+            'X-Query-Count': str(self.count),
+            'X-Query-Time-Ms': f"{self.total * 1000:.1f}",
+            'X-Slowest-Query-Ms': f"{self.slowest * 1000:.1f}",
+        }
+
+
+class QueryMetricsMiddleware:
+    def __init__(self, get_response):
+        if not settings.QUERY_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = QueryMetrics()
+        with connection.execute_wrapper(metrics):
+            response = self.get_response(request)
+
+        for header, value in metrics.headers().items():
+            response[header] = value
+
+        level = logging.WARNING if metrics.count > settings.QUERY_METRICS_WARN_COUNT else logging.DEBUG
+        logger.log(
+            level, "%s %s: %d queries in %.1fms, slowest %.1fms: %s",
+            request.method, request.path, metrics.count, metrics.total * 1000,
+            metrics.slowest * 1000, metrics.slowest_sql,
+        )
+        return response
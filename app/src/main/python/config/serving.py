@@ -0,0 +1,90 @@
+"""
+waitress serving profiles.
+
+app_main.start_server used to call serve() with waitress' defaults: 4
+threads whatever the device, select() over the sockets, a 100 connection
+limit and a 120 s idle timeout. server_options() turns SERVING_PROFILE
+(GUILDA_SERVING_PROFILE) into the keyword arguments of waitress.serve:
+
+- threads: ``threads_per_core`` x the cores this process may run on
+  (affinity, not the whole SoC), within [min_threads, max_threads], then
+  scaled to the database mode. With the rollback journal every reader
+  waits for a writer, so threads beyond a few only queue on the lock; with
+  WAL readers run alongside the writer; with the write queue
+  (config/write_queue.py) the writes leave the request threads too.
+- connection_limit and backlog: the WebView opens a handful of
+  connections, but a page pulling its models and tiles can burst.
+- channel_timeout: idle keep-alive connections are closed sooner.
+- send_bytes: socket write size for the static files and JSON bodies.
+- asyncore_use_poll: poll() has no FD_SETSIZE limit on the socket map,
+  whose size connection_limit now bounds.
+
+'waitress' keeps waitress' own defaults. GUILDA_SERVING_THREADS forces the
+thread count of any profile. benchmarks/serving_profiles.py measures the
+profiles on a device class and picks the best.
+"""
+import os
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+PROFILES = {
+    'waitress': None,
+    # 1-2 core phones: few threads, little buffering
+    'low': {
+        'threads_per_core': 2, 'min_threads': 2, 'max_threads': 4,
+        'connection_limit': 32, 'backlog': 64, 'channel_timeout': 30, 'send_bytes': 16384,
+    },
+    'balanced': {
+        'threads_per_core': 2, 'min_threads': 4, 'max_threads': 8,
+        'connection_limit': 64, 'backlog': 128, 'channel_timeout': 30, 'send_bytes': 65536,
+    },
+    # Tablets and 8-core phones serving several WebViews
+    'throughput': {
+        'threads_per_core': 3, 'min_threads': 4, 'max_threads': 16,
+        'connection_limit': 128, 'backlog': 256, 'channel_timeout': 60, 'send_bytes': 262144,
+    },
+}
+
+# Thread multiplier per database mode (see the module docstring)
+DB_MODE_FACTORS = {'rollback': 0.5, 'wal': 1.0, 'wal+queue': 1.5}
+
+
+def available_cores():
+    """Cores this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def db_mode():
+    if settings.SQLITE_PROFILE == 'default':
+        return 'rollback'
+    return 'wal+queue' if settings.WRITE_QUEUE else 'wal'
+
+
+def thread_count(profile, cores, mode):
+    threads = round(cores * profile['threads_per_core'] * DB_MODE_FACTORS[mode])
+    return max(profile['min_threads'], min(profile['max_threads'], threads))
+
+
+def server_options(name=None, cores=None, mode=None):
+    """Keyword arguments of waitress.serve for profile ``name`` (SERVING_PROFILE by default)."""
+    name = name or settings.SERVING_PROFILE
+    try:
+        profile = PROFILES[name]
+    except KeyError:
+        raise ImproperlyConfigured(f"Unknown SERVING_PROFILE {name!r}: expected one of {', '.join(PROFILES)}")
+
+    options = {}
+    if profile is not None:
+        options = {
+            'threads': thread_count(profile, cores or available_cores(), mode or db_mode()),
+            'connection_limit': profile['connection_limit'],
+            'backlog': profile['backlog'],
+            'channel_timeout': profile['channel_timeout'],
+            'send_bytes': profile['send_bytes'],
+            'asyncore_use_poll': True,
+        }
+    if settings.SERVING_THREADS:
+        options['threads'] = settings.SERVING_THREADS
+    return options
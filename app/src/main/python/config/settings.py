@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -31,7 +32,8 @@ ALLOWED_HOSTS = ['127.0.0.1', 'localhost', '0.0.0.0']
 # Application definition
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    # Admin modules are autodiscovered when the admin URLconf is first loaded (config/lazy_urls.py)
+    'django.contrib.admin.apps.SimpleAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -43,21 +45,25 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'config.query_metrics.QueryMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Static files are answered before sessions, CSRF and the rest run
+    "whitenoise.middleware.WhiteNoiseMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    "whitenoise.middleware.WhiteNoiseMiddleware"
 ]
 
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that imports tag libraries on first {% load %} (config/template_backend.py)
+        'BACKEND': 'config.template_backend.LazyDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -79,9 +85,28 @@ WSGI_APPLICATION = 'config.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('GUILDA_DB_PATH', BASE_DIR / 'db.sqlite3'),
+        # One connection per waitress thread, kept across requests (seconds; unset = forever)
+        'CONN_MAX_AGE': int(os.environ['GUILDA_DB_CONN_MAX_AGE']) if os.environ.get('GUILDA_DB_CONN_MAX_AGE') else None,
+        'CONN_HEALTH_CHECKS': True,
+        # A file (not the shared in-memory default) so that tests exercising
+        # concurrent threads get SQLite's regular locking with busy timeout.
+        'TEST': {
+            # Per run, so concurrent test runs never share (or delete) it
+            'NAME': os.path.join(tempfile.gettempdir(), f"guilda_test_db_{os.getpid()}.sqlite3"),
+        },
     }
 }
+# Pragmas run on every new connection: 'wal' or 'default' (config/sqlite.py)
+SQLITE_PROFILE = os.environ.get('GUILDA_SQLITE_PROFILE', 'wal')
+# Writes of the console actions, quest completion and dispatch resolution
+# handed to a single writer thread (config/write_queue.py); off by default
+WRITE_QUEUE = os.environ.get('GUILDA_WRITE_QUEUE', '0') == '1'
+WRITE_QUEUE_SIZE = int(os.environ.get('GUILDA_WRITE_QUEUE_SIZE', '64'))
+WRITE_QUEUE_BATCH = int(os.environ.get('GUILDA_WRITE_QUEUE_BATCH', '16'))
+WRITE_QUEUE_TIMEOUT = float(os.environ.get('GUILDA_WRITE_QUEUE_TIMEOUT', '10'))
+# Added to WRITE_QUEUE_TIMEOUT: how long a caller waits for its write to run
+WRITE_QUEUE_RUN_TIMEOUT = float(os.environ.get('GUILDA_WRITE_QUEUE_RUN_TIMEOUT', '30'))
 
 
 # Password validation
@@ -122,14 +147,68 @@ STATIC_URL = 'static/'
 
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
-# Ativa a compressão e cache do WhiteNoise
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedStaticFilesStorage'
+# Ativa a compressão e cache do WhiteNoise: nomes com hash do conteúdo,
+# .gz/.br pré-comprimidos e cache imutável (config/storage.py). O manifesto é
+# gerado por `manage.py build_static`; sem ele os arquivos saem sem hash.
+STATICFILES_STORAGE = 'config.storage.StaticFilesStorage'
 
 WHITENOISE_USE_FINDERS = True
+# Os nomes sem hash continuam servidos pelos finders; STATIC_ROOT só guarda os com hash
+WHITENOISE_KEEP_ONLY_HASHED_FILES = True
 
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# QR codes dos códigos de guilda, gerados uma vez (guilda_manager/qr.py)
+QR_CACHE_DIR = Path(os.environ.get('GUILDA_QR_CACHE_DIR', MEDIA_ROOT / 'qr'))
+
+# Boot
+# 'fast' skips migrate when the migration graph did not change since the last
+# successful run (see config/boot.py); 'full' always migrates before serving.
+BOOT_MODE = os.environ.get('GUILDA_BOOT_MODE', 'fast')
+BOOT_FINGERPRINT_PATH = Path(f"{DATABASES['default']['NAME']}.migrations")
+# Keep DRF, the admin and the views out of the first request (config/lazy_urls.py)
+BOOT_LAZY_URLS = os.environ.get('GUILDA_LAZY_URLS', '1') == '1'
+
+# waitress: 'low', 'balanced', 'throughput' or 'waitress' (its defaults), sized
+# from the cores and the database mode (config/serving.py)
+SERVING_PROFILE = os.environ.get('GUILDA_SERVING_PROFILE', 'balanced')
+SERVING_THREADS = int(os.environ.get('GUILDA_SERVING_THREADS', '0'))
+# 'tcp' on SERVING_HOST:8000, or 'unix' on SERVING_SOCKET with a loopback
+# proxy on 127.0.0.1:8000 for the WebView ('@name': abstract socket; config/transport.py)
+SERVING_TRANSPORT = os.environ.get('GUILDA_SERVING_TRANSPORT', 'tcp')
+# Loopback only; 0.0.0.0 to serve the local network too
+SERVING_HOST = os.environ.get('GUILDA_SERVING_HOST', '127.0.0.1')
+SERVING_SOCKET = os.environ.get('GUILDA_SERVING_SOCKET', str(Path(DATABASES['default']['NAME']).parent / 'guilda.sock'))
+
+# Query count / SQL time headers and log line per request (config/query_metrics.py)
+QUERY_METRICS = os.environ.get('GUILDA_QUERY_METRICS', '1' if DEBUG else '0') == '1'
+QUERY_METRICS_WARN_COUNT = int(os.environ.get('GUILDA_QUERY_METRICS_WARN_COUNT', '30'))
+
+# Pin models: triangle budget of a pin on the hex map, where it covers a few
+# dozen pixels. The lightest adequate LOD variant is served (guilda_manager/pins.py).
+PIN_MAP_MAX_TRIANGLES = int(os.environ.get('GUILDA_PIN_MAP_MAX_TRIANGLES', '10000'))
+
+# Map backgrounds: longest side of the processed level mapa.html draws as the
+# ground texture (guilda_manager/map_images.py). The Mestre console uses 1024.
+MAP_TEXTURE_MAX_SIZE = int(os.environ.get('GUILDA_MAP_TEXTURE_MAX_SIZE', '2048'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'guilda': {
+            'handlers': ['console'],
+            'level': os.environ.get('GUILDA_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/6.0/ref/settings/#default-auto-field
@@ -0,0 +1,53 @@
+"""
+SQLite connection profile.
+
+Every new connection gets the pragmas of SQLITE_PROFILE (connection_created
+hook, connected in GuildaManagerConfig.ready):
+
+- 'wal': write-ahead log, so the map and the sede keep reading while the
+  Mestre screen writes (readers no longer wait for the writer's lock);
+  synchronous=NORMAL, durable across app crashes and only able to lose the
+  last commits on power loss, fsyncs at checkpoints instead of at every
+  commit; a busy timeout so a second writer waits for the first instead of
+  failing with "database is locked"; the file memory-mapped, a bigger page
+  cache and temporary tables in memory.
+- 'default': SQLite's defaults (rollback journal), as before.
+
+With CONN_MAX_AGE (GUILDA_DB_CONN_MAX_AGE, persistent by default) each
+waitress thread keeps its connection across requests, so the pragmas run
+once per thread rather than once per request.
+
+journal_mode=WAL is stored in the database file: going back to 'default'
+leaves the file in WAL until journal_mode=DELETE is run on it.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+PROFILES = {
+    'default': {},
+    'wal': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,  # ms
+        'mmap_size': 64 * 1024 * 1024,
+        'cache_size': -16000,  # KiB (negative: size, not pages)
+        'temp_store': 'MEMORY',
+    },
+}
+
+
+def profile_pragmas(name=None):
+    name = name or settings.SQLITE_PROFILE
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ImproperlyConfigured(f"Unknown SQLITE_PROFILE {name!r}: expected one of {', '.join(PROFILES)}")
+
+
+def apply_profile(sender, connection, **kwargs):
+    """connection_created receiver."""
+    if connection.vendor != 'sqlite':
+        return
+    # On the DB-API connection: not a query of the request being measured
+    for pragma, value in profile_pragmas().items():
+        connection.connection.execute(f"PRAGMA {pragma} = {value}")
@@ -0,0 +1,28 @@
+"""
+Static files storage: content-hashed names, precompressed variants.
+
+`manage.py build_static` runs collectstatic into STATIC_ROOT with this
+storage, which copies every asset under a name carrying the hash of its
+content (waxseal.png -> waxseal.1f2e3d4c5b6a.png), records the mapping in
+staticfiles.json and writes .gz (and, when the ``brotli`` package is
+installed at build time, .br) next to the compressible files. {% static %}
+then returns the hashed URLs, which WhiteNoise serves with
+``Cache-Control: max-age=315360000, public, immutable`` and the best
+encoding the client accepts.
+
+Until build_static has run (development, tests, an APK built without it)
+there is no manifest: the unhashed names are served from the app static
+directories through the finders, as before, with WhiteNoise's short max-age.
+"""
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class StaticFilesStorage(CompressedManifestStaticFilesStorage):
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Added after the last build_static: still served by the finders
+            return name
@@ -0,0 +1,69 @@
+"""
+Django template backend that imports template tag libraries on first use.
+
+The stock backend imports the templatetags modules of every installed app
+when the engine is created, i.e. while rendering the first page. Here that
+means the whole of Django REST Framework (through rest_framework.templatetags)
+before the first screen can be shown. This backend only lists the libraries
+up front and imports each one when a template ``{% load %}``s it.
+"""
+from collections.abc import Mapping
+from importlib import import_module
+from pkgutil import walk_packages
+from django.apps import apps
+from django.template.backends.django import DjangoTemplates
+from django.template.library import import_library
+
+
+def get_template_tag_paths():
+    """
+    Yields (library name, module path) for every templatetags module of
+    Django and of the installed apps, importing only the packages.
+    """
+    candidates = ['django.templatetags']
+    candidates.extend(f"{app_config.name}.templatetags" for app_config in apps.get_app_configs())
+
+    for candidate in candidates:
+        try:
+            package = import_module(candidate)
+        except ImportError:
+            continue
+        if not hasattr(package, '__path__'):
+            continue
+        modules = walk_packages(package.__path__, candidate + '.')
+        for _, full_name, is_pkg in modules:
+            if not is_pkg:
+                yield full_name[len(candidate) + 1:], full_name
+
+
+class LazyLibraries(Mapping):
+    """Library name -> Library mapping that imports each library on lookup."""
+
+    def __init__(self, paths):
+        self._paths = dict(paths)
+        self._loaded = {}
+
+    def __getitem__(self, name):
+        library = self._loaded.get(name)
+        if library is None:
+            library = self._loaded[name] = import_library(self._paths[name])
+        return library
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+
+class LazyDjangoTemplates(DjangoTemplates):
+    def __init__(self, params):
+        super().__init__(params)
+        libraries = dict(get_template_tag_paths())
+        libraries.update(params['OPTIONS'].get('libraries', {}))
+        self.engine.libraries = libraries
+        self.engine.template_libraries = LazyLibraries(libraries)
+
+    def get_templatetag_libraries(self, custom_libraries):
+        # Nothing for the engine to import up front: __init__ hands it LazyLibraries
+        return {}
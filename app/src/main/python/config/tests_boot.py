@@ -0,0 +1,109 @@
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+from django.test import SimpleTestCase, override_settings
+from config import boot
+
+
+class MigrateForBootTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.fingerprint_file = Path(self.tmp.name) / 'db.sqlite3.migrations'
+        override = override_settings(BOOT_FINGERPRINT_PATH=self.fingerprint_file)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        database_exists = patch('config.boot.database_exists', return_value=True)
+        database_exists.start()
+        self.addCleanup(database_exists.stop)
+
+    def test_fingerprint_is_stable_and_covers_app_migrations(self):
+        fingerprint = boot.migration_fingerprint()
+        self.assertEqual(fingerprint, boot.migration_fingerprint())
+
+        with patch('config.boot.pkgutil.iter_modules', return_value=[]):
+            self.assertNotEqual(fingerprint, boot.migration_fingerprint())
+
+    def test_first_boot_migrates_in_foreground(self):
+        timer = boot.BootTimer()
+        with patch('django.core.management.call_command') as call_command:
+            thread = boot.migrate_for_boot(boot.BOOT_MODE_FAST, timer)
+
+        self.assertIsNone(thread)
+        call_command.assert_called_once_with('migrate', verbosity=0)
+        self.assertEqual(self.fingerprint_file.read_text(), boot.migration_fingerprint())
+
+    def test_unchanged_graph_skips_migrate(self):
+        self.fingerprint_file.write_text(boot.migration_fingerprint())
+        timer = boot.BootTimer()
+
+        with patch('django.core.management.call_command') as call_command:
+            thread = boot.migrate_for_boot(boot.BOOT_MODE_FAST, timer)
+
+        self.assertIsNone(thread)
+        call_command.assert_not_called()
+        self.assertIn(('migrate', 'skipped'), timer.phases)
+
+    def test_full_mode_always_migrates(self):
+        self.fingerprint_file.write_text(boot.migration_fingerprint())
+
+        with patch('django.core.management.call_command') as call_command:
+            boot.migrate_for_boot(boot.BOOT_MODE_FULL, boot.BootTimer())
+
+        call_command.assert_called_once_with('migrate', verbosity=0)
+
+    def test_changed_graph_migrates_in_background(self):
+        self.fingerprint_file.write_text('outdated')
+
+        with patch('django.core.management.call_command') as call_command, \
+             self.assertLogs('guilda.boot', level='INFO') as logs:
+            thread = boot.migrate_for_boot(boot.BOOT_MODE_FAST, boot.BootTimer())
+            thread.join(timeout=5)
+
+        call_command.assert_called_once_with('migrate', verbosity=0)
+        self.assertFalse(boot.migrations_running())
+        self.assertEqual(self.fingerprint_file.read_text(), boot.migration_fingerprint())
+        self.assertTrue(any('Background migrations finished in' in line for line in logs.output))
+
+    def test_failed_migrations_are_logged(self):
+        with patch('django.core.management.call_command', side_effect=RuntimeError("boom")), \
+             self.assertLogs('guilda.boot', level='ERROR') as logs:
+            self.assertFalse(boot.run_migrations('new'))
+
+        self.assertIn('Error running migrations', logs.output[0])
+        self.assertFalse(self.fingerprint_file.exists())
+
+
+class BootApplicationTests(SimpleTestCase):
+    def setUp(self):
+        self.timer = boot.BootTimer()
+        self.calls = []
+
+        def inner_app(environ, start_response):
+            start_response('200 OK', [])
+            return [b'ok']
+
+        self.app = boot.BootApplication(inner_app, self.timer)
+
+    def start_response(self, status, headers, exc_info=None):
+        self.calls.append(status)
+
+    def test_first_byte_is_reported_once(self):
+        with self.assertLogs('guilda.boot', level='INFO') as logs:
+            self.app({'REQUEST_METHOD': 'GET'}, self.start_response)
+        self.app({'REQUEST_METHOD': 'GET'}, self.start_response)
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('first-byte=', logs.output[0])
+        self.assertEqual([name for name, _ in self.timer.phases], ['first-byte'])
+
+    def test_every_request_waits_for_migrations(self):
+        with patch('config.boot.migrations_running', return_value=True):
+            self.app({'REQUEST_METHOD': 'POST'}, self.start_response)
+            body = self.app({'REQUEST_METHOD': 'GET'}, self.start_response)
+        with self.assertLogs('guilda.boot', level='INFO'):
+            self.app({'REQUEST_METHOD': 'GET'}, self.start_response)
+
+        self.assertEqual(self.calls, ['503 Service Unavailable', '503 Service Unavailable', '200 OK'])
+        self.assertIn(b'http-equiv="refresh"', b''.join(body))
@@ -0,0 +1,102 @@
+from unittest import mock
+from django.conf import settings
+from django.template import engines
+from django.test import SimpleTestCase, TestCase
+from django.urls import NoReverseMatch, Resolver404, clear_url_caches, path, reverse
+from config import lazy_urls
+from config.template_backend import LazyDjangoTemplates, LazyLibraries
+from guilda_manager.models import Guild
+
+
+def dummy_view(request):
+    pass
+
+
+class DeferredURLResolverTests(SimpleTestCase):
+    def setUp(self):
+        self.loads = 0
+
+        def loader():
+            self.loads += 1
+            return [path('thing/', dummy_view, name='deferred-thing')]
+
+        self.resolver = lazy_urls.DeferredURLResolver('deferred/', loader)
+        self.addCleanup(lazy_urls._deferred_resolvers.remove, self.resolver)
+        self.addCleanup(lazy_urls._deferring.clear)
+
+    def test_loads_on_first_use_without_deferral(self):
+        self.assertEqual(len(self.resolver.url_patterns), 1)
+        self.assertEqual(len(self.resolver.url_patterns), 1)
+        self.assertEqual(self.loads, 1)
+
+    def test_hidden_while_deferring_until_requested(self):
+        lazy_urls.enable_deferral()
+        self.assertEqual(self.resolver.url_patterns, [])
+        self.assertNotIn('deferred-thing', self.resolver.reverse_dict)
+
+        with self.assertRaises(Resolver404):
+            self.resolver.resolve('other/')
+        self.assertEqual(self.loads, 0)
+
+        match = self.resolver.resolve('deferred/thing/')
+        self.assertEqual(match.func, dummy_view)
+        self.assertIn('deferred-thing', self.resolver.reverse_dict)
+        self.assertEqual(self.loads, 1)
+
+    def test_lazy_view_keeps_name_for_reverse(self):
+        view = lazy_urls.lazy_view('guilda_manager.views.sede_view')
+        self.assertEqual(view.__module__, 'guilda_manager.views')
+        self.assertEqual(view.__name__, 'sede_view')
+        self.assertEqual(reverse('sede'), '/sede/')
+
+
+class ColdStartPagesTests(TestCase):
+    """Pages rendered before warm_up(), with the API URLconf still hidden."""
+
+    def setUp(self):
+        for resolver in lazy_urls._deferred_resolvers:
+            resolver._patterns = None
+            resolver._populated = False
+        lazy_urls.enable_deferral()
+        clear_url_caches()
+        self.addCleanup(clear_url_caches)
+        self.addCleanup(lazy_urls._deferring.clear)
+        Guild.objects.create(name="Cold Guild")
+
+    def test_pages_reversing_api_urls(self):
+        for url in ('/mapa/', '/mestre/'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'const REGION_URL = "/api/hex-regions/"')
+
+    def test_reverse_finds_deferred_names(self):
+        self.assertEqual(lazy_urls.reverse('hex-region-list'), '/api/hex-regions/')
+        self.assertEqual(lazy_urls.reverse('sede'), '/sede/')
+        with self.assertRaises(NoReverseMatch):
+            lazy_urls.reverse('no-such-page')
+
+
+class LazyTemplateLibrariesTests(TestCase):
+    def test_libraries_are_listed_not_imported(self):
+        libraries = engines['django'].engine.template_libraries
+        self.assertIsInstance(libraries, LazyLibraries)
+        self.assertIn('static', libraries)
+        self.assertIn('rest_framework', libraries)
+
+    def test_creating_the_backend_imports_no_library(self):
+        params = {**settings.TEMPLATES[0], 'OPTIONS': {'libraries': {'guilda_test': 'django.templatetags.static'}}}
+        params.pop('BACKEND')
+        with mock.patch('django.template.engine.import_library') as stock_import, \
+                mock.patch('config.template_backend.import_library') as lazy_import:
+            backend = LazyDjangoTemplates(params)
+            # Only the builtins (defaulttags, ...), as with the stock backend
+            self.assertNotIn(mock.call('django.templatetags.static'), stock_import.call_args_list)
+            lazy_import.assert_not_called()
+            backend.engine.template_libraries['guilda_test']
+        lazy_import.assert_called_once_with('django.templatetags.static')
+
+    def test_browsable_api_still_renders(self):
+        response = self.client.get('/api/guilds/', HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Django REST framework')
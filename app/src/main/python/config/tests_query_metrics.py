@@ -0,0 +1,44 @@
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from config.query_metrics import QueryMetricsMiddleware
+
+
+def two_queries_view(request):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.execute("SELECT 2")
+    return HttpResponse("ok")
+
+
+@override_settings(QUERY_METRICS=True)
+class QueryMetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/metrics/')
+
+    def test_headers_report_queries_of_the_request(self):
+        with self.assertLogs('guilda.queries', level='DEBUG') as logs:
+            response = QueryMetricsMiddleware(two_queries_view)(self.request)
+
+        self.assertEqual(response['X-Query-Count'], '2')
+        self.assertGreaterEqual(float(response['X-Query-Time-Ms']), float(response['X-Slowest-Query-Ms']))
+        self.assertEqual(logs.records[0].levelname, 'DEBUG')
+        self.assertIn('GET /metrics/: 2 queries', logs.output[0])
+
+    def test_sql_stays_out_of_the_headers(self):
+        with self.assertLogs('guilda.queries', level='DEBUG') as logs:
+            response = QueryMetricsMiddleware(two_queries_view)(self.request)
+
+        self.assertFalse([header for header, value in response.items() if 'SELECT' in value])
+        self.assertIn('SELECT', logs.output[0])
+
+    @override_settings(QUERY_METRICS_WARN_COUNT=1)
+    def test_requests_over_the_warning_count_log_a_warning(self):
+        with self.assertLogs('guilda.queries', level='WARNING'):
+            QueryMetricsMiddleware(two_queries_view)(self.request)
+
+    @override_settings(QUERY_METRICS=False)
+    def test_can_be_disabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            QueryMetricsMiddleware(two_queries_view)
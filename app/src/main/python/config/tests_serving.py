@@ -0,0 +1,34 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+from waitress.adjustments import Adjustments
+from config.serving import PROFILES, db_mode, server_options
+
+
+class ServingProfileTests(SimpleTestCase):
+    def test_threads_follow_cores_and_database_mode(self):
+        self.assertEqual(server_options('balanced', cores=1, mode='wal')['threads'], 4)
+        self.assertEqual(server_options('balanced', cores=3, mode='wal')['threads'], 6)
+        self.assertEqual(server_options('balanced', cores=8, mode='wal')['threads'], 8)
+        self.assertEqual(server_options('throughput', cores=4, mode='wal+queue')['threads'], 16)
+        self.assertEqual(server_options('throughput', cores=4, mode='rollback')['threads'], 6)
+
+    def test_database_mode(self):
+        with override_settings(SQLITE_PROFILE='default', WRITE_QUEUE=False):
+            self.assertEqual(db_mode(), 'rollback')
+        with override_settings(SQLITE_PROFILE='wal', WRITE_QUEUE=True):
+            self.assertEqual(db_mode(), 'wal+queue')
+
+    def test_every_profile_is_valid_for_waitress(self):
+        for name in PROFILES:
+            with self.subTest(profile=name):
+                adjustments = Adjustments(**server_options(name, cores=4, mode='wal'))
+                self.assertGreater(adjustments.threads, 0)
+        self.assertEqual(server_options('waitress'), {})
+
+    @override_settings(SERVING_PROFILE='low', SERVING_THREADS=3)
+    def test_settings_choose_the_profile(self):
+        options = server_options(cores=8)
+        self.assertEqual(options['threads'], 3)
+        self.assertEqual(options['connection_limit'], PROFILES['low']['connection_limit'])
+        with self.assertRaises(ImproperlyConfigured):
+            server_options('turbo')
@@ -0,0 +1,48 @@
+import os
+import sqlite3
+import tempfile
+from types import SimpleNamespace
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from config.sqlite import PROFILES, apply_profile, profile_pragmas
+
+
+class SQLiteProfileTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_test_database_connection_uses_the_wal_profile(self):
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma('busy_timeout'), PROFILES['wal']['busy_timeout'])
+        self.assertEqual(self.pragma('temp_store'), 2)  # MEMORY
+        self.assertEqual(self.pragma('cache_size'), PROFILES['wal']['cache_size'])
+
+
+class ApplyProfileTests(SimpleTestCase):
+    def connect(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        raw = sqlite3.connect(os.path.join(tmp.name, 'db.sqlite3'))
+        self.addCleanup(raw.close)
+        return raw, SimpleNamespace(vendor='sqlite', connection=raw)
+
+    def test_default_profile_changes_nothing(self):
+        raw, wrapper = self.connect()
+        with override_settings(SQLITE_PROFILE='default'):
+            apply_profile(sender=None, connection=wrapper)
+        self.assertEqual(raw.execute("PRAGMA journal_mode").fetchone()[0], 'delete')
+
+    def test_wal_profile(self):
+        raw, wrapper = self.connect()
+        with override_settings(SQLITE_PROFILE='wal'):
+            apply_profile(sender=None, connection=wrapper)
+        self.assertEqual(raw.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+        self.assertEqual(raw.execute("PRAGMA synchronous").fetchone()[0], 1)
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ImproperlyConfigured):
+            profile_pragmas('fast')
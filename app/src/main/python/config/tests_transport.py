@@ -0,0 +1,64 @@
+import http.client
+import os
+import stat
+import tempfile
+import threading
+from django.test import SimpleTestCase
+from waitress.server import create_server
+from config.transport import LocalProxy, bind_unix_socket, connect_unix
+
+
+def hello_app(environ, start_response):
+    body = f"{environ['REQUEST_METHOD']} {environ['PATH_INFO']}".encode()
+    start_response('200 OK', [('Content-Type', 'text/plain'), ('Content-Length', str(len(body)))])
+    return [body]
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        super().__init__('localhost')
+        self.path = path
+
+    def connect(self):
+        self.sock = connect_unix(self.path)
+
+
+class UnixTransportTests(SimpleTestCase):
+    def serve(self, path):
+        server = create_server(hello_app, sockets=[bind_unix_socket(path)], threads=2)
+        threading.Thread(target=server.run, daemon=True).start()
+        self.addCleanup(server.close)
+
+    def get(self, connection, path):
+        connection.request('GET', path)
+        response = connection.getresponse()
+        return response.status, response.read()
+
+    def test_socket_file_and_proxy(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, 'guilda.sock')
+        # A stale socket of a previous run is replaced
+        bind_unix_socket(path).close()
+        self.serve(path)
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+
+        direct = UnixHTTPConnection(path)
+        self.addCleanup(direct.close)
+        self.assertEqual(self.get(direct, '/api/'), (200, b'GET /api/'))
+        # Keep-alive on the same connection
+        self.assertEqual(self.get(direct, '/mapa/'), (200, b'GET /mapa/'))
+
+        proxy = LocalProxy(path, port=0).start()
+        self.addCleanup(proxy.stop)
+        connection = http.client.HTTPConnection('127.0.0.1', proxy.port)
+        self.addCleanup(connection.close)
+        for url in ('/sede/', '/missoes/'):
+            self.assertEqual(self.get(connection, url), (200, f"GET {url}".encode()))
+
+    def test_abstract_socket(self):
+        name = f"@guilda-test-{os.getpid()}"
+        self.serve(name)
+        connection = UnixHTTPConnection(name)
+        self.addCleanup(connection.close)
+        self.assertEqual(self.get(connection, '/'), (200, b'GET /'))
@@ -0,0 +1,196 @@
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
+from django.db import DatabaseError, OperationalError, connection, transaction
+from django.db.models import F
+from django.test import TransactionTestCase, override_settings
+from config import write_queue
+from config.query_metrics import QueryMetrics
+from config.write_queue import WriteQueue, WriteTimeout, serialized_write
+from guilda_manager.models import Guild, Quest
+
+
+def add_funds(guild_id, amount):
+    Guild.objects.filter(pk=guild_id).update(funds=F('funds') + amount)
+    return threading.current_thread().name
+
+
+class WriteQueueTests(TransactionTestCase):
+    def setUp(self):
+        self.guild = Guild.objects.create(name="Writer Guild", funds=Decimal('0'))
+        self.writer = WriteQueue(size=8, batch=16, timeout=5)
+        self.addCleanup(self.writer.stop)
+
+    def hold_writer(self):
+        """Keeps the writer busy until the returned gate is set, so the next units queue up."""
+        running, gate = threading.Event(), threading.Event()
+
+        def block():
+            running.set()
+            gate.wait()
+
+        blocker = threading.Thread(target=self.writer.execute, args=(block,))
+        blocker.start()
+        running.wait()
+        self.addCleanup(blocker.join)
+        self.addCleanup(gate.set)
+        return gate
+
+    def wait_for_queue(self, size):
+        while self.writer._queue.qsize() < size:
+            time.sleep(0.005)
+
+    def test_units_run_on_the_writer_and_are_coalesced(self):
+        gate = self.hold_writer()
+        threads = [
+            threading.Thread(target=self.writer.execute, args=(add_funds, (self.guild.pk, 1))) for _ in range(6)
+        ]
+        for thread in threads:
+            thread.start()
+        self.wait_for_queue(6)
+        gate.set()
+        for thread in threads:
+            thread.join()
+
+        self.guild.refresh_from_db()
+        self.assertEqual(self.guild.funds, 6)
+        self.assertEqual(self.writer.stats['units'], 7)
+        self.assertEqual(self.writer.stats['batches'], 2)
+        self.assertEqual(self.writer.execute(add_funds, (self.guild.pk, 0)), 'guilda-writer')
+
+    def test_failing_unit_only_rolls_back_itself(self):
+        def fail():
+            Guild.objects.filter(pk=self.guild.pk).update(funds=F('funds') + 100)
+            raise ValueError("no")
+
+        gate = self.hold_writer()
+        errors = []
+        failing = threading.Thread(target=lambda: errors.append(self._error(fail)))
+        failing.start()
+        passing = threading.Thread(target=self.writer.execute, args=(add_funds, (self.guild.pk, 5)))
+        passing.start()
+        self.wait_for_queue(2)
+        gate.set()
+        for thread in (failing, passing):
+            thread.join()
+
+        self.assertIsInstance(errors[0], ValueError)
+        self.guild.refresh_from_db()
+        self.assertEqual(self.guild.funds, 5)
+
+    def test_lock_errors_are_retried(self):
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            add_funds(self.guild.pk, 1)
+            if len(attempts) < 3:
+                raise OperationalError("database is locked")
+
+        self.writer.backoff = 0.001
+        self.writer.execute(flaky, retry=True)
+        self.assertEqual(self.writer.stats['retries'], 2)
+        self.guild.refresh_from_db()
+        self.assertEqual(self.guild.funds, 1)
+
+    def test_only_retryable_units_run_again(self):
+        attempts = []
+
+        def upload():
+            attempts.append(1)
+            raise OperationalError("database is locked")
+
+        gate = self.hold_writer()
+        passing = threading.Thread(target=self.writer.execute, args=(add_funds, (self.guild.pk, 5)), kwargs={'retry': True})
+        passing.start()
+        self.wait_for_queue(1)
+        errors = []
+        failing = threading.Thread(target=lambda: errors.append(self._error(upload)))
+        failing.start()
+        self.wait_for_queue(2)
+        gate.set()
+        for worker in (passing, failing):
+            worker.join()
+
+        self.assertIsInstance(errors[0], OperationalError)
+        self.assertEqual(len(attempts), 1)
+        self.assertEqual(self.writer.stats['retries'], 1)
+        # Rolled back with the failing unit, then run once more on its own
+        self.guild.refresh_from_db()
+        self.assertEqual(self.guild.funds, 5)
+
+    def test_complete_quest_survives_a_retried_batch(self):
+        quest = Quest.objects.create(
+            title="Q", description="Desc", rank=Quest.Rank.F, guild=self.guild, gold_reward=Decimal('50.00')
+        )
+        attempts = []
+
+        def lock_once():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise OperationalError("database is locked")
+
+        self.writer.backoff = 0.001
+        with override_settings(WRITE_QUEUE=True), mock.patch.object(write_queue, '_writer', self.writer):
+            gate = self.hold_writer()
+            completing = threading.Thread(target=quest.complete_quest)
+            completing.start()
+            self.wait_for_queue(1)
+            locking = threading.Thread(target=self.writer.execute, args=(lock_once,), kwargs={'retry': True})
+            locking.start()
+            self.wait_for_queue(2)
+            gate.set()
+            for worker in (completing, locking):
+                worker.join()
+
+        self.assertEqual(self.writer.stats['retries'], 1)
+        quest.refresh_from_db()
+        self.assertEqual(quest.status, Quest.Status.COMPLETED)
+        self.guild.refresh_from_db()
+        self.assertEqual(self.guild.funds, Decimal('50.00'))
+
+    def test_units_run_under_the_callers_execute_wrappers(self):
+        metrics = QueryMetrics()
+        with connection.execute_wrapper(metrics):
+            self.assertEqual(self.writer.execute(add_funds, (self.guild.pk, 1)), 'guilda-writer')
+        self.assertEqual(metrics.count, 1)
+        self.assertIn('UPDATE', metrics.slowest_sql)
+
+    def test_writer_survives_errors_outside_the_units(self):
+        with mock.patch('config.write_queue.close_old_connections', side_effect=DatabaseError("gone")):
+            with self.assertRaises(DatabaseError), self.assertLogs('guilda.writes', 'ERROR'):
+                self.writer.execute(add_funds, (self.guild.pk, 1))
+        self.assertEqual(self.writer.execute(add_funds, (self.guild.pk, 2)), 'guilda-writer')
+        self.guild.refresh_from_db()
+        self.assertEqual(self.guild.funds, 2)
+
+    def test_callers_stop_waiting_and_late_units_are_dropped(self):
+        self.writer.timeout = self.writer.run_timeout = 0.05
+        gate = self.hold_writer()
+        with self.assertRaises(WriteTimeout):
+            self.writer.execute(add_funds, (self.guild.pk, 1))
+        gate.set()
+        self.writer.stop()
+        self.guild.refresh_from_db()
+        self.assertEqual(self.guild.funds, 0)
+
+    def _error(self, function, **kwargs):
+        try:
+            self.writer.execute(function, **kwargs)
+        except Exception as error:
+            return error
+
+
+class SerializedWriteTests(TransactionTestCase):
+    def setUp(self):
+        self.addCleanup(lambda: write_queue._writer and write_queue._writer.stop())
+
+    def test_runs_inline_when_off_or_inside_a_transaction(self):
+        where = serialized_write(lambda: threading.current_thread().name)
+        with override_settings(WRITE_QUEUE=False):
+            self.assertEqual(where(), threading.current_thread().name)
+        with override_settings(WRITE_QUEUE=True):
+            with transaction.atomic():
+                self.assertEqual(where(), threading.current_thread().name)
+            self.assertEqual(where(), 'guilda-writer')
@@ -0,0 +1,155 @@
+"""
+Transports of the local server.
+
+'tcp' (SERVING_TRANSPORT, the default) is waitress on SERVING_HOST:8000,
+127.0.0.1 by default: reachable from the device only, but by any app on it.
+'unix' serves on a Unix domain socket, SERVING_SOCKET. By default it is a
+file next to the database, in the app's private directory, with mode 0600:
+only this app's user can connect to it. A name starting with '@' is a Linux
+abstract socket, with no file and no permissions: any app on the device
+can connect to it. Requests skip the loopback TCP stack.
+
+The WebView only speaks TCP: in 'unix' mode serve() also runs LocalProxy on
+127.0.0.1:8000, relaying every TCP connection to the socket, so MainActivity
+keeps loading http://127.0.0.1:8000. Like 'tcp', that port is open to every
+app on the device: with the proxy running, the socket's permissions do not
+keep other apps out. Clients able to open the socket themselves (a
+LocalSocket on the Kotlin side, the benchmarks) skip the proxy.
+"""
+import logging
+import os
+import selectors
+import socket
+import stat
+import threading
+
+logger = logging.getLogger('guilda.transport')
+
+PORT = 8000
+RELAY_CHUNK = 65536
+
+
+def unix_address(path):
+    """Address to bind or connect: '@name' is the abstract socket 'name'."""
+    path = str(path)
+    return '\0' + path[1:] if path.startswith('@') else path
+
+
+def bind_unix_socket(path, backlog=1024):
+    """Listening socket on ``path``; a stale socket file left by a previous run is replaced."""
+    address = unix_address(path)
+    if not address.startswith('\0'):
+        try:
+            if stat.S_ISSOCK(os.stat(address).st_mode):
+                os.unlink(address)
+        except FileNotFoundError:
+            pass
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.bind(address)
+        if not address.startswith('\0'):
+            os.chmod(address, 0o600)
+        sock.listen(backlog)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def connect_unix(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(unix_address(path))
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def relay(client, upstream):
+    """Copies bytes both ways until both sides closed, passing half-closes on."""
+    peers = {client: upstream, upstream: client}
+    with selectors.DefaultSelector() as selector:
+        for sock in peers:
+            selector.register(sock, selectors.EVENT_READ)
+        open_sides = 2
+        while open_sides:
+            for key, _ in selector.select():
+                source = key.fileobj
+                try:
+                    data = source.recv(RELAY_CHUNK)
+                except OSError:
+                    data = b''
+                if data:
+                    try:
+                        peers[source].sendall(data)
+                        continue
+                    except OSError:
+                        return
+                selector.unregister(source)
+                open_sides -= 1
+                try:
+                    peers[source].shutdown(socket.SHUT_WR)
+                except OSError:
+                    pass
+
+
+class LocalProxy:
+    """TCP listener on ``host``:``port`` relaying each connection to the Unix socket ``path``."""
+
+    def __init__(self, path, host='127.0.0.1', port=PORT, backlog=128):
+        self.path = path
+        self.host = host
+        self.port = port
+        self.backlog = backlog
+        self._listener = None
+
+    def start(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((self.host, self.port))
+        listener.listen(self.backlog)
+        self._listener = listener
+        self.port = listener.getsockname()[1]
+        threading.Thread(target=self._accept, name='guilda-proxy', daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+    def _accept(self):
+        listener = self._listener
+        while True:
+            try:
+                client, _ = listener.accept()
+            except OSError:
+                return  # stop()
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def _serve(self, client):
+        try:
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            try:
+                upstream = connect_unix(self.path)
+            except OSError as error:
+                logger.warning("Proxy could not reach %s: %s", self.path, error)
+                return
+            with upstream:
+                relay(client, upstream)
+        finally:
+            client.close()
+
+
+def serve(application, options):
+    """Serves ``application`` with waitress ``options`` on SERVING_TRANSPORT; blocks."""
+    from django.conf import settings
+    from waitress import serve as waitress_serve
+
+    if settings.SERVING_TRANSPORT == 'unix':
+        sock = bind_unix_socket(settings.SERVING_SOCKET, options.get('backlog', 1024))
+        LocalProxy(settings.SERVING_SOCKET).start()
+        waitress_serve(application, sockets=[sock], **options)
+    else:
+        waitress_serve(application, host=settings.SERVING_HOST, port=PORT, **options)
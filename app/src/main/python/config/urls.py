@@ -14,41 +14,40 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
-from django.urls import path, include, re_path
+from django.urls import path, re_path
 from django.views.static import serve
 from django.conf import settings
 from django.conf.urls.static import static
-from guilda_manager.views import (
-    sede_view, missoes_view, construcoes_view, construcoes_projetos_view,
-    construcoes_infra_view, construcoes_upgrades_view, bestiario_list_view, bestiario_hub_view,
-    bestiario_rememoracao_view, bestiario_edit_view, bestiario_create_view,
-    landing_view, mestre_view, root_routing_view, entry_portal_view,
-    create_guild_view, sync_guild_view, share_guild_view, mapa_view
-)
+from config.lazy_urls import deferred_admin, deferred_include, lazy_view
+
+# Views are imported on first use (see config/lazy_urls.py) so that the first
+# page can be served before DRF, the admin and the other screens are loaded.
+views = 'guilda_manager.views.'
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
-    path('api/', include('guilda_manager.urls')),
-    path('', root_routing_view, name='root'),
-    path('landing/', landing_view, name='landing'),
-    path('entry/', entry_portal_view, name='entry_portal'),
-    path('create-guild/', create_guild_view, name='create_guild'),
-    path('sync-guild/', sync_guild_view, name='sync_guild'),
-    path('share-guild/', share_guild_view, name='share_guild'),
-    path('sede/', sede_view, name='sede'),
-    path('missoes/', missoes_view, name='missoes'),
-    path('construcoes/', construcoes_view, name='construcoes'),
-    path('construcoes/projetos/', construcoes_projetos_view, name='construcoes_projetos'),
-    path('construcoes/infra/', construcoes_infra_view, name='construcoes_infra'),
-    path('construcoes/upgrades/', construcoes_upgrades_view, name='construcoes_upgrades'),
-    path('mestre/', mestre_view, name='mestre'),
-    path('mapa/', mapa_view, name='mapa'),
-    path('bestiario/', bestiario_hub_view, name='bestiario'),
-    path('bestiario/lista/', bestiario_list_view, name='bestiario_list'),
-    path('bestiario/rememoracao/', bestiario_rememoracao_view, name='bestiario_rememoracao'),
-    path('bestiario/novo/', bestiario_create_view, name='bestiario_create'),
-    path('bestiario/editar/<slug:slug>/', bestiario_edit_view, name='bestiario_edit'),
+    deferred_admin('admin/'),
+    deferred_include('api/', 'guilda_manager.urls'),
+    path('', lazy_view(views + 'root_routing_view'), name='root'),
+    path('landing/', lazy_view(views + 'landing_view'), name='landing'),
+    path('entry/', lazy_view(views + 'entry_portal_view'), name='entry_portal'),
+    path('create-guild/', lazy_view(views + 'create_guild_view'), name='create_guild'),
+    path('sync-guild/', lazy_view(views + 'sync_guild_view'), name='sync_guild'),
+    path('share-guild/', lazy_view(views + 'share_guild_view'), name='share_guild'),
+    path('share-guild/qr/<str:code>.<slug:fmt>', lazy_view(views + 'guild_qr_view'), name='guild_qr'),
+    path('sede/', lazy_view(views + 'sede_view'), name='sede'),
+    path('missoes/', lazy_view(views + 'missoes_view'), name='missoes'),
+    path('construcoes/', lazy_view(views + 'construcoes_view'), name='construcoes'),
+    path('construcoes/projetos/', lazy_view(views + 'construcoes_projetos_view'), name='construcoes_projetos'),
+    path('construcoes/infra/', lazy_view(views + 'construcoes_infra_view'), name='construcoes_infra'),
+    path('construcoes/upgrades/', lazy_view(views + 'construcoes_upgrades_view'), name='construcoes_upgrades'),
+    path('mestre/', lazy_view(views + 'mestre_view'), name='mestre'),
+    path('mestre/acoes/<slug:action>/', lazy_view(views + 'mestre_action_view'), name='mestre_action'),
+    path('mapa/', lazy_view(views + 'mapa_view'), name='mapa'),
+    path('bestiario/', lazy_view(views + 'bestiario_hub_view'), name='bestiario'),
+    path('bestiario/lista/', lazy_view(views + 'bestiario_list_view'), name='bestiario_list'),
+    path('bestiario/rememoracao/', lazy_view(views + 'bestiario_rememoracao_view'), name='bestiario_rememoracao'),
+    path('bestiario/novo/', lazy_view(views + 'bestiario_create_view'), name='bestiario_create'),
+    path('bestiario/editar/<slug:slug>/', lazy_view(views + 'bestiario_edit_view'), name='bestiario_edit'),
     re_path(r'^sede/(?P<path>.*)$', serve, {
         'document_root': str(settings.BASE_DIR / 'frontend_standalone'),
     }),
@@ -0,0 +1,232 @@
+"""
+Single-writer queue for SQLite writes.
+
+SQLite has one write lock per database, and waitress serves requests from
+several threads: a burst of writes (quest completions, gold, party moves,
+dispatch resolution) has them queue on the lock inside SQLite, holding
+their connection and, past the busy timeout, failing with "database is
+locked".
+
+With WRITE_QUEUE on (GUILDA_WRITE_QUEUE=1), a function decorated with
+@serialized_write is not run by the calling thread but handed to a single
+writer thread through a bounded queue (WRITE_QUEUE_SIZE; when it is full
+callers wait up to WRITE_QUEUE_TIMEOUT seconds, then get WriteQueueFull).
+The caller blocks until its unit ran and gets its result or exception, so
+the function behaves as if called directly. The writer runs the units in
+arrival order and takes the ones already waiting, up to WRITE_QUEUE_BATCH,
+into one transaction, each in its own savepoint: a burst of small writes
+commits once, and a unit that raises only rolls back itself.
+
+A batch that hits "database is locked" (another process, a long read in
+rollback journal mode) is rolled back. Only the database is: objects a unit
+changed in memory and files it wrote keep the first attempt's changes. So
+only units declared with @serialized_write(retry=True), which read what
+they write from the database again on every run, are run again, with
+exponential backoff; the others get the lock error, as they would without
+the queue.
+
+A caller waits at most WRITE_QUEUE_TIMEOUT + WRITE_QUEUE_RUN_TIMEOUT seconds
+for its unit, then gets WriteTimeout; the unit is dropped if the writer has
+not started it yet. An error outside the units (the connection itself)
+fails the batch's units and the writer goes on with the next one.
+
+The caller's execute wrappers (config/query_metrics.py) are installed on
+the writer's connection while its unit runs, so the unit's queries are
+counted with the request that made it.
+
+A unit runs inline, as before, when the queue is off, when called from the
+writer thread (a unit calling another) or from inside a transaction: the
+writer's connection could not see what the caller's transaction wrote.
+"""
+import contextlib
+import functools
+import logging
+import queue
+import threading
+import time
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection, transaction
+
+logger = logging.getLogger('guilda.writes')
+
+
+class WriteQueueFull(RuntimeError):
+    """The writer is WRITE_QUEUE_TIMEOUT seconds behind."""
+
+
+class WriteTimeout(RuntimeError):
+    """A unit did not finish within its wait() timeout."""
+
+
+def is_lock_error(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+class WriteUnit:
+    """One call waiting for the writer: ``wait()`` returns its result or raises its exception."""
+
+    __slots__ = ('function', 'args', 'kwargs', 'retry', 'execute_wrappers', 'result', 'error', 'done', 'cancelled')
+
+    def __init__(self, function, args, kwargs, retry=True, execute_wrappers=()):
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.retry = retry
+        self.execute_wrappers = execute_wrappers
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self.cancelled = False
+
+    def wait(self, timeout=None):
+        if not self.done.wait(timeout):
+            # Dropped if still queued; one already running completes anyway
+            self.cancelled = True
+            raise WriteTimeout(f"{self.function.__qualname__} not written after {timeout} s")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class WriteQueue:
+    """The writer thread and its queue; started on first use."""
+
+    def __init__(self, size=None, batch=None, timeout=None, run_timeout=None, retries=5, backoff=0.01):
+        self.size = size or settings.WRITE_QUEUE_SIZE
+        self.batch = batch or settings.WRITE_QUEUE_BATCH
+        self.timeout = timeout or settings.WRITE_QUEUE_TIMEOUT
+        self.run_timeout = run_timeout or settings.WRITE_QUEUE_RUN_TIMEOUT
+        self.retries = retries
+        self.backoff = backoff
+        self.stats = {'units': 0, 'batches': 0, 'retries': 0}
+        self._queue = queue.Queue(maxsize=self.size)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='guilda-writer', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Runs what is queued, then ends the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join()
+
+    def in_writer(self):
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def execute(self, function, args=(), kwargs=None, retry=False):
+        """Runs ``function(*args, **kwargs)`` on the writer thread and returns its result."""
+        unit = WriteUnit(function, args, kwargs or {}, retry, list(connection.execute_wrappers))
+        self.start()
+        try:
+            self._queue.put(unit, timeout=self.timeout)
+        except queue.Full:
+            raise WriteQueueFull(f"{self.size} writes still waiting after {self.timeout} s")
+        return unit.wait(self.timeout + self.run_timeout)
+
+    def _run(self):
+        while True:
+            unit = self._queue.get()
+            if unit is None:
+                break
+            batch = [unit]
+            stopping = False
+            while len(batch) < self.batch:
+                try:
+                    unit = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if unit is None:
+                    stopping = True
+                    break
+                batch.append(unit)
+            batch = [unit for unit in batch if not unit.cancelled]
+            try:
+                # As between requests: honours CONN_MAX_AGE and the health checks
+                close_old_connections()
+                self._run_batch(batch)
+            except Exception as error:
+                logger.exception("Write batch of %d failed", len(batch))
+                for unit in batch:
+                    unit.result, unit.error = None, error
+            finally:
+                for unit in batch:
+                    unit.done.set()
+            if stopping:
+                break
+        connection.close()
+
+    def _run_batch(self, batch):
+        self.stats['units'] += len(batch)
+        self.stats['batches'] += 1
+        for attempt in range(self.retries + 1):
+            if not batch:
+                return
+            try:
+                with transaction.atomic():
+                    for unit in batch:
+                        unit.result = unit.error = None
+                        try:
+                            with transaction.atomic(), contextlib.ExitStack() as wrappers:
+                                for wrapper in unit.execute_wrappers:
+                                    wrappers.enter_context(connection.execute_wrapper(wrapper))
+                                unit.result = unit.function(*unit.args, **unit.kwargs)
+                        except OperationalError as error:
+                            if is_lock_error(error):
+                                raise
+                            unit.error = error
+                        except Exception as error:
+                            unit.error = error
+                break
+            except OperationalError as error:
+                if not is_lock_error(error) or attempt == self.retries:
+                    logger.warning("Write batch of %d failed: %s", len(batch), error)
+                    for unit in batch:
+                        unit.result, unit.error = None, error
+                    break
+                for unit in batch:
+                    if not unit.retry:
+                        unit.result, unit.error = None, error
+                batch = [unit for unit in batch if unit.retry]
+                self.stats['retries'] += 1
+                time.sleep(self.backoff * 2 ** attempt)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = WriteQueue()
+        return _writer
+
+
+def serialized_write(function=None, *, retry=False):
+    """
+    Runs ``function`` on the writer thread when WRITE_QUEUE is on (see the
+    module docstring). ``retry=True`` when running it again after a rolled
+    back attempt is safe: it changes nothing outside the database and reads
+    what it decides from the database, not from objects an attempt changed.
+    """
+    if function is None:
+        return functools.partial(serialized_write, retry=retry)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not settings.WRITE_QUEUE or connection.in_atomic_block:
+            return function(*args, **kwargs)
+        writer = get_writer()
+        if writer.in_writer():
+            return function(*args, **kwargs)
+        return writer.execute(function, args, kwargs, retry)
+    return wrapper
@@ -0,0 +1,238 @@
+from django.db.models import Prefetch
+from django.utils.http import parse_etags
+from rest_framework import viewsets, status, decorators, pagination
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from .hexmap import HexGrid, Region, RegionError, region_etag, region_hexes
+from .models import Guild, GuildBuilding, Quest, Member, Dispatch, Hexagon, Map
+from .pins import PinCatalog
+from .resolution import DispatchResolver
+from .services import GuildStatsService
+from .serializers import GuildDashboardSerializer, BuildConstructionSerializer, QuestSerializer, UpgradePurchaseSerializer, DispatchSerializer, requested_fields
+
+class GuildViewSet(viewsets.ModelViewSet):
+    # Stats come from SQL annotations and buildings from one prefetch, so
+    # listing N guilds costs two queries.
+    queryset = GuildStatsService.annotate(Guild.objects.order_by('id')).prefetch_related(
+        Prefetch('guild_buildings', queryset=GuildBuilding.objects.select_related('building'))
+    )
+    serializer_class = GuildDashboardSerializer
+
+    @decorators.action(detail=True, methods=['post'])
+    def construct_building(self, request, pk=None):
+        """
+        Handles the purchase of a building.
+        Expects 'building_slug' in the request data.
+        """
+        guild = self.get_object()
+        serializer = BuildConstructionSerializer(data=request.data, context={'guild': guild})
+
+        if serializer.is_valid():
+            serializer.save()
+            # Return the updated guild dashboard
+            guild.refresh_from_db()
+            dashboard_serializer = self.get_serializer(guild)
+            return Response(dashboard_serializer.data, status=status.HTTP_201_CREATED)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @decorators.action(detail=True, methods=['post'])
+    def purchase_upgrade(self, request, pk=None):
+        """
+        Handles the purchase of an upgrade.
+        Expects 'upgrade_id' in the request data.
+        """
+        guild = self.get_object()
+        serializer = UpgradePurchaseSerializer(data=request.data, context={'guild': guild})
+
+        if serializer.is_valid():
+            serializer.save()
+            return Response({"success": True}, status=status.HTTP_201_CREATED)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+class QuestCursorPagination(pagination.CursorPagination):
+    # Stable under inserts and served from quest_created_at_id_idx, so a page
+    # costs the same however long the history is.
+    ordering = ('created_at', 'id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+class QuestViewSet(viewsets.ModelViewSet):
+    queryset = Quest.objects.all()
+    serializer_class = QuestSerializer
+    pagination_class = QuestCursorPagination
+
+    # ?status=&rank=&type=&guild= on the list
+    FILTER_CHOICES = {
+        'status': Quest.Status.values,
+        'rank': Quest.Rank.values,
+        'type': Quest.Type.values,
+    }
+    MEMBER_FIELDS = {'assigned_members', 'assigned_members_details'}
+    # Serializer fields that read another column
+    FIELD_SOURCES = {'status_display': 'status', 'rank_display': 'rank'}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = queryset.filter(**self.get_filters())
+
+        requested = requested_fields(self.request) if self.action in ('list', 'retrieve') else None
+        if requested is None:
+            return queryset.prefetch_related('assigned_members')
+
+        # Sparse projection: only load the requested columns (plus the
+        # cursor ones), and members only when they are part of the response.
+        columns = {'id', 'created_at'} | {
+            self.FIELD_SOURCES.get(name, name) for name in requested - self.MEMBER_FIELDS
+            if name in self.FIELD_SOURCES or name in self.model_columns()
+        }
+        queryset = queryset.only(*columns)
+        if requested & self.MEMBER_FIELDS:
+            queryset = queryset.prefetch_related('assigned_members')
+        return queryset
+
+    def get_filters(self):
+        params = self.request.query_params
+        filters = {}
+        for name, choices in self.FILTER_CHOICES.items():
+            value = params.get(name)
+            if value:
+                if value not in choices:
+                    raise ValidationError({name: f"Valor inválido. Opções: {', '.join(choices)}."})
+                filters[name] = value
+        guild = params.get('guild')
+        if guild:
+            if not guild.isdigit():
+                raise ValidationError({'guild': "Informe o id numérico da guilda."})
+            filters['guild_id'] = int(guild)
+        return filters
+
+    @staticmethod
+    def model_columns():
+        return {field.name for field in Quest._meta.concrete_fields}
+
+    @decorators.action(detail=True, methods=['post'])
+    def delegate(self, request, pk=None):
+        quest = self.get_object()
+
+        # Check if already delegated or completed
+        if quest.status not in [Quest.Status.OPEN, Quest.Status.IN_PROGRESS]:
+             return Response({"error": "Quest cannot be delegated in its current status."}, status=status.HTTP_400_BAD_REQUEST)
+
+        member_ids = request.data.get('assigned_members', [])
+        if not member_ids:
+            return Response({"error": "No members assigned."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Verify members exist and belong to the guild
+        # Filter by guild to ensure they belong to the same guild as the quest
+        members = Member.objects.filter(id__in=member_ids, guild=quest.guild)
+
+        # Note: We don't strict check len(members) == len(member_ids) because duplications or invalid IDs might be passed.
+        # But for safety, we should ensure at least one valid member.
+        if not members.exists():
+             return Response({"error": "Invalid members provided."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Assign members
+        quest.assigned_members.set(members)
+        quest.status = Quest.Status.DELEGATED
+        quest.save()
+
+        # Resolve logic
+        result = quest.resolve_delegation()
+
+        # Serialize updated quest
+        serializer = self.get_serializer(quest)
+        return Response({
+            "quest": serializer.data,
+            "delegation_result": result
+        }, status=status.HTTP_200_OK)
+
+    @decorators.action(detail=True, methods=['patch'])
+    def complete(self, request, pk=None):
+        quest = self.get_object()
+
+        if quest.status == Quest.Status.COMPLETED:
+             return Response({"error": "Quest already completed."}, status=status.HTTP_400_BAD_REQUEST)
+
+        quest.complete_quest()
+
+        serializer = self.get_serializer(quest)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+class DispatchViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Dispatch.objects.select_related('squad', 'mission').order_by('target_date', 'id')
+    serializer_class = DispatchSerializer
+
+    @decorators.action(detail=False, methods=['post'])
+    def resolve_due(self, request):
+        """
+        Resolves every PENDING dispatch whose target date has passed, in one
+        transaction, and returns the outcome of each one.
+        """
+        summary = DispatchResolver().resolve_due()
+        return Response(summary, status=status.HTTP_200_OK)
+
+class PinAssetViewSet(viewsets.ViewSet):
+    """GLB models available for pins (see PinCatalog)."""
+
+    def list(self, request):
+        return Response(PinCatalog.entries())
+
+class HexRegionViewSet(viewsets.ViewSet):
+    """
+    Hexes (with their pins) of one region of a map; see hexmap.Region for
+    the parameters. ?map= defaults to the first map. Answers 304 when
+    If-None-Match holds the region's current ETag.
+    """
+
+    def get_map_id(self):
+        map_id = self.request.query_params.get('map')
+        if map_id is None:
+            return Map.objects.order_by('id').values_list('id', flat=True).first()
+        if not map_id.isdigit():
+            raise ValidationError({'map': "Informe o id numérico do mapa."})
+        return int(map_id)
+
+    def list(self, request):
+        params = request.query_params
+        try:
+            region = Region.from_params(params)
+        except RegionError as error:
+            raise ValidationError(error.detail)
+
+        map_id = self.get_map_id()
+        hexagons = Hexagon.objects.filter(map_id=map_id)
+
+        etag = region_etag(map_id, hexagons, region)
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        data = {'map': map_id, 'region': region.as_dict(), 'hexes': region_hexes(hexagons, region)}
+        return Response(data, headers=headers)
+
+    @decorators.action(detail=False, methods=['get'])
+    def path(self, request):
+        """
+        Shortest path (A* on the map's cached HexGrid) from (from_q, from_r)
+        to (to_q, to_r), avoiding blocked hexes.
+        """
+        try:
+            start, goal = (
+                (Region.int_param(request.query_params, f'{end}_q'), Region.int_param(request.query_params, f'{end}_r'))
+                for end in ('from', 'to')
+            )
+        except RegionError as error:
+            raise ValidationError(error.detail)
+
+        game_map = Map.objects.filter(pk=self.get_map_id()).first()
+        if game_map is None:
+            return Response({'detail': "Mapa não encontrado."}, status=status.HTTP_404_NOT_FOUND)
+
+        path = HexGrid.for_map(game_map).path(start, goal)
+        if path is None:
+            return Response({'detail': "Não há caminho até o destino."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'map': game_map.pk, 'path': path, 'distance': len(path) - 1})
@@ -1,5 +1,11 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class GuildaManagerConfig(AppConfig):
     name = 'guilda_manager'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from config.sqlite import apply_profile
+        connection_created.connect(apply_profile, dispatch_uid='guilda_sqlite_profile')
@@ -0,0 +1,503 @@
+"""
+Minimal glTF 2.0 binary (GLB) reader and writer for the pin pipeline (see
+guilda_manager/pins.py), in pure Python so it also runs on the device.
+
+It handles what the pin models use: triangle-list primitives with POSITION,
+NORMAL and TEXCOORD_0 attributes, indexed or not, and embedded images.
+Anything else (skins, animations, morph targets, sparse accessors, extra
+attributes) raises GltfError, and the model is served as it is.
+
+Models are written with KHR_mesh_quantization (three.js GLTFLoader supports
+it): 16-bit positions on a per-mesh grid whose scale and offset go on a
+child node, 8-bit normals, 16-bit texture coordinates and 16-bit indices
+whenever they fit.
+"""
+import json
+import math
+import struct
+from array import array
+
+GLB_MAGIC = b'glTF'
+JSON_CHUNK = 0x4E4F534A
+BIN_CHUNK = 0x004E4942
+
+BYTE, UNSIGNED_BYTE, SHORT, UNSIGNED_SHORT, UNSIGNED_INT, FLOAT = 5120, 5121, 5122, 5123, 5125, 5126
+COMPONENT_FORMATS = {BYTE: 'b', UNSIGNED_BYTE: 'B', SHORT: 'h', UNSIGNED_SHORT: 'H', UNSIGNED_INT: 'I', FLOAT: 'f'}
+# Divisor of normalized integer components
+NORMALIZED_DIVISORS = {BYTE: 127.0, UNSIGNED_BYTE: 255.0, SHORT: 32767.0, UNSIGNED_SHORT: 65535.0}
+TYPE_SIZES = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4}
+
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+TRIANGLES = 4
+
+ATTRIBUTES = ('POSITION', 'NORMAL', 'TEXCOORD_0')
+# Attributes dropped when no material texture reads them
+UNUSED_WITHOUT_TEXTURES = ('TEXCOORD_0', 'TEXCOORD_1', 'TANGENT')
+TEXTURE_KEYS = ('baseColorTexture', 'metallicRoughnessTexture', 'normalTexture', 'occlusionTexture', 'emissiveTexture')
+
+QUANTIZATION = 'KHR_mesh_quantization'
+# Largest grid resolution tried by decimate()
+MAX_GRID = 1024
+
+
+class GltfError(ValueError):
+    """The file is not a GLB this module can process."""
+
+
+def read_glb(data):
+    """Splits a GLB file into its JSON document and binary chunk."""
+    if len(data) < 20 or data[:4] != GLB_MAGIC:
+        raise GltfError("Not a GLB file")
+    version, length = struct.unpack_from('<II', data, 4)
+    if version != 2:
+        raise GltfError(f"Unsupported glTF version {version}")
+
+    document, binary = None, b''
+    offset = 12
+    while offset < min(length, len(data)):
+        chunk_length, chunk_type = struct.unpack_from('<II', data, offset)
+        chunk = data[offset + 8:offset + 8 + chunk_length]
+        if chunk_type == JSON_CHUNK:
+            document = json.loads(chunk)
+        elif chunk_type == BIN_CHUNK:
+            binary = bytes(chunk)
+        offset += 8 + chunk_length
+    if document is None:
+        raise GltfError("GLB without a JSON chunk")
+    return document, binary
+
+
+def write_glb(document, binary):
+    body = json.dumps(document, separators=(',', ':')).encode('utf-8')
+    body += b' ' * (-len(body) % 4)
+    binary += b'\0' * (-len(binary) % 4)
+
+    chunks = struct.pack('<II', len(body), JSON_CHUNK) + body
+    if binary:
+        chunks += struct.pack('<II', len(binary), BIN_CHUNK) + binary
+    return GLB_MAGIC + struct.pack('<II', 2, 12 + len(chunks)) + chunks
+
+
+def read_accessor(document, binary, index):
+    """Values of an accessor as a flat list (normalized integers as floats)."""
+    accessor = document['accessors'][index]
+    if 'sparse' in accessor:
+        raise GltfError("Sparse accessors are not supported")
+    if 'bufferView' not in accessor:
+        raise GltfError("Accessors without a buffer view are not supported")
+    view = document['bufferViews'][accessor['bufferView']]
+    if view.get('buffer', 0) != 0 or 'uri' in document['buffers'][0]:
+        raise GltfError("Only the embedded GLB buffer is supported")
+
+    code = COMPONENT_FORMATS[accessor['componentType']]
+    components = TYPE_SIZES.get(accessor['type'])
+    if components is None:
+        raise GltfError(f"Unsupported accessor type {accessor['type']}")
+    count = accessor['count']
+    element = struct.calcsize(f'<{components}{code}')
+    stride = view.get('byteStride') or element
+    start = view.get('byteOffset', 0) + accessor.get('byteOffset', 0)
+    end = start + stride * (count - 1) + element if count else start
+
+    values = array(code)
+    if stride == element:
+        values.frombytes(binary[start:end])
+        if struct.pack('=H', 1) != struct.pack('<H', 1):
+            values.byteswap()
+    else:
+        # Padded or interleaved: copy each element out of its slot
+        layout = struct.Struct(f'<{components}{code}{stride - element}x')
+        padded = binary[start:start + stride * count]
+        if len(padded) < stride * count:
+            padded += b'\0' * (stride * count - len(padded))
+        for element_values in layout.iter_unpack(padded):
+            values.extend(element_values)
+
+    if accessor.get('normalized') and accessor['componentType'] in NORMALIZED_DIVISORS:
+        divisor = NORMALIZED_DIVISORS[accessor['componentType']]
+        return [max(value / divisor, -1.0) for value in values]
+    return list(values)
+
+
+def material_uses_textures(document, material_index):
+    if material_index is None:
+        return False
+    material = document.get('materials', [])[material_index]
+    pbr = material.get('pbrMetallicRoughness', {})
+    return any(key in pbr or key in material for key in TEXTURE_KEYS)
+
+
+def load_meshes(document, binary):
+    """
+    Reads every mesh as a list of primitives, each a dict with 'attributes'
+    (name -> flat list), 'indices' (flat list) and 'material'. Attributes no
+    material needs are left out.
+    """
+    if document.get('skins') or document.get('animations'):
+        raise GltfError("Skinned and animated models are not supported")
+
+    meshes = []
+    for mesh in document.get('meshes', []):
+        primitives = []
+        for primitive in mesh['primitives']:
+            if primitive.get('mode', TRIANGLES) != TRIANGLES:
+                raise GltfError("Only triangle lists are supported")
+            if primitive.get('targets'):
+                raise GltfError("Morph targets are not supported")
+            if primitive.get('extensions'):
+                raise GltfError(f"Unsupported primitive extensions: {', '.join(primitive['extensions'])}")
+
+            textured = material_uses_textures(document, primitive.get('material'))
+            attributes = {}
+            for name, accessor in primitive['attributes'].items():
+                if name in UNUSED_WITHOUT_TEXTURES and not textured:
+                    continue
+                if name not in ATTRIBUTES:
+                    raise GltfError(f"Unsupported attribute {name}")
+                attributes[name] = read_accessor(document, binary, accessor)
+            if 'POSITION' not in attributes:
+                raise GltfError("Primitive without positions")
+
+            if 'indices' in primitive:
+                indices = [int(value) for value in read_accessor(document, binary, primitive['indices'])]
+            else:
+                indices = list(range(len(attributes['POSITION']) // 3))
+            primitives.append({'attributes': attributes, 'indices': indices, 'material': primitive.get('material')})
+        meshes.append({'name': mesh.get('name'), 'primitives': primitives})
+    return meshes
+
+
+def triangle_count(meshes):
+    return sum(len(primitive['indices']) // 3 for mesh in meshes for primitive in mesh['primitives'])
+
+
+def document_triangles(document):
+    """Triangles of every mesh, from the accessor counts alone."""
+    total = 0
+    for mesh in document.get('meshes', []):
+        for primitive in mesh['primitives']:
+            if primitive.get('mode', TRIANGLES) != TRIANGLES:
+                continue
+            accessor = primitive.get('indices', primitive['attributes'].get('POSITION'))
+            if accessor is not None:
+                total += document['accessors'][accessor]['count'] // 3
+    return total
+
+
+def scene_bounds(document):
+    """
+    World-space bounding box of the default scene, ((min x, y, z), (max x,
+    y, z)), from the POSITION accessor bounds and the node transforms (the
+    corners of each mesh box are transformed). None without geometry.
+    """
+    scenes = document.get('scenes', [])
+    if not scenes:
+        return None
+    nodes = document.get('nodes', [])
+    corners = []
+    stack = [(index, _IDENTITY) for index in scenes[document.get('scene', 0)].get('nodes', [])]
+    while stack:
+        index, parent = stack.pop()
+        node = nodes[index]
+        world = _multiply(parent, _node_matrix(node))
+        if 'mesh' in node:
+            for primitive in document['meshes'][node['mesh']]['primitives']:
+                accessor = document['accessors'][primitive['attributes']['POSITION']]
+                if 'min' not in accessor or 'max' not in accessor:
+                    continue
+                divisor = NORMALIZED_DIVISORS.get(accessor['componentType'], 1.0) if accessor.get('normalized') else 1.0
+                low = [value / divisor for value in accessor['min']]
+                high = [value / divisor for value in accessor['max']]
+                for corner in ((x, y, z) for x in (low[0], high[0]) for y in (low[1], high[1]) for z in (low[2], high[2])):
+                    corners.append(_transform(world, corner))
+        stack.extend((child, world) for child in node.get('children', []))
+    if not corners:
+        return None
+    return tuple(min(c[axis] for c in corners) for axis in range(3)), tuple(max(c[axis] for c in corners) for axis in range(3))
+
+
+# 4x4 matrices are column-major lists, as in glTF
+_IDENTITY = [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0]
+
+
+def _node_matrix(node):
+    if 'matrix' in node:
+        return node['matrix']
+    tx, ty, tz = node.get('translation', (0.0, 0.0, 0.0))
+    qx, qy, qz, qw = node.get('rotation', (0.0, 0.0, 0.0, 1.0))
+    sx, sy, sz = node.get('scale', (1.0, 1.0, 1.0))
+    return [
+        (1 - 2 * (qy * qy + qz * qz)) * sx, 2 * (qx * qy + qz * qw) * sx, 2 * (qx * qz - qy * qw) * sx, 0.0,
+        2 * (qx * qy - qz * qw) * sy, (1 - 2 * (qx * qx + qz * qz)) * sy, 2 * (qy * qz + qx * qw) * sy, 0.0,
+        2 * (qx * qz + qy * qw) * sz, 2 * (qy * qz - qx * qw) * sz, (1 - 2 * (qx * qx + qy * qy)) * sz, 0.0,
+        tx, ty, tz, 1.0,
+    ]
+
+
+def _multiply(a, b):
+    return [
+        sum(a[k * 4 + row] * b[column * 4 + k] for k in range(4))
+        for column in range(4) for row in range(4)
+    ]
+
+
+def _transform(matrix, point):
+    x, y, z = point
+    return tuple(matrix[row] * x + matrix[4 + row] * y + matrix[8 + row] * z + matrix[12 + row] for row in range(3))
+
+
+def bounding_box(positions):
+    """((min x, min y, min z), (max x, max y, max z)) of a flat position list."""
+    if not positions:
+        return (0.0, 0.0, 0.0), (0.0, 0.0, 0.0)
+    xs, ys, zs = positions[0::3], positions[1::3], positions[2::3]
+    return (min(xs), min(ys), min(zs)), (max(xs), max(ys), max(zs))
+
+
+def decimate(primitive, ratio):
+    """
+    Simplifies a primitive to about ``ratio`` of its triangles by vertex
+    clustering: vertices are merged per cell of a regular grid, and the
+    coarsest grid that keeps at least the target number of triangles wins.
+    """
+    triangles = len(primitive['indices']) // 3
+    target = max(1, int(triangles * ratio))
+    if ratio >= 1 or triangles <= 1:
+        return primitive
+
+    low, high = 1, MAX_GRID
+    best = None
+    while low <= high:
+        resolution = (low + high) // 2
+        candidate = _cluster(primitive, resolution)
+        if len(candidate['indices']) // 3 >= target:
+            best, high = candidate, resolution - 1
+        else:
+            low = resolution + 1
+    if best is None or len(best['indices']) >= len(primitive['indices']):
+        return primitive
+    return best
+
+
+def _cluster(primitive, resolution):
+    attributes = primitive['attributes']
+    positions = attributes['POSITION']
+    uvs = attributes.get('TEXCOORD_0')
+    vertex_count = len(positions) // 3
+    sizes = {name: len(values) // vertex_count for name, values in attributes.items()}
+
+    (min_x, min_y, min_z), (max_x, max_y, max_z) = bounding_box(positions)
+    extent = max(max_x - min_x, max_y - min_y, max_z - min_z) or 1.0
+    inverse = resolution / extent
+
+    clusters = {}
+    counts = []
+    sums = {name: [] for name in attributes}
+    remap = []
+    for vertex in range(vertex_count):
+        x, y, z = positions[3 * vertex:3 * vertex + 3]
+        key = (int((x - min_x) * inverse), int((y - min_y) * inverse), int((z - min_z) * inverse))
+        if uvs is not None:
+            # Keep texture seams apart
+            key += (round(uvs[2 * vertex] * 64), round(uvs[2 * vertex + 1] * 64))
+        cluster = clusters.get(key)
+        if cluster is None:
+            cluster = clusters[key] = len(counts)
+            counts.append(1)
+            for name, values in attributes.items():
+                size = sizes[name]
+                sums[name].extend(values[size * vertex:size * vertex + size])
+        else:
+            counts[cluster] += 1
+            for name, values in attributes.items():
+                size = sizes[name]
+                total = sums[name]
+                for component in range(size):
+                    total[size * cluster + component] += values[size * vertex + component]
+        remap.append(cluster)
+
+    # Merge the triangles, dropping collapsed and duplicated ones
+    indices = primitive['indices']
+    seen = set()
+    merged = []
+    for start in range(0, len(indices) - 2, 3):
+        a, b, c = remap[indices[start]], remap[indices[start + 1]], remap[indices[start + 2]]
+        if a == b or b == c or a == c:
+            continue
+        # Same rotation for the same triangle, keeping its winding
+        if b < a and b < c:
+            a, b, c = b, c, a
+        elif c < a and c < b:
+            a, b, c = c, a, b
+        if (a, b, c) in seen:
+            continue
+        seen.add((a, b, c))
+        merged.extend((a, b, c))
+
+    # Average the used clusters and renumber them
+    used = {}
+    for cluster in merged:
+        if cluster not in used:
+            used[cluster] = len(used)
+    result = {name: [] for name in attributes}
+    for cluster in used:
+        count = counts[cluster]
+        for name, total in sums.items():
+            size = sizes[name]
+            values = [value / count for value in total[size * cluster:size * cluster + size]]
+            if name == 'NORMAL':
+                length = math.sqrt(sum(value * value for value in values)) or 1.0
+                values = [value / length for value in values]
+            result[name].extend(values)
+    return {
+        'attributes': result,
+        'indices': [used[cluster] for cluster in merged],
+        'material': primitive['material'],
+    }
+
+
+class _Builder:
+    """Accumulates buffer views and accessors of the output binary chunk."""
+
+    def __init__(self):
+        self.binary = bytearray()
+        self.buffer_views = []
+        self.accessors = []
+
+    def view(self, data, target=None, stride=None):
+        self.binary += b'\0' * (-len(self.binary) % 4)
+        view = {'buffer': 0, 'byteOffset': len(self.binary), 'byteLength': len(data)}
+        if stride:
+            view['byteStride'] = stride
+        if target:
+            view['target'] = target
+        self.binary += data
+        self.buffer_views.append(view)
+        return len(self.buffer_views) - 1
+
+    def accessor(self, values, components, component_type, target, normalized=False, bounds=False):
+        code = COMPONENT_FORMATS[component_type]
+        count = len(values) // components
+        element = struct.calcsize(f'<{components}{code}')
+        # Vertex attributes must start on 4-byte boundaries
+        stride = element + (-element % 4) if target == ARRAY_BUFFER else element
+        if stride == element:
+            packed = array(code, values)
+            if struct.pack('=H', 1) != struct.pack('<H', 1):
+                packed.byteswap()
+            data = packed.tobytes()
+        else:
+            layout = struct.Struct(f'<{components}{code}{stride - element}x')
+            data = b''.join(layout.pack(*values[i:i + components]) for i in range(0, len(values), components))
+
+        accessor = {
+            'bufferView': self.view(data, target, stride if target == ARRAY_BUFFER else None),
+            'componentType': component_type,
+            'count': count,
+            'type': {1: 'SCALAR', 2: 'VEC2', 3: 'VEC3', 4: 'VEC4'}[components],
+        }
+        if normalized:
+            accessor['normalized'] = True
+        if bounds and count:
+            accessor['min'] = [min(values[axis::components]) for axis in range(components)]
+            accessor['max'] = [max(values[axis::components]) for axis in range(components)]
+        self.accessors.append(accessor)
+        return len(self.accessors) - 1
+
+
+def encode(document, binary, meshes, quantize=True):
+    """
+    Writes ``meshes`` (see load_meshes) back into a GLB with the nodes,
+    materials and asset information of ``document``. Returns the bytes.
+    """
+    builder = _Builder()
+    output = {key: value for key, value in document.items()
+              if key not in ('accessors', 'bufferViews', 'buffers', 'meshes', 'extensionsUsed', 'extensionsRequired')}
+    output['nodes'] = [dict(node) for node in document.get('nodes', [])]
+
+    # Embedded images are copied as they are
+    images = []
+    for image in document.get('images', []):
+        image = dict(image)
+        if 'bufferView' in image:
+            view = document['bufferViews'][image['bufferView']]
+            start = view.get('byteOffset', 0)
+            image['bufferView'] = builder.view(binary[start:start + view['byteLength']])
+        images.append(image)
+    if images:
+        output['images'] = images
+
+    output_meshes = []
+    grids = {}
+    for mesh_index, mesh in enumerate(meshes):
+        grid = _position_grid(mesh) if quantize else None
+        grids[mesh_index] = grid
+        primitives = []
+        for primitive in mesh['primitives']:
+            attributes = {}
+            for name, values in primitive['attributes'].items():
+                attributes[name] = _write_attribute(builder, name, values, grid)
+            written = {'attributes': attributes, 'mode': TRIANGLES}
+            vertex_count = len(primitive['attributes']['POSITION']) // 3
+            index_type = UNSIGNED_SHORT if quantize and vertex_count <= 0xFFFF else UNSIGNED_INT
+            written['indices'] = builder.accessor(primitive['indices'], 1, index_type, ELEMENT_ARRAY_BUFFER)
+            if primitive['material'] is not None:
+                written['material'] = primitive['material']
+            primitives.append(written)
+        output_mesh = {'primitives': primitives}
+        if mesh.get('name'):
+            output_mesh['name'] = mesh['name']
+        output_meshes.append(output_mesh)
+    output['meshes'] = output_meshes
+
+    if quantize:
+        # Dequantization transform on a child node, so the node's own
+        # transform (and whatever animates it) is left untouched
+        for node in list(output['nodes']):
+            if 'mesh' not in node:
+                continue
+            offset, scale = grids[node['mesh']]
+            output['nodes'].append({'mesh': node.pop('mesh'), 'translation': offset, 'scale': [scale] * 3})
+            node['children'] = node.get('children', []) + [len(output['nodes']) - 1]
+        output['extensionsUsed'] = sorted(set(document.get('extensionsUsed', [])) | {QUANTIZATION})
+        output['extensionsRequired'] = sorted(set(document.get('extensionsRequired', [])) | {QUANTIZATION})
+    else:
+        for key in ('extensionsUsed', 'extensionsRequired'):
+            if key in document:
+                output[key] = document[key]
+
+    output['accessors'] = builder.accessors
+    output['bufferViews'] = builder.buffer_views
+    output['buffers'] = [{'byteLength': len(builder.binary)}]
+    return write_glb(output, bytes(builder.binary))
+
+
+def _position_grid(mesh):
+    """(offset, scale) mapping the mesh's positions onto signed 16-bit integers."""
+    positions = [value for primitive in mesh['primitives'] for value in primitive['attributes']['POSITION']]
+    low, high = bounding_box(positions)
+    offset = [(a + b) / 2 for a, b in zip(low, high)]
+    half_extent = max((b - a) / 2 for a, b in zip(low, high))
+    return offset, (half_extent / 32767) or 1.0
+
+
+def _write_attribute(builder, name, values, grid):
+    if grid is None:
+        size = {'POSITION': 3, 'NORMAL': 3, 'TEXCOORD_0': 2}[name]
+        return builder.accessor(values, size, FLOAT, ARRAY_BUFFER, bounds=name == 'POSITION')
+
+    if name == 'POSITION':
+        offset, scale = grid
+        quantized = [
+            max(-32767, min(32767, round((value - offset[i % 3]) / scale))) for i, value in enumerate(values)
+        ]
+        return builder.accessor(quantized, 3, SHORT, ARRAY_BUFFER, bounds=True)
+    if name == 'NORMAL':
+        quantized = [max(-127, min(127, round(value * 127))) for value in values]
+        return builder.accessor(quantized, 3, BYTE, ARRAY_BUFFER, normalized=True)
+    # TEXCOORD_0: 16 bits when the coordinates stay inside the texture
+    if values and min(values) >= 0 and max(values) <= 1:
+        return builder.accessor([round(value * 65535) for value in values], 2, UNSIGNED_SHORT, ARRAY_BUFFER,
+                                normalized=True)
+    return builder.accessor(values, 2, FLOAT, ARRAY_BUFFER)
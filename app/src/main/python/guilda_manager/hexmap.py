@@ -0,0 +1,302 @@
+"""
+Hex map geometry, regions and pathfinding.
+
+Coordinates are pointy-top axial (q, r), as in mapa.html and mestre.html; the
+third cube coordinate is s = -q - r (stored on Hexagon, see CubeSField). The
+distance between two hexes is the largest of their |dq|, |dr|, |ds|.
+
+The map pages no longer embed every Hexagon: they ask /api/hex-regions/ for
+the region around what is on screen, an axial bounding range
+(q_min..q_max, r_min..r_max), a hexagon of ``radius`` around (q, r) or its
+``ring``. Each region has an ETag built from one aggregate query, so a client
+revalidating a region it already holds gets a 304 without the hexes being
+loaded.
+
+Paths are searched in memory on a HexGrid, the adjacency of a whole map
+built with one query and cached until one of its hexes or the map changes.
+"""
+import hashlib
+import heapq
+import threading
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db.models import Count, Max, Q
+from django.templatetags.static import static
+from .models import Hexagon
+from .pins import manifest_version, pin_model
+
+# Neighbor offsets, counter-clockwise from east
+DIRECTIONS = ((1, 0), (1, -1), (0, -1), (-1, 0), (-1, 1), (0, 1))
+
+
+def distance(a, b):
+    dq, dr = a[0] - b[0], a[1] - b[1]
+    return max(abs(dq), abs(dr), abs(dq + dr))
+
+
+def neighbors(q, r):
+    return [(q + dq, r + dr) for dq, dr in DIRECTIONS]
+
+
+def ring(center, radius):
+    """The hexes at exactly ``radius`` from ``center``, walking around it."""
+    if radius == 0:
+        return [center]
+    q, r = center[0] + DIRECTIONS[4][0] * radius, center[1] + DIRECTIONS[4][1] * radius
+    cells = []
+    for dq, dr in DIRECTIONS:
+        for _ in range(radius):
+            cells.append((q, r))
+            q, r = q + dq, r + dr
+    return cells
+
+
+def hex_range(center, radius):
+    """The hexes within ``radius`` of ``center``, 3 * radius * (radius + 1) + 1 of them."""
+    cq, cr = center
+    return [
+        (cq + dq, cr + dr)
+        for dq in range(-radius, radius + 1)
+        for dr in range(max(-radius, -dq - radius), min(radius, -dq + radius) + 1)
+    ]
+
+
+# Largest region one request may ask for: a 65 x 65 axial range
+MAX_REGION_SPAN = 64
+MAX_REGION_RADIUS = MAX_REGION_SPAN // 2
+
+
+class RegionError(ValueError):
+    """Invalid region parameters, keyed by parameter like a DRF ValidationError."""
+
+    def __init__(self, detail):
+        super().__init__(detail)
+        self.detail = detail
+
+
+class Region:
+    """
+    Axial range ``q_min <= q <= q_max``, ``r_min <= r <= r_max``, optionally
+    narrowed to the hexes within ``radius`` of its center (or, with ``ring``,
+    at exactly ``radius``: ring 1 is the neighbors).
+    """
+
+    def __init__(self, q_min, q_max, r_min, r_max, center=None, radius=None, ring=False):
+        self.q_min, self.q_max, self.r_min, self.r_max = q_min, q_max, r_min, r_max
+        self.center = center
+        self.radius = radius
+        self.ring = ring
+
+    @classmethod
+    def around(cls, q, r, radius, ring=False):
+        return cls(q - radius, q + radius, r - radius, r + radius, center=(q, r), radius=radius, ring=ring)
+
+    @classmethod
+    def covering(cls, coordinates):
+        """The bounding range of ``coordinates`` (at least one)."""
+        qs, rs = zip(*coordinates)
+        return cls(min(qs), max(qs), min(rs), max(rs))
+
+    @classmethod
+    def from_params(cls, params):
+        """Parses ?q_min=&q_max=&r_min=&r_max= or ?q=&r=&radius=[&ring=1]."""
+        if 'radius' in params:
+            q, r, radius = (cls.int_param(params, name) for name in ('q', 'r', 'radius'))
+            if not 0 <= radius <= MAX_REGION_RADIUS:
+                raise RegionError({'radius': f"Informe um raio entre 0 e {MAX_REGION_RADIUS}."})
+            return cls.around(q, r, radius, ring=params.get('ring') in ('1', 'true'))
+
+        q_min, q_max, r_min, r_max = (cls.int_param(params, name) for name in ('q_min', 'q_max', 'r_min', 'r_max'))
+        for axis, low, high in (('q', q_min, q_max), ('r', r_min, r_max)):
+            if not 0 <= high - low <= MAX_REGION_SPAN:
+                raise RegionError({f'{axis}_max': f"O intervalo de {axis} deve ter entre 0 e {MAX_REGION_SPAN} hexágonos."})
+        return cls(q_min, q_max, r_min, r_max)
+
+    @staticmethod
+    def int_param(params, name):
+        try:
+            return int(params[name])
+        except KeyError:
+            raise RegionError({name: "Parâmetro obrigatório."})
+        except (TypeError, ValueError):
+            raise RegionError({name: "Informe um número inteiro."})
+
+    def filter(self, queryset):
+        queryset = queryset.filter(
+            q__gte=self.q_min, q__lte=self.q_max, r__gte=self.r_min, r__lte=self.r_max,
+        )
+        if self.radius is not None:
+            # Within the range, distance <= radius is a band on s, checked
+            # on the rows the (map, q, r) index finds.
+            cq, cr = self.center
+            cs = -cq - cr
+            queryset = queryset.filter(s__gte=cs - self.radius, s__lte=cs + self.radius)
+            if self.ring:
+                # At exactly radius: one of the coordinates is on the edge
+                queryset = queryset.filter(
+                    Q(q__in=(cq - self.radius, cq + self.radius)) | Q(r__in=(cr - self.radius, cr + self.radius))
+                    | Q(s__in=(cs - self.radius, cs + self.radius))
+                )
+        return queryset
+
+    def as_dict(self):
+        region = {'q_min': self.q_min, 'q_max': self.q_max, 'r_min': self.r_min, 'r_max': self.r_max}
+        if self.radius is not None:
+            region.update(q=self.center[0], r=self.center[1], radius=self.radius)
+            if self.ring:
+                region['ring'] = True
+        return region
+
+
+# Where the pin models are, as a static path
+PINS_STATIC_DIR = 'guilda_manager/pins'
+
+
+def hexagon_data(hexagon):
+    """A hex as the map pages use it; ``model`` is the pin variant to load."""
+    pin = hexagon.pin
+    model = pin_model(pin.glb_path, settings.PIN_MAP_MAX_TRIANGLES) if pin else None
+    return {
+        'q': hexagon.q,
+        'r': hexagon.r,
+        'title': hexagon.title,
+        'description': hexagon.description,
+        'pin_id': pin.id if pin else None,
+        'pin_name': pin.name if pin else None,
+        'model': model,
+        # Hashed (immutably cached) once build_static has run
+        'model_url': static(f"{PINS_STATIC_DIR}/{model}") if model else None,
+        'blocked': hexagon.blocked,
+    }
+
+
+def hexagons_at(hexagons, coordinates):
+    """
+    {(q, r): Hexagon} for the ``coordinates`` that have a row in
+    ``hexagons`` (a Hexagon queryset of one map), with one range query.
+    """
+    coordinates = set(coordinates)
+    if not coordinates:
+        return {}
+    return {
+        (hexagon.q, hexagon.r): hexagon
+        for hexagon in Region.covering(coordinates).filter(hexagons)
+        if (hexagon.q, hexagon.r) in coordinates
+    }
+
+
+def region_hexes(hexagons, region):
+    """The hexes of ``region`` (``hexagons``: a Hexagon queryset of one map)."""
+    return [hexagon_data(hexagon) for hexagon in region.filter(hexagons).select_related('pin').order_by('r', 'q')]
+
+
+def region_etag(map_id, hexagons, region):
+    """
+    ETag of ``region``: changes when one of its hexes or their pins is
+    saved, created or deleted (a deleted pin clears its hexes, which changes
+    the pin count), and when the pin variants or the static files are rebuilt.
+    """
+    stamp = region.filter(hexagons).aggregate(
+        count=Count('id'), pins=Count('pin'), updated=Max('updated_at'), pin_updated=Max('pin__updated_at'),
+    )
+    key = repr((
+        map_id, sorted(region.as_dict().items()), stamp['count'], stamp['pins'],
+        str(stamp['updated']), str(stamp['pin_updated']),
+        manifest_version(), settings.PIN_MAP_MAX_TRIANGLES, getattr(staticfiles_storage, 'manifest_hash', ''),
+    ))
+    return '"hexes-' + hashlib.sha1(key.encode()).hexdigest()[:20] + '"'
+
+
+class HexGrid:
+    """
+    Adjacency of one map: the cells within its radius, numbered, each with
+    the indexes of its passable neighbors. Built from one query (the blocked
+    hexes) and cached per map; signals.py invalidates a map when one of its
+    hexes or the map itself is saved or deleted (bulk_create() and update()
+    send no signal: call invalidate() after them). path() is an A* search
+    over the cached arrays, with no query.
+    """
+
+    _lock = threading.Lock()
+    _cache = {}  # map_id -> (version, grid)
+    _versions = {}
+
+    def __init__(self, radius, blocked=()):
+        self.radius = radius
+        self.cells = hex_range((0, 0), radius)
+        self.index = {cell: i for i, cell in enumerate(self.cells)}
+        self.blocked = bytearray(len(self.cells))
+        for cell in blocked:
+            i = self.index.get(cell)
+            if i is not None:
+                self.blocked[i] = 1
+        index = self.index
+        self.adjacency = [
+            tuple(n for n in (index.get(neighbor) for neighbor in neighbors(q, r)) if n is not None and not self.blocked[n])
+            for q, r in self.cells
+        ]
+
+    @classmethod
+    def for_map(cls, game_map):
+        with cls._lock:
+            version = cls._versions.get(game_map.pk, 0)
+            cached = cls._cache.get(game_map.pk)
+        if cached is not None and cached[0] == version and cached[1].radius == game_map.radius:
+            return cached[1]
+        blocked = Hexagon.objects.filter(map=game_map, blocked=True).values_list('q', 'r')
+        grid = cls(game_map.radius, blocked)
+        with cls._lock:
+            cls._cache[game_map.pk] = (version, grid)
+        return grid
+
+    @classmethod
+    def invalidate(cls, map_id):
+        with cls._lock:
+            cls._versions[map_id] = cls._versions.get(map_id, 0) + 1
+
+    def contains(self, cell):
+        return cell in self.index
+
+    def passable(self, cell):
+        i = self.index.get(cell)
+        return i is not None and not self.blocked[i]
+
+    def path(self, start, goal):
+        """
+        Shortest list of cells from ``start`` to ``goal`` (both included),
+        or None when ``goal`` is off the map, blocked or unreachable. The
+        start may be blocked (a party can always leave where it stands).
+        """
+        if start not in self.index or not self.passable(goal):
+            return None
+        start_i, goal_i = self.index[start], self.index[goal]
+        cells = self.cells
+        gq, gr = goal
+
+        came_from = {start_i: None}
+        cost = {start_i: 0}
+        frontier = [(distance(start, goal), 0, start_i)]
+        while frontier:
+            _, current_cost, current = heapq.heappop(frontier)
+            if current == goal_i:
+                break
+            if current_cost > cost[current]:
+                continue  # Stale entry
+            next_cost = current_cost + 1
+            for n in self.adjacency[current]:
+                if next_cost < cost.get(n, next_cost + 1):
+                    cost[n] = next_cost
+                    came_from[n] = current
+                    nq, nr = cells[n]
+                    dq, dr = nq - gq, nr - gr
+                    heapq.heappush(frontier, (next_cost + max(abs(dq), abs(dr), abs(dq + dr)), next_cost, n))
+        else:
+            return None
+
+        path = []
+        node = goal_i
+        while node is not None:
+            path.append(cells[node])
+            node = came_from[node]
+        path.reverse()
+        return path
@@ -0,0 +1,38 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from whitenoise.compress import brotli_installed
+from guilda_manager.seals import build_atlas
+from guilda_manager.static_images import MIN_BYTES, available_formats, convert_images
+from guilda_manager.threejs import vendored_manifest
+
+class Command(BaseCommand):
+    help = 'Builds the rank seal atlas and the web copies of the large images, then collects the static files with hashed names and .gz/.br variants'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Convert the images that did not change too')
+        parser.add_argument('--images-only', action='store_true', help='Only build the seal atlas and the web copies of the images')
+
+    def handle(self, *args, **options):
+        build_atlas(log=lambda name, size: self.stdout.write(f"{name}: {size / 1024:.1f} KB"))
+
+        formats = ', '.join(entry[0] for entry in available_formats())
+        self.stdout.write(f"Images of {MIN_BYTES // 1024} KB or more -> {formats}")
+
+        def log(name, extension, size, converted):
+            if converted is None:
+                self.stdout.write(self.style.WARNING(f"{name}: {extension} not smaller, kept as it is"))
+            else:
+                self.stdout.write(f"{name} ({size // 1024} KB) -> {extension} {converted // 1024} KB")
+
+        written = convert_images(force=options['force'], log=log)
+        self.stdout.write(self.style.SUCCESS(f"{written} image copies written."))
+        if options['images_only']:
+            return
+
+        if vendored_manifest() is None:
+            self.stdout.write(self.style.WARNING(
+                "Three.js is not vendored: the 3D pages will load it from unpkg (run vendor_three first)"
+            ))
+        if not brotli_installed:
+            self.stdout.write(self.style.WARNING("brotli is not installed: only .gz variants will be written"))
+        call_command('collectstatic', interactive=False, clear=True, verbosity=options['verbosity'])
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from guilda_manager.pins import LOD_RATIOS, PINS_DIR, build_manifest
+
+class Command(BaseCommand):
+    help = 'Builds the stripped, quantized and decimated LOD variants of the pin GLBs and their manifest'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ratios', type=float, nargs='+', default=list(LOD_RATIOS),
+                            help='Share of the triangles kept by each LOD, from LOD 0')
+        parser.add_argument('--force', action='store_true', help='Rebuild the models that did not change too')
+
+    def handle(self, *args, **options):
+        def log(name, entry):
+            if 'error' in entry:
+                self.stdout.write(self.style.WARNING(f"{name}: kept as it is ({entry['error']})"))
+                return
+            variants = ', '.join(
+                f"LOD {variant['lod']} {variant['bytes'] // 1024} KB / {variant['triangles']} tris"
+                for variant in entry['variants']
+            )
+            self.stdout.write(f"{name} ({entry['bytes'] // 1024} KB / {entry['triangles']} tris): {variants}")
+
+        manifest = build_manifest(PINS_DIR, options['ratios'], options['force'], log)
+        self.stdout.write(self.style.SUCCESS(f"{len(manifest['pins'])} pin models in the manifest."))
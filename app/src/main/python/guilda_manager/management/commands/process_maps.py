@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from guilda_manager.map_images import MapImageError, is_processed, process_background
+from guilda_manager.models import Map
+
+class Command(BaseCommand):
+    help = 'Builds the downscaled levels, tiles and fog palette of the map backgrounds'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Reprocess the backgrounds already processed too')
+
+    def handle(self, *args, **options):
+        processed = 0
+        for game_map in Map.objects.exclude(background_image='').exclude(background_image__isnull=True):
+            if is_processed(game_map) and not options['force']:
+                continue
+            try:
+                meta = process_background(game_map)
+            except MapImageError as error:
+                self.stdout.write(self.style.WARNING(f"{game_map.name}: kept as it is ({error})"))
+                continue
+            levels = ', '.join(f"{level['width']}x{level['height']} {level['bytes'] // 1024} KB" for level in meta['levels'])
+            self.stdout.write(f"{game_map.name} ({meta['width']}x{meta['height']}): {levels}, {len(meta['tiles']['names'])} tiles")
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(f"{processed} map backgrounds processed."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from guilda_manager.resolution import DispatchResolver
+
+class Command(BaseCommand):
+    help = 'Resolves every PENDING dispatch whose target date has passed, in one transaction'
+
+    def handle(self, *args, **kwargs):
+        summary = DispatchResolver().resolve_due()
+
+        self.stdout.write(
+            f"Resolved {summary['resolved']} dispatches: {summary['completed']} completed, "
+            f"{summary['disasters']} disasters, {summary['deaths']} deaths ({summary['elapsed_ms']}ms)."
+        )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from guilda_manager.threejs import THREE_VERSION, VendorError, build_bundle
+
+class Command(BaseCommand):
+    help = 'Bundles the parts of Three.js the templates use into one minified local ES module'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--three', help=f"Unpacked three package (default: three@{THREE_VERSION} from npm)")
+        parser.add_argument('--esbuild', help='esbuild command (default: npx esbuild)')
+
+    def handle(self, *args, **options):
+        try:
+            manifest = build_bundle(options['three'], options['esbuild'])
+        except VendorError as error:
+            raise CommandError(str(error))
+        self.stdout.write(f"three {manifest['version']}: {len(manifest['exports'])} exports, "
+                          f"{', '.join(manifest['specifiers'])}")
+        if 'draco' in manifest:
+            self.stdout.write(f"Draco decoder -> {manifest['draco']}")
+        self.stdout.write(self.style.SUCCESS(f"{manifest['bundle']}: {manifest['bytes'] // 1024} KB"))
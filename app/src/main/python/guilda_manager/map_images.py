@@ -0,0 +1,211 @@
+"""
+Map backgrounds (Map.background_image) and their processed variants.
+
+The upload_map action (and `manage.py process_maps`, for maps uploaded before
+it) decodes the uploaded photo once, on the server, and stores next to it:
+
+- levels: the image downscaled so its longest side is at most each of
+  LEVEL_SIZES (never upscaled), as WebP;
+- tiles: TILE_SIZE tiles of the largest level, as WebP;
+- fog: the FOG_GRID x FOG_GRID fog color grid of mapa.html, the mean color
+  of the part of the image under each fog cell.
+
+Map.background_meta describes them, so the pages pick a level (and the fog
+palette) without touching the files: the phone downloads a small WebP and
+no longer decodes the full photo into a canvas to sample the fog colors.
+"""
+import hashlib
+import io
+import math
+import posixpath
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, ImageStat, UnidentifiedImageError
+
+PROCESSED_DIR = 'maps/processed'
+
+# Longest side of each level, largest first
+LEVEL_SIZES = (2048, 1024, 512, 256)
+TILE_SIZE = 512
+WEBP_QUALITY = 80
+
+FOG_GRID = 4
+FOG_DEFAULT = (50, 56, 64)
+
+META_VERSION = 1
+
+
+class MapImageError(ValueError):
+    """The background is missing or is not an image Pillow can decode."""
+
+
+def fog_palette(image):
+    """
+    [r, g, b] of each fog cell, row by row, as mapa.html computed them: the
+    fog texture spans three times the map, the map being its middle third,
+    so the cells on the border get FOG_DEFAULT and the inner ones the
+    truncated mean color of the part of the image they cover (v going up).
+    """
+    width, height = image.size
+    palette = []
+    for y in range(FOG_GRID):
+        for x in range(FOG_GRID):
+            u0 = max(0, 3 * (x / FOG_GRID) - 1)
+            u1 = min(1, 3 * ((x + 1) / FOG_GRID) - 1)
+            v0 = max(0, 3 * (y / FOG_GRID) - 1)
+            v1 = min(1, 3 * ((y + 1) / FOG_GRID) - 1)
+            color = list(FOG_DEFAULT)
+            if u1 > u0 and v1 > v0:
+                px = math.floor(u0 * width)
+                py = math.floor((1 - v1) * height)
+                pw = max(1, math.floor((u1 - u0) * width))
+                ph = max(1, math.floor((v1 - v0) * height))
+                if px + pw <= width and py + ph <= height:
+                    mean = ImageStat.Stat(image.crop((px, py, px + pw, py + ph))).mean
+                    color = [int(channel) for channel in mean[:3]]
+            palette.append(color)
+    return palette
+
+
+def level_sizes(size, sizes=LEVEL_SIZES):
+    """(width, height) of each level of an image of ``size``, largest first."""
+    width, height = size
+    longest = max(width, height)
+    # An image smaller than the first level is kept at its size, re-encoded
+    sides = [longest] if longest < sizes[0] else []
+    sides += [side for side in sizes if side <= longest]
+    return [
+        (max(1, round(width * side / longest)), max(1, round(height * side / longest)))
+        for side in sides
+    ]
+
+
+def encode_webp(image):
+    buffer = io.BytesIO()
+    image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def open_background(game_map):
+    if not game_map.background_image:
+        raise MapImageError("O mapa não tem imagem de fundo.")
+    try:
+        with game_map.background_image.open('rb') as handle:
+            data = handle.read()
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as error:
+        raise MapImageError(f"Imagem de fundo inválida: {error}")
+    return data, image
+
+
+def process_background(game_map, storage=default_storage):
+    """
+    Writes the levels, tiles and fog palette of ``game_map``'s background
+    under PROCESSED_DIR/<map id>-<content hash>/, removes those of its
+    previous background and saves the description in background_meta.
+    Raises MapImageError when the background cannot be decoded.
+    """
+    data, image = open_background(game_map)
+    digest = hashlib.sha256(data).hexdigest()
+    # Photos from phones are rotated through their EXIF orientation
+    image = ImageOps.exif_transpose(image)
+    image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    directory = posixpath.join(PROCESSED_DIR, f"{game_map.pk}-{digest[:16]}")
+    written = []
+
+    def write(name, content):
+        path = posixpath.join(directory, name)
+        if storage.exists(path):
+            storage.delete(path)
+        written.append(storage.save(path, ContentFile(content)))
+        return written[-1]
+
+    levels = []
+    for width, height in level_sizes(image.size):
+        level = image if (width, height) == image.size else image.resize((width, height), Image.LANCZOS)
+        content = encode_webp(level)
+        levels.append({
+            'name': write(f"{max(width, height)}.webp", content),
+            'width': width, 'height': height, 'bytes': len(content),
+        })
+
+    largest = image if levels[0]['width'] == image.width else image.resize(
+        (levels[0]['width'], levels[0]['height']), Image.LANCZOS)
+    columns = math.ceil(largest.width / TILE_SIZE)
+    rows = math.ceil(largest.height / TILE_SIZE)
+    tiles = [
+        write(f"tiles/{row}-{column}.webp", encode_webp(largest.crop((
+            column * TILE_SIZE, row * TILE_SIZE,
+            min(largest.width, (column + 1) * TILE_SIZE), min(largest.height, (row + 1) * TILE_SIZE),
+        ))))
+        for row in range(rows) for column in range(columns)
+    ]
+
+    previous = game_map.background_meta or {}
+    game_map.background_meta = {
+        'version': META_VERSION,
+        'source': game_map.background_image.name,
+        'sha256': digest,
+        'width': image.width,
+        'height': image.height,
+        'levels': levels,
+        'tiles': {'size': TILE_SIZE, 'columns': columns, 'rows': rows, 'names': tiles},
+        'fog': fog_palette(image.convert('RGB')),
+    }
+    game_map.save(update_fields=['background_meta'])
+    delete_processed(previous, storage, keep=written)
+    return game_map.background_meta
+
+
+def processed_names(meta):
+    return [level['name'] for level in meta.get('levels', [])] + list(meta.get('tiles', {}).get('names', []))
+
+
+def delete_processed(meta, storage=default_storage, keep=()):
+    keep = set(keep)
+    for name in processed_names(meta):
+        if name not in keep and storage.exists(name):
+            storage.delete(name)
+
+
+def is_processed(game_map):
+    meta = game_map.background_meta or {}
+    return (
+        bool(game_map.background_image) and meta.get('version') == META_VERSION
+        and meta.get('source') == game_map.background_image.name and bool(meta.get('levels'))
+    )
+
+
+def background_for(game_map, max_size=None, storage=default_storage):
+    """
+    What a page needs to draw ``game_map``'s background: the URL of the
+    largest level whose longest side is at most ``max_size`` (by default
+    MAP_TEXTURE_MAX_SIZE; the smallest level if none is), its tiles and the
+    fog palette. An unprocessed background is served as uploaded, with no
+    tiles and no palette (mapa.html then samples the fog itself). None when
+    the map has no background.
+    """
+    if not game_map or not game_map.background_image:
+        return None
+    if not is_processed(game_map):
+        return {'url': game_map.background_image.url, 'tiles': None, 'fog': None}
+
+    meta = game_map.background_meta
+    max_size = max_size or settings.MAP_TEXTURE_MAX_SIZE
+    fitting = [level for level in meta['levels'] if max(level['width'], level['height']) <= max_size]
+    level = fitting[0] if fitting else meta['levels'][-1]
+    tiles = meta['tiles']
+    return {
+        'url': storage.url(level['name']),
+        'width': level['width'],
+        'height': level['height'],
+        'tiles': {
+            'size': tiles['size'], 'columns': tiles['columns'], 'rows': tiles['rows'],
+            'width': meta['levels'][0]['width'], 'height': meta['levels'][0]['height'],
+            'urls': [storage.url(name) for name in tiles['names']],
+        },
+        'fog': meta['fog'],
+    }
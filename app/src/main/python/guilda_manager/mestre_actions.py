@@ -0,0 +1,567 @@
+"""
+Game Master (Mestre) console actions.
+
+Each action performs one write from a POST payload and returns an
+ActionResult with the message for the user and the entity it changed.
+mestre_view renders the result into the full console page;
+mestre_action_view (POST /mestre/acoes/<action>/) returns it as JSON, so the
+console applies one change without recomputing and re-rendering the page.
+"""
+from decimal import Decimal
+from django.shortcuts import get_object_or_404
+from config.write_queue import serialized_write
+from .hexmap import HexGrid, hexagon_data
+from .map_images import MapImageError, background_for, process_background
+from .models import Quest, Member, Squad, Dispatch, SquadRank, Map, Hexagon, Pin
+from .resolution import DispatchResolver
+from .services import DiceService
+
+
+class ActionResult:
+    """
+    Outcome of an action: ``message`` or ``error`` for the user, ``data``
+    with the changed entity, ``context`` with extra template variables for
+    mestre.html and ``redirect`` (URL name) when the console must be left.
+    """
+
+    def __init__(self, message=None, error=None, data=None, context=None, redirect=None):
+        self.message = message
+        self.error = error
+        self.data = data or {}
+        self.context = context or {}
+        self.redirect = redirect
+
+    def as_json(self):
+        payload = {'success': self.error is None, **self.data}
+        if self.error is not None:
+            payload['error'] = self.error
+        if self.message is not None:
+            payload['message'] = self.message
+        return payload
+
+
+ACTIONS = {}
+
+
+def action(name):
+    def register(function):
+        ACTIONS[name] = function
+        return function
+    return register
+
+
+@serialized_write
+def run_action(name, guild, data, files=None):
+    """Runs action ``name``; returns None for unknown actions."""
+    function = ACTIONS.get(name)
+    if function is None:
+        return None
+    return function(guild, data, files or {})
+
+
+# --- Entities returned to the console ---
+
+def squad_data(squad):
+    return {
+        'id': squad.id,
+        'name': squad.name,
+        'rank_id': squad.rank_id,
+        'rank_name': squad.rank.name if squad.rank_id else None,
+        'missions_completed': squad.missions_completed,
+    }
+
+
+def rank_data(rank):
+    return {
+        'id': rank.id,
+        'name': rank.name,
+        'order': rank.order,
+        'missions_required': rank.missions_required,
+        'min_guild_level': rank.min_guild_level,
+    }
+
+
+def quest_data(quest):
+    return {
+        'id': quest.id,
+        'title': quest.title,
+        'rank': quest.rank,
+        'status': quest.status,
+        'duration_days': quest.duration_days,
+        'gold_reward': quest.gold_reward,
+        'gxp_reward': quest.gxp_reward,
+    }
+
+
+def dispatch_data(dispatch):
+    return {
+        'id': dispatch.id,
+        'status': dispatch.status,
+        'status_display': dispatch.get_status_display(),
+        'mission_id': dispatch.mission_id,
+        'squad_id': dispatch.squad_id,
+        'npc_count': dispatch.npc_count,
+        'target_date': dispatch.target_date,
+        'result_log': dispatch.result_log,
+    }
+
+
+def pin_data(pin):
+    return {'id': pin.id, 'name': pin.name, 'glb_path': pin.glb_path}
+
+
+def treasury_data(guild):
+    return {'funds': guild.funds, 'max_gold_cap': guild.max_gold_cap}
+
+
+# --- Dispatches ---
+
+@action('dispatch')
+def dispatch(guild, data, files):
+    try:
+        npc_count = int(data.get('npc_count', 0))
+        duration = int(data.get('duration', 1))
+    except ValueError:
+        npc_count = 0
+        duration = 1
+
+    mission_id = data.get('mission_id')
+
+    active_members_count = guild.members.filter(status=Member.Status.ACTIVE).count()
+
+    if npc_count <= 0:
+        return ActionResult(error="Número de NPCs inválido.")
+    if npc_count > active_members_count:
+        return ActionResult(error=f"Número de NPCs excede o total de membros ativos ({active_members_count}).")
+    if not mission_id:
+        return ActionResult(error="Missão não selecionada.")
+
+    mission = get_object_or_404(Quest, id=mission_id)
+
+    created = Dispatch.objects.create(
+        mission=mission,
+        npc_count=npc_count,
+        duration_days=duration,
+        status=Dispatch.Status.PENDING,
+        rank=mission.rank
+    )
+
+    mission.status = Quest.Status.DELEGATED
+    mission.save()
+
+    return ActionResult(
+        message=f"Despacho iniciado para missão '{mission.title}' com {npc_count} NPCs!",
+        data={'dispatch': dispatch_data(created), 'quest': quest_data(mission)},
+    )
+
+
+@action('resolve')
+def resolve(guild, data, files):
+    dispatch = get_object_or_404(Dispatch, id=data.get('dispatch_id'))
+
+    outcome = dispatch.resolve()
+
+    if not outcome:
+        return ActionResult(error="Não foi possível resolver o despacho (status inválido).")
+
+    msg = f"Resultado: Rolagem {outcome['roll']}."
+    if outcome['deaths'] > 0:
+        msg += f" {outcome['deaths']} Baixas: {', '.join(outcome['dead_names'])}."
+    else:
+        msg += " Sucesso!"
+    return ActionResult(message=msg, data={'dispatch': dispatch_data(dispatch), 'outcome': outcome})
+
+
+@action('resolve_due')
+def resolve_due(guild, data, files):
+    summary = DispatchResolver().resolve_due()
+
+    if not summary['resolved']:
+        return ActionResult(error="Nenhum despacho com prazo vencido.", data={'summary': summary})
+    return ActionResult(
+        message=(
+            f"{summary['resolved']} despachos resolvidos: {summary['completed']} sucessos, "
+            f"{summary['disasters']} desastres ({summary['deaths']} baixas)."
+        ),
+        data={'summary': summary},
+    )
+
+
+# --- Contracts ---
+
+QUICK_MISSION_TEMPLATES = [
+    {"title": "Escolta de Caravana", "desc": "Proteger uma caravana de mercadores viajando por estradas perigosas."},
+    {"title": "Caça aos Goblins", "desc": "Um grupo de goblins está saqueando fazendas próximas. Elimine-os."},
+    {"title": "Entrega Urgente", "desc": "Entregar uma mensagem sigilosa para um nobre em uma cidade vizinha."},
+    {"title": "Investigação na Floresta", "desc": "Lenhadores relataram sons estranhos e luzes na floresta sombria."},
+    {"title": "Limpeza de Porão", "desc": "Ratos gigantes invadiram o porão da taverna local."},
+]
+
+
+@action('create_quick_mission')
+def create_quick_mission(guild, data, files):
+    dice = DiceService.stream(guild)
+    template = dice.choice(QUICK_MISSION_TEMPLATES)
+
+    # Random Rank (weighted towards lower ranks)
+    rank = dice.weighted_choice(['F', 'E', 'D'], weights=[50, 30, 20])
+
+    # Calculate Rewards based on Rank
+    gxp = Quest.RANK_GXP_REWARDS.get(rank, 5)
+    gold = gxp * 10  # Simple formula: 1 GXP = 10 Gold
+    duration = dice.roll(3)  # 1-3 days for quick missions
+
+    quest = Quest.objects.create(
+        title=template['title'],
+        description=template['desc'],
+        rank=rank,
+        gxp_reward=gxp,
+        gold_reward=gold,
+        duration_days=duration,
+        guild=guild,
+        type=Quest.Type.EXTERNAL,
+        status=Quest.Status.OPEN
+    )
+    return ActionResult(
+        message=f"Missão Rápida '{template['title']}' criada com sucesso!",
+        data={'quest': quest_data(quest)},
+    )
+
+
+@action('create_custom_mission')
+def create_custom_mission(guild, data, files):
+    title = data.get('title')
+    description = data.get('description')
+    rank = data.get('rank')
+    duration_raw = data.get('duration')
+    gold_raw = data.get('reward_gold', 0)
+    gxp_raw = data.get('reward_xp', 0)
+
+    error = None
+    try:
+        gold = float(gold_raw)
+        gxp = int(gxp_raw)
+        duration = int(duration_raw)
+    except (ValueError, TypeError):
+        error = "Valores numéricos inválidos."
+
+    if error is None and title and description:
+        quest = Quest.objects.create(
+            title=title,
+            description=description,
+            rank=rank,
+            gxp_reward=gxp,
+            gold_reward=gold,
+            duration_days=duration,
+            guild=guild,
+            type=Quest.Type.EXTERNAL,
+            status=Quest.Status.OPEN
+        )
+        return ActionResult(
+            message=f"Missão Personalizada '{title}' criada com sucesso!",
+            data={'quest': quest_data(quest)},
+        )
+
+    # Back to the custom form, filled in
+    return ActionResult(
+        error=error or "Título e descrição são obrigatórios.",
+        context={
+            'form_data': {
+                'title': title,
+                'description': description,
+                'rank': rank,
+                'duration': duration_raw,
+                'reward_gold': gold_raw,
+                'reward_xp': gxp_raw
+            },
+            'force_tab': 'contratos',
+            'force_mission_view': 'custom',
+        },
+    )
+
+
+# --- Guild ---
+
+@action('config')
+def config(guild, data, files):
+    guild.legal_status = data.get('legal_status')
+    guild.moral_alignment = data.get('moral_alignment')
+    guild.save()
+    return ActionResult(
+        message="Configurações da Guilda atualizadas.",
+        data={'guild': {'legal_status': guild.legal_status, 'moral_alignment': guild.moral_alignment}},
+    )
+
+
+@action('manage_gold')
+def manage_gold(guild, data, files):
+    try:
+        amount = float(data.get('amount', 0))
+    except ValueError:
+        return ActionResult(error="Valor inválido.")
+    operation = data.get('operation')
+
+    if amount < 0:
+        return ActionResult(error="O valor deve ser positivo.")
+
+    message = None
+    if operation == 'add':
+        current_funds = guild.funds
+        max_cap = guild.max_gold_cap
+
+        if current_funds >= max_cap:
+            return ActionResult(error="O tesouro já está cheio!", data={'treasury': treasury_data(guild)})
+
+        new_funds = current_funds + Decimal(amount)
+        if new_funds > max_cap:
+            guild.funds = max_cap
+            message = f"Tesouro adicionado. (Limitado ao teto de {max_cap} T$)"
+        else:
+            guild.funds = new_funds
+            message = f"{amount} T$ adicionados ao tesouro."
+        guild.save()
+
+    elif operation == 'remove':
+        current_funds = guild.funds
+        new_funds = current_funds - Decimal(amount)
+
+        if new_funds < 0:
+            guild.funds = 0
+            message = "Tesouro removido. (Fundos zerados)"
+        else:
+            guild.funds = new_funds
+            message = f"{amount} T$ removidos do tesouro."
+        guild.save()
+
+    return ActionResult(message=message, data={'treasury': treasury_data(guild)})
+
+
+@action('delete_guild')
+def delete_guild(guild, data, files):
+    guild.delete()
+    return ActionResult(redirect='entry_portal')
+
+
+# --- Squad CRUD ---
+
+@action('create_squad')
+def create_squad(guild, data, files):
+    name = data.get('name')
+    if not name:
+        return ActionResult()
+    # Assign lowest rank by default
+    initial_rank = SquadRank.objects.order_by('order').first()
+    squad = Squad.objects.create(name=name, guild=guild, rank=initial_rank)
+    return ActionResult(message=f"Esquadrão {name} criado.", data={'squad': squad_data(squad)})
+
+
+@action('delete_squad')
+def delete_squad(guild, data, files):
+    squad_id = data.get('squad_id')
+    Squad.objects.filter(id=squad_id).delete()
+    return ActionResult(message="Esquadrão removido.", data={'deleted': {'squad': squad_id}})
+
+
+@action('edit_squad')
+def edit_squad(guild, data, files):
+    name = data.get('name')
+    rank_id = data.get('rank_id')
+    squad = get_object_or_404(Squad.objects.select_related('rank'), id=data.get('squad_id'))
+    if name: squad.name = name
+    if rank_id: squad.rank_id = rank_id
+    squad.save()
+    return ActionResult(message=f"Esquadrão {squad.name} atualizado.", data={'squad': squad_data(squad)})
+
+
+# --- Rank CRUD ---
+
+@action('create_rank')
+def create_rank(guild, data, files):
+    name = data.get('name')
+    order = data.get('order')
+    missions = data.get('missions')
+    guild_level = data.get('guild_level')
+
+    if not (name and order):
+        return ActionResult()
+    rank = SquadRank.objects.create(
+        name=name,
+        order=order,
+        missions_required=missions or 0,
+        min_guild_level=guild_level or 1
+    )
+    rank.refresh_from_db()
+    return ActionResult(message=f"Patente {name} criada.", data={'rank': rank_data(rank)})
+
+
+@action('delete_rank')
+def delete_rank(guild, data, files):
+    rank_id = data.get('rank_id')
+    try:
+        SquadRank.objects.filter(id=rank_id).delete()
+    except Exception:
+        return ActionResult(error="Não foi possível remover a patente (pode estar em uso).")
+    return ActionResult(message="Patente removida.", data={'deleted': {'rank': rank_id}})
+
+
+@action('edit_rank')
+def edit_rank(guild, data, files):
+    rank_obj = get_object_or_404(SquadRank, id=data.get('rank_id'))
+    rank_obj.name = data.get('name')
+    rank_obj.order = data.get('order')
+    rank_obj.missions_required = data.get('missions')
+    rank_obj.min_guild_level = data.get('guild_level')
+    rank_obj.save()
+    rank_obj.refresh_from_db()
+    return ActionResult(message=f"Patente {rank_obj.name} atualizada.", data={'rank': rank_data(rank_obj)})
+
+
+# --- Map ---
+
+@action('update_hex')
+def update_hex(guild, data, files):
+    try:
+        q = int(data.get('q'))
+        r = int(data.get('r'))
+        pin_id = data.get('pin_id')
+        pin = Pin.objects.get(id=pin_id) if pin_id else None
+    except (ValueError, TypeError, Pin.DoesNotExist):
+        return ActionResult(error="Erro ao atualizar hexágono. Dados inválidos.")
+
+    # Ensure map exists
+    game_map = Map.objects.first()
+    if not game_map:
+        # Create default if missing (should be handled by setup script but safety first)
+        game_map = Map.objects.create(name="Reino", background_image="guilda_manager/placeholder.png")
+
+    hex_obj, created = Hexagon.objects.get_or_create(
+        map=game_map,
+        q=q,
+        r=r
+    )
+
+    hex_obj.title = data.get('title')
+    hex_obj.description = data.get('description')
+    hex_obj.pin = pin
+    hex_obj.blocked = data.get('blocked') in ('on', '1', 'true')
+    hex_obj.save()
+
+    return ActionResult(
+        message=f"Hexágono ({q}, {r}) atualizado com sucesso.",
+        data={'hexagon': hexagon_data(hex_obj)},
+        context={'force_tab': 'mapa'},
+    )
+
+
+# Longest side of the background level drawn by the Mestre console map
+MESTRE_MAP_SIZE = 1024
+
+
+@action('upload_map')
+def upload_map(guild, data, files):
+    if 'map_image' not in files:
+        return ActionResult(error="Nenhuma imagem selecionada.")
+
+    game_map = Map.objects.first()
+    if not game_map:
+        game_map = Map(name="Reino")
+
+    previous = game_map.background_image.name if game_map.background_image else None
+    game_map.background_image = files['map_image']
+    game_map.save()
+    # Levels, tiles and fog palette, so the pages never load the full photo
+    try:
+        process_background(game_map)
+    except MapImageError:
+        game_map.background_image.delete(save=False)
+        game_map.background_image = previous
+        game_map.save(update_fields=['background_image'])
+        return ActionResult(error="Não foi possível processar a imagem do mapa.", context={'force_tab': 'mapa'})
+    return ActionResult(
+        message="Imagem do mapa atualizada com sucesso!",
+        data={'map': {'id': game_map.id, 'background': background_for(game_map, MESTRE_MAP_SIZE)}},
+        context={'force_tab': 'mapa'},
+    )
+
+
+# A radius-120 map has 43 561 hexes
+MAX_MAP_RADIUS = 120
+
+
+@action('resize_map')
+def resize_map(guild, data, files):
+    try:
+        radius = int(data.get('radius'))
+    except (ValueError, TypeError):
+        radius = -1
+    if not 1 <= radius <= MAX_MAP_RADIUS:
+        return ActionResult(error=f"O raio do mapa deve estar entre 1 e {MAX_MAP_RADIUS}.", context={'force_tab': 'mapa'})
+
+    game_map = Map.objects.first()
+    if not game_map:
+        game_map = Map.objects.create(name="Reino", background_image="guilda_manager/placeholder.png")
+    game_map.radius = radius
+    game_map.save(update_fields=['radius'])
+    return ActionResult(
+        message=f"Mapa redimensionado para raio {radius}.",
+        data={'map': {'id': game_map.id, 'radius': radius}},
+        context={'force_tab': 'mapa'},
+    )
+
+
+@action('create_pin')
+def create_pin(guild, data, files):
+    name = data.get('name')
+    glb_path = data.get('glb_path')
+    if not (name and glb_path):
+        return ActionResult(error="Nome e modelo são obrigatórios.")
+    pin = Pin.objects.create(name=name, glb_path=glb_path)
+    return ActionResult(
+        message=f"Pin '{name}' criado com sucesso.",
+        data={'pin': pin_data(pin)},
+        context={'force_tab': 'mapa'},
+    )
+
+
+@action('delete_pin')
+def delete_pin(guild, data, files):
+    pin_id = data.get('pin_id')
+    try:
+        Pin.objects.filter(id=pin_id).delete()
+    except Exception:
+        return ActionResult(error="Erro ao remover pin.")
+    return ActionResult(
+        message="Pin removido com sucesso.",
+        data={'deleted': {'pin': pin_id}},
+        context={'force_tab': 'mapa'},
+    )
+
+
+@action('move_party')
+def move_party(guild, data, files):
+    try:
+        q = int(data.get('q'))
+        r = int(data.get('r'))
+    except (ValueError, TypeError):
+        return ActionResult(error="Coordenadas inválidas para mover a comitiva.")
+
+    game_map = Map.objects.first()
+    grid = HexGrid.for_map(game_map) if game_map else HexGrid(Map._meta.get_field('radius').default)
+    target = (q, r)
+    if not grid.passable(target):
+        return ActionResult(error="Destino fora do mapa ou intransponível.", context={'force_tab': 'mapa'})
+
+    # A party without a position on the grid is placed anywhere
+    current = (guild.party_q, guild.party_r)
+    path = grid.path(current, target) if grid.contains(current) else [target]
+    if path is None:
+        return ActionResult(error="Destino inalcançável a partir da posição atual.", context={'force_tab': 'mapa'})
+
+    guild.party_q = q
+    guild.party_r = r
+    guild.save(update_fields=['party_q', 'party_r'])
+    return ActionResult(
+        message="A comitiva moveu-se para um novo local.",
+        data={'q': q, 'r': r, 'path': path, 'distance': len(path) - 1},
+        context={'force_tab': 'mapa'},
+    )
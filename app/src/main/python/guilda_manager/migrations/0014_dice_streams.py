@@ -0,0 +1,53 @@
+# Generated by Django 4.2.9 on 2026-10-17 01:36
+
+from django.db import migrations, models
+import guilda_manager.services
+
+
+def seed_existing_guilds(apps, schema_editor):
+    # AddField evaluates the default once; give every guild its own stream
+    Guild = apps.get_model('guilda_manager', 'Guild')
+    for guild in Guild.objects.all():
+        guild.dice_seed = guilda_manager.services.new_dice_seed()
+        guild.save(update_fields=['dice_seed'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guilda_manager', '0013_upgrade_guildupgrade'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dispatch',
+            name='dice_cursor',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='dispatch',
+            name='dice_seed',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='guild',
+            name='dice_cursor',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='guild',
+            name='dice_seed',
+            field=models.BigIntegerField(default=guilda_manager.services.new_dice_seed),
+        ),
+        migrations.AddField(
+            model_name='quest',
+            name='dice_cursor',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='quest',
+            name='dice_seed',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(seed_existing_guilds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.9 on 2026-10-17 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guilda_manager', '0014_dice_streams'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quest',
+            index=models.Index(fields=['created_at', 'id'], name='quest_created_at_id_idx'),
+        ),
+    ]
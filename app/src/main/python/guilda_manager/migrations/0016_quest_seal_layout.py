@@ -0,0 +1,40 @@
+# Generated by Django 4.2.9 on 2026-10-17 01:49
+
+from django.db import migrations, models
+import guilda_manager.services
+
+
+def compute_existing_layouts(apps, schema_editor):
+    Quest = apps.get_model('guilda_manager', 'Quest')
+    quests = list(Quest.objects.only('id', 'title'))
+    for quest in quests:
+        quest.seal_rotation, quest.seal_top_offset, quest.seal_right_offset = (
+            guilda_manager.services.seal_layout(quest.pk, quest.title)
+        )
+    Quest.objects.bulk_update(quests, ['seal_rotation', 'seal_top_offset', 'seal_right_offset'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guilda_manager', '0015_quest_cursor_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quest',
+            name='seal_right_offset',
+            field=models.SmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='quest',
+            name='seal_rotation',
+            field=models.SmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='quest',
+            name='seal_top_offset',
+            field=models.SmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(compute_existing_layouts, migrations.RunPython.noop),
+    ]
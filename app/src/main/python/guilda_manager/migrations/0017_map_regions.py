@@ -0,0 +1,28 @@
+# Generated by Django 4.2.9 on 2026-10-17 02:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guilda_manager', '0016_quest_seal_layout'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hexagon',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='map',
+            name='radius',
+            field=models.PositiveSmallIntegerField(default=5, help_text='Raio da grade, em hexágonos'),
+        ),
+        migrations.AddField(
+            model_name='pin',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.9 on 2026-10-17 02:06
+
+from django.db import migrations, models
+from django.db.models import F
+import guilda_manager.models
+
+
+def compute_s(apps, schema_editor):
+    Hexagon = apps.get_model('guilda_manager', 'Hexagon')
+    Hexagon.objects.update(s=-F('q') - F('r'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guilda_manager', '0017_map_regions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hexagon',
+            name='s',
+            field=guilda_manager.models.CubeSField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.RunPython(compute_s, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='hexagon',
+            name='blocked',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='hexagon',
+            index=models.Index(fields=['map', 'q', 'r', 's'], name='hexagon_map_q_r_s_idx'),
+        ),
+    ]
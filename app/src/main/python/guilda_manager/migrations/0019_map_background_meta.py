@@ -0,0 +1,18 @@
+# Generated by Django 4.2.9 on 2026-10-17 02:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guilda_manager', '0018_hexagon_spatial_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='map',
+            name='background_meta',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
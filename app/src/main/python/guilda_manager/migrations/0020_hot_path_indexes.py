@@ -0,0 +1,46 @@
+# Generated by Django 4.2.9 on 2026-10-17 02:26
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def drop_duplicate_upgrades(apps, schema_editor):
+    # Keeps the first acquisition of each (guild, upgrade) so the unique constraint applies
+    GuildUpgrade = apps.get_model('guilda_manager', 'GuildUpgrade')
+    first_ids = GuildUpgrade.objects.values('guild', 'upgrade').annotate(first_id=Min('id')).values('first_id')
+    GuildUpgrade.objects.exclude(id__in=first_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guilda_manager', '0019_map_background_meta'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dispatch',
+            index=models.Index(fields=['status', 'target_date'], name='dispatch_status_target_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='guildbuilding',
+            index=models.Index(fields=['guild', 'building'], name='guildbuilding_lookup_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['guild', 'status'], name='member_guild_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quest',
+            index=models.Index(fields=['status', 'rank', 'title'], name='quest_status_rank_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quest',
+            index=models.Index(fields=['guild', 'status'], name='quest_guild_status_idx'),
+        ),
+        migrations.RunPython(drop_duplicate_upgrades, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='guildupgrade',
+            constraint=models.UniqueConstraint(fields=('guild', 'upgrade'), name='guildupgrade_unique'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.9 on 2026-10-17 02:53
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guilda_manager', '0020_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='hexagon',
+            name='hexagon_map_q_r_s_idx',
+        ),
+    ]
@@ -1,8 +1,12 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Least
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
+from django.urls import reverse
 from decimal import Decimal
-from .services import GuildLevelService
+from config.write_queue import serialized_write
+from .services import DiceService, GuildLevelService, GuildStatsService, new_dice_seed, seal_layout
 import random
 import string
 
@@ -124,6 +128,10 @@ class Guild(models.Model):
     party_q = models.IntegerField(default=0)
     party_r = models.IntegerField(default=0)
 
+    # Seeded dice stream (see DiceService): next cursor to hand out
+    dice_seed = models.BigIntegerField(default=new_dice_seed)
+    dice_cursor = models.PositiveBigIntegerField(default=0)
+
     def save(self, *args, **kwargs):
         if not self.code:
              self.code = self.generate_unique_code()
@@ -140,8 +148,8 @@ class Guild(models.Model):
 
     @property
     def qr_code_url(self):
-        # Using a reliable public QR code API
-        return f"https://api.qrserver.com/v1/create-qr-code/?size=150x150&data={self.code}"
+        # Encoded locally (guilda_manager/qr.py): the share screen works offline
+        return reverse('guild_qr', kwargs={'code': self.code, 'fmt': 'svg'})
 
     def __str__(self):
         return self.name
@@ -150,42 +158,40 @@ class Guild(models.Model):
     def base_stats(self):
         return GuildLevelService.get_base_stats(self.level)
 
+    @property
+    def stats(self):
+        """All building-derived stats, computed in one query and memoized."""
+        return GuildStatsService.get_stats(self)
+
     @property
     def max_gold_cap(self):
-        base = self.base_stats['base_gold_cap']
-        # Check for 'Caixa-Forte' by name as per requirements, or slug if available.
-        # Using name is safer if slugs aren't guaranteed to be specific strings in the prompt
-        # (though prompt implies specific buildings).
-        # "Caixa-Forte" is the name given.
-        if self.guild_buildings.filter(building__name="Caixa-Forte").exists():
-            return base * Decimal('1.5')
-        return base
+        # "Caixa-Forte" increases the cap by 50%
+        return self.stats['max_gold_cap']
 
     @property
     def max_member_slots(self):
-        base = self.base_stats['base_member_slots']
-        # "Alojamentos Expandidos"
-        if self.guild_buildings.filter(building__name="Alojamentos Expandidos").exists():
-            # Increase by 20%
-            return int(base * 1.2)
-        return base
+        # "Alojamentos Expandidos" increases the slots by 20%
+        return self.stats['max_member_slots']
 
     @property
     def used_building_slots(self):
-        return self.guild_buildings.aggregate(
-            total=models.Sum('building__slots_required')
-        )['total'] or 0
+        return self.stats['used_building_slots']
 
     @property
     def available_building_slots(self):
-        base = self.base_stats['base_building_slots']
-        return base - self.used_building_slots
+        return self.stats['available_building_slots']
 
 class GuildBuilding(models.Model):
     guild = models.ForeignKey(Guild, related_name='guild_buildings', on_delete=models.CASCADE)
     building = models.ForeignKey(Building, on_delete=models.CASCADE)
     built_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # "Does the guild have this building?" (bonus and requirement checks)
+            models.Index(fields=['guild', 'building'], name='guildbuilding_lookup_idx'),
+        ]
+
     def __str__(self):
         return f"{self.guild.name} - {self.building.name}"
 
@@ -194,6 +200,13 @@ class GuildUpgrade(models.Model):
     upgrade = models.ForeignKey(Upgrade, on_delete=models.CASCADE)
     acquired_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            # An upgrade is acquired once (UpgradePurchaseSerializer); also the
+            # index of its "already acquired" / requirement lookups.
+            models.UniqueConstraint(fields=['guild', 'upgrade'], name='guildupgrade_unique'),
+        ]
+
     def __str__(self):
         return f"{self.guild.name} - {self.upgrade.name}"
 
@@ -211,6 +224,12 @@ class Member(models.Model):
 
     # Optional: Level, Class, etc could be added later.
 
+    class Meta:
+        indexes = [
+            # Active members of a guild (dispatch form, Dispatch.resolve)
+            models.Index(fields=['guild', 'status'], name='member_guild_status_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -310,114 +329,148 @@ class Quest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Dice stream of the delegation, to replay it (see DiceService.replay)
+    dice_seed = models.BigIntegerField(null=True, blank=True)
+    dice_cursor = models.PositiveBigIntegerField(null=True, blank=True)
+
+    # Wax seal placement on the missions board (see seal_layout), stored on
+    # creation and on title changes. Null until computed.
+    seal_rotation = models.SmallIntegerField(null=True, blank=True, editable=False)
+    seal_top_offset = models.SmallIntegerField(null=True, blank=True, editable=False)
+    seal_right_offset = models.SmallIntegerField(null=True, blank=True, editable=False)
+
+    SEAL_FIELDS = ('seal_rotation', 'seal_top_offset', 'seal_right_offset')
+
+    class Meta:
+        indexes = [
+            # Cursor pagination of the Quest API
+            models.Index(fields=['created_at', 'id'], name='quest_created_at_id_idx'),
+            # Open quests by rank and title, completed counts by rank (mestre_view)
+            models.Index(fields=['status', 'rank', 'title'], name='quest_status_rank_title_idx'),
+            models.Index(fields=['guild', 'status'], name='quest_guild_status_idx'),
+        ]
+
+    @property
+    def seal_image_path(self):
+        return f"guilda_manager/images/SELOS/{self.rank}.png"
+
+    def set_seal_layout(self):
+        """Computes the seal placement in memory; returns True if it changed."""
+        layout = seal_layout(self.pk, self.title)
+        if layout == (self.seal_rotation, self.seal_top_offset, self.seal_right_offset):
+            return False
+        self.seal_rotation, self.seal_top_offset, self.seal_right_offset = layout
+        return True
+
     def save(self, *args, **kwargs):
         if not self.gxp_reward and self.rank:
             self.gxp_reward = self.RANK_GXP_REWARDS.get(self.rank, 0)
+
+        creating = self.pk is None
+        update_fields = kwargs.get('update_fields')
+        if not creating and (update_fields is None or 'title' in update_fields):
+            if self.set_seal_layout() and update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *self.SEAL_FIELDS}
         super().save(*args, **kwargs)
 
+        # The layout depends on the id, known only after the insert
+        if creating and self.set_seal_layout():
+            Quest.objects.filter(pk=self.pk).update(**{name: getattr(self, name) for name in self.SEAL_FIELDS})
+
+    @serialized_write(retry=True)
     def resolve_delegation(self):
         """
         Executes the logic for delegating a quest.
         Assuming 'assigned_members' are already set or handled by the caller before calling this.
         This method performs the 'Destiny Check' immediately as per requirements.
-        """
 
-        # Modifiers
-        has_war_room = self.guild.guild_buildings.filter(building__name='Sala de Guerra').exists() or \
-                       self.guild.guild_buildings.filter(building__slug='sala-de-guerra').exists()
+        Funds, quest status and victims are written with single UPDATE
+        statements inside one transaction, so concurrent delegations against
+        the same guild never lose fund updates.
+        """
 
-        has_arsenal = self.guild.guild_buildings.filter(building__name='Arsenal').exists() or \
-                      self.guild.guild_buildings.filter(building__slug='arsenal').exists()
+        # Modifiers (loaded with the guild stats in a single query)
+        modifiers = self.guild.stats['modifiers']
 
-        # Operational Cost Logic (Deduct Funds)
+        # Operational Cost Logic
         cost = self.operational_cost
-        if has_arsenal:
+        if modifiers['arsenal']:
             cost = cost * Decimal('0.8') # 20% reduction
 
-        if self.guild.funds >= cost:
-             self.guild.funds -= cost
-             self.guild.save()
-        else:
-             # Logic if funds are insufficient?
-             # For now, we assume validation happened before, or we proceed with negative funds/error?
-             # I'll just deduct it, allowing debt or it should be checked in ViewSet.
-             self.guild.funds -= cost
-             self.guild.save()
-
         # Destiny Check
-        roll1 = random.randint(1, 20)
+        dice = DiceService.stream(self.guild)
+        self.dice_seed, self.dice_cursor = dice.seed, dice.cursor
+        roll1 = dice.roll(20)
         roll = roll1
 
-        if has_war_room:
-            roll2 = random.randint(1, 20)
+        if modifiers['war_room']:
+            roll2 = dice.roll(20)
             roll = max(roll1, roll2)
 
-        if roll == 1:
-            # Critical Failure -> Disaster
-            self.status = self.Status.DISASTER
-            self.save()
+        with transaction.atomic():
+            # Deduct Funds. Insufficient funds are allowed (debt); validation
+            # is expected to happen before, in the ViewSet.
+            Guild.objects.filter(pk=self.guild_id).update(funds=F('funds') - cost)
+
+            if roll == 1:
+                # Critical Failure -> Disaster
+                self.status = self.Status.DISASTER
+                Quest.objects.filter(pk=self.pk).update(
+                    status=self.status, dice_seed=self.dice_seed, dice_cursor=self.dice_cursor,
+                    updated_at=timezone.now()
+                )
 
-            # Blood Cost
-            dead_count = random.randint(1, 6)
-            members = list(self.assigned_members.all())
-            # Kill 'dead_count' members randomly? Or first ones?
-            # "result is the number of assigned NPCs that are killed"
-            # I'll shuffle and pick
-            random.shuffle(members)
-            victims = members[:dead_count]
-
-            for victim in victims:
-                victim.status = Member.Status.DECEASED
-                victim.save()
-
-            return {
-                'outcome': 'DISASTER',
-                'roll': roll,
-                'dead_count': len(victims),
-                'victims': [m.name for m in victims]
-            }
-
-        else:
-            # Success (2-20) -> Completed
-            self.complete_quest()
-            return {
-                'outcome': 'SUCCESS',
-                'roll': roll
-            }
+                # Blood Cost: "result is the number of assigned NPCs that are killed"
+                dead_count = dice.roll(6)
+                victims = dice.sample(self.assigned_members.order_by('id'), dead_count)
 
+                Member.objects.filter(pk__in=[victim.pk for victim in victims]).update(status=Member.Status.DECEASED)
+                self.guild.refresh_from_db(fields=['funds', 'gxp'])
+
+                return {
+                    'outcome': 'DISASTER',
+                    'roll': roll,
+                    'dead_count': len(victims),
+                    'victims': [m.name for m in victims]
+                }
+
+            else:
+                # Success (2-20) -> Completed
+                Quest.objects.filter(pk=self.pk).update(dice_seed=self.dice_seed, dice_cursor=self.dice_cursor)
+                self.complete_quest()
+                return {
+                    'outcome': 'SUCCESS',
+                    'roll': roll
+                }
+
+    @serialized_write(retry=True)
     def complete_quest(self):
         """
         Completes the quest, distributing rewards.
-        """
-        if self.status == self.Status.COMPLETED:
-            return # Already completed
-
-        # Add GXP
-        self.guild.gxp += self.gxp_reward
 
-        # Add Gold (Respect Cap)
+        The quest is claimed and the rewards applied with single UPDATE
+        statements in one transaction, so a quest completed concurrently is
+        only paid once and no fund update is lost. Whether it is already
+        completed is read from the database, not from self.status: an
+        attempt rolled back by the write queue leaves it set.
+        """
+        # Gold respects the Vault limit; the excess is lost.
         max_cap = self.guild.max_gold_cap
-        current_funds = self.guild.funds
-        reward = self.gold_reward
 
-        # If current funds + reward > max_cap, cap it?
-        # "respecting the Vault limit logic implemented previously"
-        # Usually this means we can't go over cap, or excess is lost.
-        # Assuming excess is lost.
-
-        new_funds = current_funds + reward
-        if new_funds > max_cap:
-            new_funds = max_cap
-
-        self.guild.funds = new_funds
-
-        # Check level up? The logic for level up is usually manual or handled elsewhere,
-        # but prompt says "Guild progression logic (levels 1-10) is encapsulated in a helper class GuildLevelService"
-        # Does adding GXP trigger level up? Not specified. I'll just add GXP.
+        with transaction.atomic():
+            claimed = Quest.objects.filter(pk=self.pk).exclude(status=self.Status.COMPLETED).update(
+                status=self.Status.COMPLETED, updated_at=timezone.now()
+            )
+            if claimed:
+                # Level up is handled elsewhere; only GXP is added here.
+                Guild.objects.filter(pk=self.guild_id).update(
+                    gxp=F('gxp') + self.gxp_reward,
+                    funds=Least(F('funds') + self.gold_reward, max_cap),
+                )
 
-        self.guild.save()
         self.status = self.Status.COMPLETED
-        self.save()
+        if claimed:
+            self.guild.refresh_from_db(fields=['funds', 'gxp'])
 
     def __str__(self):
         return f"{self.title} ({self.get_status_display()})"
@@ -442,6 +495,16 @@ class Dispatch(models.Model):
 
     result_log = models.TextField(blank=True, help_text="Log of the resolution (roll, deaths, etc)")
 
+    # Dice stream of the resolution, to replay it (see DiceService.replay)
+    dice_seed = models.BigIntegerField(null=True, blank=True)
+    dice_cursor = models.PositiveBigIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Pending dispatches by due date (mestre_view, DispatchResolver.due_dispatches)
+            models.Index(fields=['status', 'target_date'], name='dispatch_status_target_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.target_date and self.start_date:
             self.target_date = self.start_date + timezone.timedelta(days=self.duration_days)
@@ -450,98 +513,20 @@ class Dispatch(models.Model):
     def resolve(self):
         """
         Executes the Test of Destiny logic.
-        """
-        if self.status != self.Status.PENDING:
-            return None
-
-        # Guild Context
-        if self.squad:
-            guild = self.squad.guild
-        elif self.mission:
-            guild = self.mission.guild
-        else:
-            return None
-
-        # War Room Check
-        has_war_room = guild.guild_buildings.filter(building__name='Sala de Cartografia').exists() or \
-                       guild.guild_buildings.filter(building__slug='sala-cartografia').exists() or \
-                       guild.guild_buildings.filter(building__name='Sala de Guerra').exists()
-
-        # Roll
-        roll1 = random.randint(1, 20)
-        roll_final = roll1
-
-        if has_war_room:
-            roll2 = random.randint(1, 20)
-            roll_final = max(roll1, roll2)
-
-        outcome_data = {
-            'roll': roll_final,
-            'has_war_room': has_war_room,
-            'deaths': 0,
-            'dead_names': []
-        }
-
-        if roll_final == 1:
-            # Critical Failure -> Disaster
-            self.status = self.Status.DISASTER
-
-            # Blood Cost
-            if self.squad:
-                deaths = random.randint(1, 6)
-                members = list(self.squad.members.filter(status=Member.Status.ACTIVE))
-                random.shuffle(members)
-                victims = members[:deaths]
-            else:
-                deaths = self.npc_count
-                members = list(guild.members.filter(status=Member.Status.ACTIVE))
-                random.shuffle(members)
-                victims = members[:deaths]
-
-            for v in victims:
-                v.status = Member.Status.DECEASED
-                v.save()
-                outcome_data['dead_names'].append(v.name)
-
-            outcome_data['deaths'] = len(victims)
-            self.result_log = f"Rolagem: {roll_final} (Crítico). Mortes: {len(victims)} ({', '.join(outcome_data['dead_names'])})"
-
-            if self.mission:
-                 self.mission.status = Quest.Status.DISASTER
-                 self.mission.save()
-
-        elif roll_final >= 2:
-            # Success
-            self.status = self.Status.COMPLETED
-
-            if self.squad:
-                # Create Internal Quest for History (Legacy)
-                quest = Quest.objects.create(
-                    title=f"Despacho: {self.squad.name} (Rank {self.rank or 'F'})",
-                    description=f"Missão automática realizada pelo esquadrão {self.squad.name}.",
-                    type=Quest.Type.INTERNAL,
-                    status=Quest.Status.COMPLETED,
-                    rank=self.rank or 'F',
-                    duration_days=self.duration_days,
-                    guild=guild,
-                )
-                quest.assigned_members.set(self.squad.members.all())
-                quest.complete_quest()
-
-                self.squad.missions_completed += 1
-                self.squad.check_rank_progression()
-                self.squad.save()
-            elif self.mission:
-                self.mission.complete_quest()
-
-            self.result_log = f"Rolagem: {roll_final}. Sucesso! Recompensa entregue."
 
-        self.save()
-        return outcome_data
+        Runs through DispatchResolver (resolution.py) as a batch of one, so a
+        single resolution and the bulk one share the same rules.
+        """
+        from .resolution import DispatchResolver
+        return DispatchResolver().resolve([self])[0]
 
 class Map(models.Model):
     name = models.CharField(max_length=100)
     background_image = models.ImageField(upload_to='maps/', blank=True, null=True, help_text="Upload map image")
+    # The grid is the hexagon of this radius around (0, 0)
+    radius = models.PositiveSmallIntegerField(default=5, help_text="Raio da grade, em hexágonos")
+    # Levels, tiles and fog palette of background_image (map_images.py)
+    background_meta = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return self.name
@@ -549,19 +534,38 @@ class Map(models.Model):
 class Pin(models.Model):
     name = models.CharField(max_length=100)
     glb_path = models.CharField(max_length=200, help_text="Filename of GLB in static/guilda_manager/pins/")
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
+class CubeSField(models.IntegerField):
+    """
+    Third cube coordinate of an axial (q, r) hex, s = -q - r. Set from q and
+    r on every save and bulk_create (like auto_now), so it is never out of date
+    except after a queryset update() of q or r.
+    """
+
+    def pre_save(self, model_instance, add):
+        value = -model_instance.q - model_instance.r
+        setattr(model_instance, self.attname, value)
+        return value
+
 class Hexagon(models.Model):
     map = models.ForeignKey(Map, related_name='hexagons', on_delete=models.CASCADE)
     pin = models.ForeignKey(Pin, related_name='hexagons', on_delete=models.SET_NULL, null=True, blank=True)
     q = models.IntegerField()
     r = models.IntegerField()
+    s = CubeSField(editable=False)
     title = models.CharField(max_length=100, blank=True)
     description = models.TextField(blank=True)
+    # Impassable terrain for pathfinding (hexmap.HexGrid)
+    blocked = models.BooleanField(default=False)
+    # Part of the region ETags (hexmap.region_etag)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
+        # Its index also serves the range and radius queries (hexmap.Region)
         unique_together = ('map', 'q', 'r')
 
     def __str__(self):
@@ -0,0 +1,241 @@
+"""
+Pin models (static/guilda_manager/pins/) and their optimized variants.
+
+`manage.py optimize_pins` runs at build time: for each source GLB it writes
+level-of-detail variants under pins/optimized/ (stripped, quantized and, past
+LOD 0, decimated; see gltf.py) and describes them in
+pins/optimized/manifest.json. The views then serve, through pin_model(), the
+lightest variant that is still adequate for where the pin is shown.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from django.conf import settings
+from . import gltf
+
+PINS_DIR = os.path.join(settings.BASE_DIR, 'guilda_manager', 'static', 'guilda_manager', 'pins')
+# Relative to the pins directory, as the views and mapa.html address models
+OPTIMIZED_DIR = 'optimized'
+MANIFEST_NAME = 'manifest.json'
+
+# Share of the source triangles kept by each LOD
+LOD_RATIOS = (1.0, 0.25, 0.08)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def optimize_pin(source_path, output_dir, ratios=LOD_RATIOS):
+    """
+    Writes the LOD variants of one GLB into ``output_dir`` and returns its
+    manifest entry. A model gltf.py cannot process gets an entry with an
+    'error' and no variants, so it is served as it is.
+    """
+    name = os.path.basename(source_path)
+    with open(source_path, 'rb') as handle:
+        data = handle.read()
+    entry = {'sha256': hashlib.sha256(data).hexdigest(), 'bytes': len(data), 'variants': []}
+
+    try:
+        document, binary = gltf.read_glb(data)
+        meshes = gltf.load_meshes(document, binary)
+    except gltf.GltfError as error:
+        entry['error'] = str(error)
+        return entry
+    entry['triangles'] = gltf.triangle_count(meshes)
+
+    stem = os.path.splitext(name)[0]
+    for lod, ratio in enumerate(ratios):
+        lod_meshes = [
+            {'name': mesh['name'], 'primitives': [gltf.decimate(primitive, ratio) for primitive in mesh['primitives']]}
+            for mesh in meshes
+        ]
+        encoded = gltf.encode(document, binary, lod_meshes)
+        file_name = f"{stem}.lod{lod}.glb"
+        with open(os.path.join(output_dir, file_name), 'wb') as handle:
+            handle.write(encoded)
+        entry['variants'].append({
+            'lod': lod,
+            'ratio': ratio,
+            'file': f"{OPTIMIZED_DIR}/{file_name}",
+            'bytes': len(encoded),
+            'triangles': gltf.triangle_count(lod_meshes),
+        })
+    return entry
+
+
+def build_manifest(pins_dir=PINS_DIR, ratios=LOD_RATIOS, force=False, log=None):
+    """
+    Optimizes every GLB of ``pins_dir`` and writes the manifest. Models whose
+    hash, ratios and variant files did not change are kept as they are
+    unless ``force``. Returns the manifest.
+    """
+    output_dir = os.path.join(pins_dir, OPTIMIZED_DIR)
+    os.makedirs(output_dir, exist_ok=True)
+    previous = _read_manifest(os.path.join(output_dir, MANIFEST_NAME)) or {}
+    previous_pins = previous.get('pins', {}) if previous.get('ratios') == list(ratios) else {}
+
+    pins = {}
+    for name in sorted(os.listdir(pins_dir)):
+        path = os.path.join(pins_dir, name)
+        if not name.lower().endswith('.glb') or not os.path.isfile(path):
+            continue
+        entry = previous_pins.get(name)
+        if force or not _is_current(entry, path, pins_dir):
+            entry = optimize_pin(path, output_dir, ratios)
+            if log:
+                log(name, entry)
+        pins[name] = entry
+
+    # Variants of models that were removed
+    kept = {variant['file'] for entry in pins.values() for variant in entry['variants']}
+    for name in os.listdir(output_dir):
+        if name.endswith('.glb') and f"{OPTIMIZED_DIR}/{name}" not in kept:
+            os.remove(os.path.join(output_dir, name))
+
+    manifest = {'version': 1, 'ratios': list(ratios), 'pins': pins}
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w', encoding='utf-8') as handle:
+        json.dump(manifest, handle, indent=2, sort_keys=True)
+        handle.write('\n')
+    return manifest
+
+
+def _is_current(entry, path, pins_dir):
+    if entry is None or entry['bytes'] != os.path.getsize(path) or entry['sha256'] != file_sha256(path):
+        return False
+    return all(os.path.exists(os.path.join(pins_dir, variant['file'])) for variant in entry['variants'])
+
+
+def _read_manifest(path):
+    try:
+        with open(path, encoding='utf-8') as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+_manifest_cache = {}
+_manifest_lock = threading.Lock()
+
+
+def load_manifest(pins_dir=None):
+    """The manifest of ``pins_dir`` (empty without one), reloaded when the file changes."""
+    path = os.path.join(pins_dir or PINS_DIR, OPTIMIZED_DIR, MANIFEST_NAME)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return {'pins': {}}
+    with _manifest_lock:
+        cached = _manifest_cache.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = _manifest_cache[path] = (mtime, _read_manifest(path) or {'pins': {}})
+        return cached[1]
+
+
+def manifest_version(pins_dir=None):
+    """Changes whenever the manifest is rewritten (so do the models pin_model() picks)."""
+    try:
+        return os.stat(os.path.join(pins_dir or PINS_DIR, OPTIMIZED_DIR, MANIFEST_NAME)).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def pin_model(glb_path, max_triangles, pins_dir=None):
+    """
+    Path (relative to the pins directory) of the model to serve for
+    ``glb_path``: the most detailed variant within ``max_triangles``, else
+    the lightest one, else the source file itself.
+    """
+    entry = load_manifest(pins_dir)['pins'].get(glb_path)
+    if not entry or not entry['variants']:
+        return glb_path
+    variants = sorted(entry['variants'], key=lambda variant: variant['triangles'])
+    adequate = [variant for variant in variants if variant['triangles'] <= max_triangles]
+    return (adequate[-1] if adequate else variants[0])['file']
+
+
+class PinCatalog:
+    """
+    Every GLB of the pins directory with its size, content hash, triangle
+    count, bounding box and optimized variants, for the Mestre screen and
+    /api/pin-assets/. Scanned once, then kept until the directory or the
+    manifest changes; their mtimes are checked at most every
+    RECHECK_SECONDS, so requests in between touch no file.
+    """
+
+    RECHECK_SECONDS = 2.0
+
+    _lock = threading.Lock()
+    _cache = {}  # pins_dir -> (mtimes, checked_at, entries)
+
+    @classmethod
+    def entries(cls, pins_dir=None):
+        pins_dir = pins_dir or PINS_DIR
+        now = time.monotonic()
+        with cls._lock:
+            cached = cls._cache.get(pins_dir)
+            if cached is not None and now - cached[1] < cls.RECHECK_SECONDS:
+                return cached[2]
+            mtimes = cls._mtimes(pins_dir)
+            if cached is None or cached[0] != mtimes:
+                entries = cls._scan(pins_dir)
+            else:
+                entries = cached[2]
+            cls._cache[pins_dir] = (mtimes, now, entries)
+            return entries
+
+    @classmethod
+    def invalidate(cls):
+        with cls._lock:
+            cls._cache.clear()
+
+    @staticmethod
+    def _mtimes(pins_dir):
+        mtimes = []
+        for path in (pins_dir, os.path.join(pins_dir, OPTIMIZED_DIR, MANIFEST_NAME)):
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    @staticmethod
+    def _scan(pins_dir):
+        try:
+            names = sorted(name for name in os.listdir(pins_dir) if name.lower().endswith('.glb'))
+        except OSError:
+            return []
+        manifest = load_manifest(pins_dir)['pins']
+
+        entries = []
+        for name in names:
+            path = os.path.join(pins_dir, name)
+            if not os.path.isfile(path):
+                continue
+            with open(path, 'rb') as handle:
+                data = handle.read()
+            entry = {
+                'name': name,
+                'bytes': len(data),
+                'sha256': hashlib.sha256(data).hexdigest(),
+                'triangles': None,
+                'bounds': None,
+                'variants': manifest.get(name, {}).get('variants', []),
+            }
+            try:
+                document, _ = gltf.read_glb(data)
+                entry['triangles'] = gltf.document_triangles(document)
+                bounds = gltf.scene_bounds(document)
+                if bounds:
+                    entry['bounds'] = {'min': list(bounds[0]), 'max': list(bounds[1])}
+            except gltf.GltfError as error:
+                entry['error'] = str(error)
+            entries.append(entry)
+        return entries
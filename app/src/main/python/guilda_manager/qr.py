@@ -0,0 +1,411 @@
+"""
+QR codes (ISO/IEC 18004), encoded and drawn locally.
+
+share_guild.html shows the guild code as a QR code, which used to be an
+<img> of api.qrserver.com: no network, no share screen. encode() builds the
+module matrix here (alphanumeric mode when the text allows it, byte mode
+otherwise; the smallest version that fits; the mask with the lowest
+penalty), render_svg() and render_png() draw it, the PNG with Pillow.
+
+QRCache renders each (text, format) once: the file is kept on disk under
+QR_CACHE_DIR, named by a key that also covers the encoder version, and the
+latest renderings in memory, so a repeated request is a dict lookup (or a
+304, the key being the ETag).
+"""
+import hashlib
+import io
+import os
+import re
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from PIL import Image
+
+# Part of every cache key / ETag: bump when the output changes
+ENCODER_VERSION = 1
+
+ALPHANUMERIC = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:'
+
+# Error correction level: (row in the tables below, format bits)
+ECC_LEVELS = {'L': (0, 1), 'M': (1, 0), 'Q': (2, 3), 'H': (3, 2)}
+
+# Per level (L, M, Q, H) and version (index 0 unused)
+ECC_CODEWORDS_PER_BLOCK = (
+    (-1, 7, 10, 15, 20, 26, 18, 20, 24, 30, 18, 20, 24, 26, 30, 22, 24, 28, 30, 28, 28, 28, 28, 30, 30, 26, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+    (-1, 10, 16, 26, 18, 24, 16, 18, 22, 22, 26, 30, 22, 22, 24, 24, 28, 28, 26, 26, 26, 26, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28),
+    (-1, 13, 22, 18, 26, 18, 24, 18, 22, 20, 24, 28, 26, 24, 20, 30, 24, 28, 28, 26, 30, 28, 30, 30, 30, 30, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+    (-1, 17, 28, 22, 16, 22, 28, 26, 26, 24, 28, 24, 28, 22, 24, 24, 30, 28, 28, 26, 28, 30, 24, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+)
+NUM_ERROR_CORRECTION_BLOCKS = (
+    (-1, 1, 1, 1, 1, 1, 2, 2, 2, 2, 4, 4, 4, 4, 4, 6, 6, 6, 6, 7, 8, 8, 9, 9, 10, 12, 12, 12, 13, 14, 15, 16, 17, 18, 19, 19, 20, 21, 22, 24, 25),
+    (-1, 1, 1, 1, 2, 2, 4, 4, 4, 5, 5, 5, 8, 9, 9, 10, 10, 11, 13, 14, 16, 17, 17, 18, 20, 21, 23, 25, 26, 28, 29, 31, 33, 35, 37, 38, 40, 43, 45, 47, 49),
+    (-1, 1, 1, 2, 2, 4, 4, 6, 6, 8, 8, 8, 10, 12, 16, 12, 17, 16, 18, 21, 20, 23, 23, 25, 27, 29, 34, 34, 35, 38, 40, 43, 45, 48, 51, 53, 56, 59, 62, 65, 68),
+    (-1, 1, 1, 2, 4, 4, 4, 5, 6, 8, 8, 11, 11, 16, 16, 18, 16, 19, 21, 25, 25, 25, 34, 30, 32, 35, 37, 40, 42, 45, 48, 51, 54, 57, 60, 63, 66, 70, 74, 77, 81),
+)
+
+MASKS = (
+    lambda x, y: (x + y) % 2 == 0,
+    lambda x, y: y % 2 == 0,
+    lambda x, y: x % 3 == 0,
+    lambda x, y: (x + y) % 3 == 0,
+    lambda x, y: (x // 3 + y // 2) % 2 == 0,
+    lambda x, y: x * y % 2 + x * y % 3 == 0,
+    lambda x, y: (x * y % 2 + x * y % 3) % 2 == 0,
+    lambda x, y: ((x + y) % 2 + x * y % 3) % 2 == 0,
+)
+
+# Quiet zone, in modules
+BORDER = 4
+
+
+class QRError(ValueError):
+    """The text does not fit in a version 40 QR code."""
+
+
+# Reed-Solomon over GF(2^8), polynomial 0x11D
+
+def _gf_multiply(x, y):
+    z = 0
+    for i in reversed(range(8)):
+        z = (z << 1) ^ ((z >> 7) * 0x11D)
+        z ^= ((y >> i) & 1) * x
+    return z
+
+
+def rs_divisor(degree):
+    result = [0] * (degree - 1) + [1]
+    root = 1
+    for _ in range(degree):
+        for j in range(degree):
+            result[j] = _gf_multiply(result[j], root)
+            if j + 1 < degree:
+                result[j] ^= result[j + 1]
+        root = _gf_multiply(root, 0x02)
+    return result
+
+
+def rs_remainder(data, divisor):
+    result = [0] * len(divisor)
+    for byte in data:
+        factor = byte ^ result.pop(0)
+        result.append(0)
+        for i, coefficient in enumerate(divisor):
+            result[i] ^= _gf_multiply(coefficient, factor)
+    return result
+
+
+def raw_data_modules(version):
+    """Modules left for data and ECC once the function patterns are drawn."""
+    result = (16 * version + 128) * version + 64
+    if version >= 2:
+        alignments = version // 7 + 2
+        result -= (25 * alignments - 10) * alignments - 55
+        if version >= 7:
+            result -= 36
+    return result
+
+
+def data_codewords(version, level):
+    row = ECC_LEVELS[level][0]
+    return raw_data_modules(version) // 8 - ECC_CODEWORDS_PER_BLOCK[row][version] * NUM_ERROR_CORRECTION_BLOCKS[row][version]
+
+
+def alignment_positions(version):
+    if version == 1:
+        return []
+    count = version // 7 + 2
+    step = (version * 8 + count * 3 + 5) // (count * 4 - 4) * 2
+    size = version * 4 + 17
+    return [6] + sorted(size - 7 - i * step for i in range(count - 1))
+
+
+class _Bits(list):
+    def append_bits(self, value, length):
+        self.extend((value >> i) & 1 for i in reversed(range(length)))
+
+
+def _segment(text):
+    """(mode, character count, bits of the data) of ``text``."""
+    if all(char in ALPHANUMERIC for char in text):
+        bits = _Bits()
+        for i in range(0, len(text) - 1, 2):
+            bits.append_bits(ALPHANUMERIC.index(text[i]) * 45 + ALPHANUMERIC.index(text[i + 1]), 11)
+        if len(text) % 2:
+            bits.append_bits(ALPHANUMERIC.index(text[-1]), 6)
+        return 'alphanumeric', len(text), bits
+    data = text.encode('utf-8')
+    bits = _Bits()
+    for byte in data:
+        bits.append_bits(byte, 8)
+    return 'byte', len(data), bits
+
+
+def _count_bits(mode, version):
+    band = 0 if version <= 9 else 1 if version <= 26 else 2
+    return {'alphanumeric': (9, 11, 13), 'byte': (8, 16, 16)}[mode][band]
+
+
+class QRCode:
+    """The module matrix of ``text``: ``modules[y][x]`` is True for dark."""
+
+    def __init__(self, text, level='M'):
+        if level not in ECC_LEVELS:
+            raise ValueError(f"Unknown error correction level {level!r}")
+        self.level = level
+        mode, count, data_bits = _segment(text)
+        for version in range(1, 41):
+            capacity = data_codewords(version, level) * 8
+            if 4 + _count_bits(mode, version) + len(data_bits) <= capacity:
+                break
+        else:
+            raise QRError(f"{len(text)} characters do not fit in a QR code")
+        self.version = version
+        self.size = version * 4 + 17
+
+        bits = _Bits()
+        bits.append_bits({'alphanumeric': 2, 'byte': 4}[mode], 4)
+        bits.append_bits(count, _count_bits(mode, version))
+        bits.extend(data_bits)
+        bits.append_bits(0, min(4, capacity - len(bits)))
+        bits.append_bits(0, -len(bits) % 8)
+        codewords = [int(''.join(map(str, bits[i:i + 8])), 2) for i in range(0, len(bits), 8)]
+        pad = 0xEC
+        while len(codewords) < capacity // 8:
+            codewords.append(pad)
+            pad ^= 0xEC ^ 0x11
+
+        self.modules = [[False] * self.size for _ in range(self.size)]
+        self.function = [[False] * self.size for _ in range(self.size)]
+        self._draw_function_patterns()
+        self._draw_codewords(self._add_ecc_and_interleave(codewords))
+
+        self.mask = min(range(8), key=self._masked_penalty)
+        self._apply_mask(self.mask)
+        self._draw_format_bits(self.mask)
+
+    def _set_function(self, x, y, dark):
+        self.modules[y][x] = dark
+        self.function[y][x] = True
+
+    def _draw_function_patterns(self):
+        size = self.size
+        for i in range(size):
+            self._set_function(6, i, i % 2 == 0)
+            self._set_function(i, 6, i % 2 == 0)
+        for cx, cy in ((3, 3), (size - 4, 3), (3, size - 4)):
+            for dy in range(-4, 5):
+                for dx in range(-4, 5):
+                    x, y = cx + dx, cy + dy
+                    if 0 <= x < size and 0 <= y < size:
+                        self._set_function(x, y, max(abs(dx), abs(dy)) not in (2, 4))
+        positions = alignment_positions(self.version)
+        last = len(positions) - 1
+        for i, cx in enumerate(positions):
+            for j, cy in enumerate(positions):
+                if (i, j) in ((0, 0), (0, last), (last, 0)):
+                    continue  # Finder corners
+                for dy in range(-2, 3):
+                    for dx in range(-2, 3):
+                        self._set_function(cx + dx, cy + dy, max(abs(dx), abs(dy)) != 1)
+        self._draw_format_bits(0)  # Reserves the area; redrawn with the mask
+        self._draw_version()
+
+    def format_bits(self, mask):
+        data = ECC_LEVELS[self.level][1] << 3 | mask
+        remainder = data
+        for _ in range(10):
+            remainder = (remainder << 1) ^ ((remainder >> 9) * 0x537)
+        return (data << 10 | remainder) ^ 0x5412
+
+    def _draw_format_bits(self, mask):
+        bits = self.format_bits(mask)
+        bit = lambda i: (bits >> i) & 1 == 1
+        size = self.size
+        for i in range(6):
+            self._set_function(8, i, bit(i))
+        self._set_function(8, 7, bit(6))
+        self._set_function(8, 8, bit(7))
+        self._set_function(7, 8, bit(8))
+        for i in range(9, 15):
+            self._set_function(14 - i, 8, bit(i))
+        for i in range(8):
+            self._set_function(size - 1 - i, 8, bit(i))
+        for i in range(8, 15):
+            self._set_function(8, size - 15 + i, bit(i))
+        self._set_function(8, size - 8, True)  # Dark module
+
+    def version_bits(self):
+        remainder = self.version
+        for _ in range(12):
+            remainder = (remainder << 1) ^ ((remainder >> 11) * 0x1F25)
+        return self.version << 12 | remainder
+
+    def _draw_version(self):
+        if self.version < 7:
+            return
+        bits = self.version_bits()
+        for i in range(18):
+            dark = (bits >> i) & 1 == 1
+            a, b = self.size - 11 + i % 3, i // 3
+            self._set_function(a, b, dark)
+            self._set_function(b, a, dark)
+
+    def _add_ecc_and_interleave(self, data):
+        row = ECC_LEVELS[self.level][0]
+        blocks_count = NUM_ERROR_CORRECTION_BLOCKS[row][self.version]
+        ecc_length = ECC_CODEWORDS_PER_BLOCK[row][self.version]
+        raw_codewords = raw_data_modules(self.version) // 8
+        short_blocks = blocks_count - raw_codewords % blocks_count
+        short_length = raw_codewords // blocks_count
+        divisor = rs_divisor(ecc_length)
+
+        blocks, k = [], 0
+        for i in range(blocks_count):
+            block = data[k:k + short_length - ecc_length + (0 if i < short_blocks else 1)]
+            k += len(block)
+            ecc = rs_remainder(block, divisor)
+            if i < short_blocks:
+                block = block + [0]  # Aligns the short blocks; skipped below
+            blocks.append(block + ecc)
+
+        result = []
+        for i in range(len(blocks[0])):
+            for j, block in enumerate(blocks):
+                if i != short_length - ecc_length or j >= short_blocks:
+                    result.append(block[i])
+        return result
+
+    def _draw_codewords(self, codewords):
+        size = self.size
+        i, total = 0, len(codewords) * 8
+        right = size - 1
+        while right >= 1:
+            if right == 6:
+                right = 5  # Vertical timing pattern
+            upward = (right + 1) & 2 == 0
+            for vertical in range(size):
+                y = size - 1 - vertical if upward else vertical
+                for x in (right, right - 1):
+                    if not self.function[y][x] and i < total:
+                        self.modules[y][x] = (codewords[i >> 3] >> (7 - (i & 7))) & 1 == 1
+                        i += 1
+            right -= 2
+
+    def _apply_mask(self, mask):
+        test = MASKS[mask]
+        for y in range(self.size):
+            row, function = self.modules[y], self.function[y]
+            for x in range(self.size):
+                if not function[x] and test(x, y):
+                    row[x] = not row[x]
+
+    def _masked_penalty(self, mask):
+        self._apply_mask(mask)
+        self._draw_format_bits(mask)
+        penalty = self.penalty()
+        self._apply_mask(mask)  # XOR: undoes it
+        return penalty
+
+    def penalty(self):
+        """ISO/IEC 18004 mask penalty: runs, 2x2 blocks, finder-like patterns, balance."""
+        size, modules = self.size, self.modules
+        lines = [''.join('1' if dark else '0' for dark in row) for row in modules]
+        lines += [''.join('1' if modules[y][x] else '0' for y in range(size)) for x in range(size)]
+        score = 0
+        for line in lines:
+            for run in re.finditer(r'0{5,}|1{5,}', line):
+                score += 3 + len(run.group()) - 5
+            score += 40 * len(re.findall(r'(?=(?:10111010000|00001011101))', line))
+        for y in range(size - 1):
+            for x in range(size - 1):
+                if modules[y][x] == modules[y][x + 1] == modules[y + 1][x] == modules[y + 1][x + 1]:
+                    score += 3
+        dark = sum(map(sum, modules))
+        total = size * size
+        # 10 per 5% away from half dark
+        return score + ((abs(dark * 20 - total * 10) + total - 1) // total - 1) * 10
+
+
+def render_svg(code, border=BORDER):
+    """SVG of ``code`` (a QRCode), one unit per module; dark runs merged per row."""
+    side = code.size + 2 * border
+    path = []
+    for y, row in enumerate(code.modules):
+        for run in re.finditer(r'1+', ''.join('1' if dark else '0' for dark in row)):
+            path.append(f"M{run.start() + border},{y + border}h{len(run.group())}v1h-{len(run.group())}z")
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {side} {side}" shape-rendering="crispEdges">'
+        f'<rect width="{side}" height="{side}" fill="#fff"/><path d="{"".join(path)}" fill="#000"/></svg>'
+    ).encode()
+
+
+def render_png(code, scale=8, border=BORDER):
+    """PNG of ``code``, ``scale`` pixels per module, 1-bit."""
+    side = code.size + 2 * border
+    image = Image.new('1', (side, side), 1)
+    pixels = image.load()
+    for y, row in enumerate(code.modules):
+        for x, dark in enumerate(row):
+            if dark:
+                pixels[x + border, y + border] = 0
+    image = image.resize((side * scale, side * scale), Image.NEAREST)
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue()
+
+
+RENDERERS = {'svg': ('image/svg+xml', render_svg), 'png': ('image/png', render_png)}
+
+
+class QRCache:
+    """
+    Renderings by (text, format): in memory (the latest MEMORY_SIZE), then
+    on disk under QR_CACHE_DIR, then encoded. get() returns (key, content
+    type, bytes); the key changes only with the text, the format or
+    ENCODER_VERSION, so it doubles as the ETag.
+    """
+
+    MEMORY_SIZE = 64
+    _lock = threading.Lock()
+    _memory = OrderedDict()
+
+    @staticmethod
+    def key(text, fmt):
+        digest = hashlib.sha1(f"{ENCODER_VERSION}:{fmt}:{text}".encode()).hexdigest()[:16]
+        return f"{re.sub(r'[^A-Za-z0-9-]', '', text)[:20]}-{digest}"
+
+    @classmethod
+    def get(cls, text, fmt):
+        if fmt not in RENDERERS:
+            raise ValueError(f"Unknown QR format {fmt!r}")
+        key = cls.key(text, fmt)
+        content_type, render = RENDERERS[fmt]
+        with cls._lock:
+            content = cls._memory.get(key)
+            if content is not None:
+                cls._memory.move_to_end(key)
+                return key, content_type, content
+
+        path = os.path.join(settings.QR_CACHE_DIR, f"{key}.{fmt}")
+        try:
+            with open(path, 'rb') as handle:
+                content = handle.read()
+        except FileNotFoundError:
+            content = render(QRCode(text))
+            os.makedirs(settings.QR_CACHE_DIR, exist_ok=True)
+            # Written aside and renamed: a concurrent reader never sees half a file
+            temporary = f"{path}.{threading.get_ident()}.tmp"
+            with open(temporary, 'wb') as handle:
+                handle.write(content)
+            os.replace(temporary, path)
+
+        with cls._lock:
+            cls._memory[key] = content
+            while len(cls._memory) > cls.MEMORY_SIZE:
+                cls._memory.popitem(last=False)
+        return key, content_type, content
+
+    @classmethod
+    def clear_memory(cls):
+        with cls._lock:
+            cls._memory.clear()
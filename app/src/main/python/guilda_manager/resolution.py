@@ -0,0 +1,332 @@
+"""
+Batch resolution of Dispatch rows (the "Test of Destiny").
+
+DispatchResolver resolves any number of dispatches with a fixed number of
+queries: modifiers are loaded once per guild, members and ranks once per
+batch, and every write (deaths, history quests, squad progression, rewards,
+dispatch results) is a bulk statement inside one transaction. That
+transaction starts by claiming the dispatches still PENDING, so concurrent
+resolutions (the API, the command, the Mestre screen) never resolve the same
+dispatch twice.
+
+Every dispatch rolls on its own DiceStream, reserved from its guild's seeded
+sequence (one UPDATE per guild and batch), and records the stream's
+(seed, cursor) so its rolls can be replayed.
+
+Dispatch.resolve() goes through the same engine with a batch of one, so both
+paths always share the same rules.
+"""
+import time
+from collections import defaultdict
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Least
+from django.utils import timezone
+from config.write_queue import serialized_write
+from .models import Dispatch, Guild, Member, Quest, Squad, SquadRank
+from .services import DiceService, GuildStatsService
+
+# SQLite limits the number of variables per statement
+CHUNK_SIZE = 500
+
+
+def _chunks(values, size=CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class DispatchResolver:
+    """Resolves dispatches in bulk."""
+
+    @staticmethod
+    def due_dispatches(now=None):
+        """PENDING dispatches whose target date has passed, oldest first."""
+        return Dispatch.objects.filter(
+            status=Dispatch.Status.PENDING,
+            target_date__lte=now or timezone.now(),
+        ).order_by('target_date', 'id')
+
+    @serialized_write(retry=True)
+    def resolve_due(self, now=None):
+        """Resolves every due dispatch and returns a summary dict."""
+        started_at = time.perf_counter()
+        dispatches = list(self.due_dispatches(now).select_related('squad__guild', 'squad__rank', 'mission__guild'))
+        outcomes = self.resolve(dispatches)
+
+        resolved = [
+            (dispatch, outcome) for dispatch, outcome in zip(dispatches, outcomes) if outcome is not None
+        ]
+        return {
+            'resolved': len(resolved),
+            'completed': sum(1 for dispatch, _ in resolved if dispatch.status == Dispatch.Status.COMPLETED),
+            'disasters': sum(1 for dispatch, _ in resolved if dispatch.status == Dispatch.Status.DISASTER),
+            'deaths': sum(outcome['deaths'] for _, outcome in resolved),
+            'elapsed_ms': round((time.perf_counter() - started_at) * 1000, 1),
+            'dispatches': [
+                {'id': dispatch.id, 'status': dispatch.status, **outcome} for dispatch, outcome in resolved
+            ],
+        }
+
+    def resolve(self, dispatches):
+        """
+        Resolves the given dispatches, in order. Returns a list aligned with
+        ``dispatches`` holding the outcome dict of each one (see
+        Dispatch.resolve), or None for those that cannot be resolved.
+        """
+        outcomes = [None] * len(dispatches)
+        work = []
+        guilds = {}
+        for index, dispatch in enumerate(dispatches):
+            if dispatch.status != Dispatch.Status.PENDING:
+                continue
+            guild = self._guild_of(dispatch)
+            if guild is None:
+                continue
+            # One instance per guild, so its stats are loaded only once
+            work.append((index, dispatch, guilds.setdefault(guild.pk, guild)))
+        if not work:
+            return outcomes
+
+        with transaction.atomic():
+            # Claimed first: the UPDATE takes the write lock, so a concurrent
+            # resolver waits here and then no longer finds these PENDING.
+            claimed = self._claim([dispatch for _, dispatch, _ in work])
+            work = [item for item in work if item[1].pk in claimed]
+            if not work:
+                return outcomes
+            guilds = {guild.pk: guild for _, _, guild in work}
+            rewards = self._resolve_claimed(work, guilds, outcomes)
+
+        for guild_id in rewards:
+            guilds[guild_id].refresh_from_db(fields=['funds', 'gxp'])
+        return outcomes
+
+    def _resolve_claimed(self, work, guilds, outcomes):
+        """Rolls and writes the claimed dispatches; fills ``outcomes`` and returns the rewards paid."""
+        GuildStatsService.prime(guilds.values())
+
+        dice = self._reserve_dice(work, guilds)
+        active_by_squad, active_by_guild, squad_members = self._load_members(work)
+
+        deceased_ids = []
+        history_quests = []
+        missions_to_complete = {}
+        disaster_mission_ids = set()
+        squad_successes = defaultdict(int)
+        squads = {}
+        rewards = defaultdict(lambda: [0, 0])  # guild_id -> [gxp, gold]
+
+        for index, dispatch, guild in work:
+            stream = dice[guild.pk].pop()
+            dispatch.dice_seed, dispatch.dice_cursor = stream.seed, stream.cursor
+
+            has_war_room = self._has_war_room(guild)
+            roll = stream.roll(20)
+            if has_war_room:
+                roll = max(roll, stream.roll(20))
+            outcome = {'roll': roll, 'has_war_room': has_war_room, 'deaths': 0, 'dead_names': []}
+
+            if roll == 1:
+                # Critical Failure -> Disaster
+                dispatch.status = Dispatch.Status.DISASTER
+
+                # Blood Cost
+                if dispatch.squad_id:
+                    deaths = stream.roll(6)
+                    pool = active_by_squad[dispatch.squad_id]
+                else:
+                    deaths = dispatch.npc_count
+                    pool = active_by_guild[guild.pk]
+                victims = stream.sample(pool, deaths)
+
+                for member_id, name, squad_id, guild_id in victims:
+                    active_by_guild[guild_id].remove((member_id, name, squad_id, guild_id))
+                    if squad_id is not None:
+                        active_by_squad[squad_id].remove((member_id, name, squad_id, guild_id))
+                    deceased_ids.append(member_id)
+                    outcome['dead_names'].append(name)
+
+                outcome['deaths'] = len(victims)
+                dispatch.result_log = f"Rolagem: {roll} (Crítico). Mortes: {len(victims)} ({', '.join(outcome['dead_names'])})"
+
+                if dispatch.mission_id:
+                    dispatch.mission.status = Quest.Status.DISASTER
+                    disaster_mission_ids.add(dispatch.mission_id)
+            else:
+                # Success
+                dispatch.status = Dispatch.Status.COMPLETED
+                rank = dispatch.rank or 'F'
+
+                if dispatch.squad_id:
+                    # Internal Quest for History (Legacy)
+                    quest = Quest(
+                        title=f"Despacho: {dispatch.squad.name} (Rank {rank})",
+                        description=f"Missão automática realizada pelo esquadrão {dispatch.squad.name}.",
+                        type=Quest.Type.INTERNAL,
+                        status=Quest.Status.COMPLETED,
+                        rank=rank,
+                        duration_days=dispatch.duration_days,
+                        guild=guild,
+                        gxp_reward=Quest.RANK_GXP_REWARDS.get(rank, 0),
+                    )
+                    history_quests.append((quest, squad_members[dispatch.squad_id]))
+
+                    squads[dispatch.squad_id] = dispatch.squad
+                    squad_successes[dispatch.squad_id] += 1
+                elif dispatch.mission.status != Quest.Status.COMPLETED:
+                    missions_to_complete[dispatch.mission_id] = dispatch.mission
+
+                dispatch.result_log = f"Rolagem: {roll}. Sucesso! Recompensa entregue."
+
+            outcomes[index] = outcome
+
+        for ids in _chunks(deceased_ids):
+            Member.objects.filter(pk__in=ids).update(status=Member.Status.DECEASED)
+
+        self._create_history(history_quests)
+        self._complete_missions(missions_to_complete, rewards)
+        for ids in _chunks(disaster_mission_ids - set(missions_to_complete)):
+            Quest.objects.filter(pk__in=ids).update(status=Quest.Status.DISASTER, updated_at=timezone.now())
+        self._progress_squads(squads, squad_successes)
+        self._pay_rewards(guilds, rewards)
+        self._save_dispatches([dispatch for _, dispatch, _ in work])
+        return rewards
+
+    @staticmethod
+    def _claim(dispatches):
+        """Ids of the dispatches still PENDING in the database, write-locked for this transaction."""
+        claimed = set()
+        for ids in _chunks(dispatch.pk for dispatch in dispatches):
+            pending = Dispatch.objects.filter(pk__in=ids, status=Dispatch.Status.PENDING)
+            pending.update(status=Dispatch.Status.PENDING)
+            claimed.update(pending.values_list('pk', flat=True))
+        return claimed
+
+    @staticmethod
+    def _guild_of(dispatch):
+        if dispatch.squad_id:
+            return dispatch.squad.guild
+        if dispatch.mission_id:
+            return dispatch.mission.guild
+        return None
+
+    @staticmethod
+    def _has_war_room(guild):
+        modifiers = guild.stats['modifiers']
+        return modifiers['cartography'] or modifiers['war_room']
+
+    @staticmethod
+    def _reserve_dice(work, guilds):
+        """One stream per dispatch, reserved in order from each guild's sequence."""
+        counts = defaultdict(int)
+        for _, _, guild in work:
+            counts[guild.pk] += 1
+        # Reversed, so that pop() hands them out in order
+        return {
+            guild_id: DiceService.streams(guilds[guild_id], count)[::-1] for guild_id, count in counts.items()
+        }
+
+    @staticmethod
+    def _load_members(work):
+        """
+        Loads the members of every guild in the batch with one query.
+        Returns the active pools per squad and per guild, and every member id
+        per squad (the history quests list the whole squad).
+        """
+        active_by_squad = defaultdict(list)
+        active_by_guild = defaultdict(list)
+        squad_members = defaultdict(list)
+
+        guild_ids = {guild.pk for _, _, guild in work}
+        rows = Member.objects.filter(guild_id__in=guild_ids).order_by('id').values_list(
+            'id', 'name', 'squad_id', 'guild_id', 'status'
+        )
+        for member_id, name, squad_id, guild_id, status in rows:
+            if squad_id is not None:
+                squad_members[squad_id].append(member_id)
+            if status == Member.Status.ACTIVE:
+                member = (member_id, name, squad_id, guild_id)
+                active_by_guild[guild_id].append(member)
+                if squad_id is not None:
+                    active_by_squad[squad_id].append(member)
+        return active_by_squad, active_by_guild, squad_members
+
+    @staticmethod
+    def _create_history(history_quests):
+        if not history_quests:
+            return
+        created = Quest.objects.bulk_create([quest for quest, _ in history_quests])
+        Through = Quest.assigned_members.through
+        Through.objects.bulk_create([
+            Through(quest_id=quest.pk, member_id=member_id)
+            for quest, (_, member_ids) in zip(created, history_quests)
+            for member_id in member_ids
+        ])
+
+    @staticmethod
+    def _complete_missions(missions, rewards):
+        """Claims the missions still open (see Quest.complete_quest) and adds their rewards."""
+        claimed = set()
+        for ids in _chunks(missions):
+            pending = Quest.objects.filter(pk__in=ids).exclude(status=Quest.Status.COMPLETED)
+            claimed.update(pending.values_list('pk', flat=True))
+            pending.update(status=Quest.Status.COMPLETED, updated_at=timezone.now())
+
+        for mission_id, mission in missions.items():
+            mission.status = Quest.Status.COMPLETED
+            if mission_id in claimed:
+                rewards[mission.guild_id][0] += mission.gxp_reward
+                rewards[mission.guild_id][1] += mission.gold_reward
+
+    @staticmethod
+    def _progress_squads(squads, successes):
+        """Adds the completed missions and applies promotions (see Squad.check_rank_progression)."""
+        if not squads:
+            return
+        ranks = list(SquadRank.objects.order_by('-order'))
+
+        updates = defaultdict(list)  # (missions added, new rank id) -> squad ids
+        for squad_id, squad in squads.items():
+            squad.missions_completed += successes[squad_id]
+            if squad.rank is not None:
+                for rank in ranks:
+                    if rank.order <= squad.rank.order:
+                        break
+                    if rank.missions_required <= squad.missions_completed and rank.min_guild_level <= squad.guild.level:
+                        squad.rank = rank
+                        break
+            updates[(successes[squad_id], squad.rank_id)].append(squad_id)
+
+        for (added, rank_id), squad_ids in updates.items():
+            for ids in _chunks(squad_ids):
+                Squad.objects.filter(pk__in=ids).update(
+                    missions_completed=F('missions_completed') + added, rank_id=rank_id
+                )
+
+    @staticmethod
+    def _pay_rewards(guilds, rewards):
+        # Gold respects the Vault limit; the excess is lost.
+        for guild_id, (gxp, gold) in rewards.items():
+            Guild.objects.filter(pk=guild_id).update(
+                gxp=F('gxp') + gxp,
+                funds=Least(F('funds') + gold, guilds[guild_id].max_gold_cap),
+            )
+
+    @staticmethod
+    def _save_dispatches(dispatches):
+        # Every row has its own log and dice cursor. One prepared UPDATE run
+        # with executemany is much cheaper on SQLite than bulk_update's
+        # CASE WHEN per batch.
+        fields = [Dispatch._meta.get_field(name) for name in ('status', 'result_log', 'dice_seed', 'dice_cursor')]
+        quote = connection.ops.quote_name
+        sql = "UPDATE {} SET {} WHERE {} = %s".format(
+            quote(Dispatch._meta.db_table),
+            ", ".join(f"{quote(field.column)} = %s" for field in fields),
+            quote(Dispatch._meta.pk.column),
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, [
+                [field.get_db_prep_save(field.value_from_object(dispatch), connection) for field in fields] + [dispatch.pk]
+                for dispatch in dispatches
+            ])
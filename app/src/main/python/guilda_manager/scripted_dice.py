@@ -0,0 +1,51 @@
+"""
+Scripted dice for tests: scripted_dice() forces the rolls of every
+DiceService stream by patching DiceService.streams.
+"""
+import itertools
+from contextlib import contextmanager
+from unittest import mock
+from .services import DiceService
+
+
+class ScriptedDiceStream:
+    """
+    Stream returning predefined rolls. Choices and samples take the first
+    options, in order.
+    """
+
+    seed = None
+    cursor = None
+
+    def __init__(self, values):
+        self._values = values
+
+    def roll(self, sides):
+        return next(self._values)
+
+    def rolls(self, count, sides):
+        return [self.roll(sides) for _ in range(count)]
+
+    def choice(self, options):
+        return options[0]
+
+    def weighted_choice(self, options, weights):
+        return options[0]
+
+    def sample(self, population, k):
+        return list(population)[:max(k, 0)]
+
+
+@contextmanager
+def scripted_dice(rolls):
+    """
+    Makes every stream return ``rolls`` in order (a single int is returned
+    forever), e.g. to force an outcome. No guild cursor is reserved.
+    """
+    values = itertools.repeat(rolls) if isinstance(rolls, int) else iter(rolls)
+
+    def streams(guild, count=1):
+        return [ScriptedDiceStream(values) for _ in range(count)]
+
+    with mock.patch.object(DiceService, 'streams', staticmethod(streams)):
+        yield
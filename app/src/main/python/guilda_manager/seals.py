@@ -0,0 +1,81 @@
+"""
+Rank seal sprite atlas of the missions board.
+
+`manage.py build_static` packs the seven SELOS/<rank>.png (about 1000 px,
+0.6-1 MB each) into one strip per pixel density, SELOS/atlas-<d>x.webp, the
+seals in Quest.Rank order and SEAL_SIZE CSS pixels wide, and writes
+css/seals.css: .seal-sprite gets the strip (image-set() lets the WebView
+fetch the one of its density) and .seal-sprite--<rank> the seal's offset.
+The board then loads one small image for every quest card instead of one
+full-size PNG decode per rank.
+"""
+import os
+from PIL import Image
+from .models import Quest
+from .static_images import STATIC_DIR
+
+SEALS_DIR = 'guilda_manager/images/SELOS'
+CSS_PATH = 'guilda_manager/css/seals.css'
+
+# Width of .wax-seal on missoes.html
+SEAL_SIZE = 64
+DENSITIES = (1, 2, 3)
+WEBP_QUALITY = 85
+
+
+def atlas_name(density):
+    return f"{SEALS_DIR}/atlas-{density}x.webp"
+
+
+def build_atlas(static_dir=STATIC_DIR, log=None):
+    """
+    Writes the atlas of every density and the CSS map; returns the paths
+    written, relative to ``static_dir``. ``log(name, bytes)`` is called for
+    each file.
+    """
+    ranks = Quest.Rank.values
+    seals = []
+    for rank in ranks:
+        with Image.open(os.path.join(static_dir, SEALS_DIR, f"{rank}.png")) as seal:
+            seals.append(seal.convert('RGBA'))
+
+    written = []
+    for density in DENSITIES:
+        side = SEAL_SIZE * density
+        atlas = Image.new('RGBA', (side * len(seals), side), (0, 0, 0, 0))
+        for i, seal in enumerate(seals):
+            atlas.paste(seal.resize((side, side), Image.LANCZOS), (i * side, 0))
+        name = atlas_name(density)
+        atlas.save(os.path.join(static_dir, name), 'WEBP', quality=WEBP_QUALITY, method=6)
+        written.append(name)
+
+    # Relative URLs, rewritten to the hashed names by collectstatic
+    css_dir = os.path.dirname(CSS_PATH)
+    urls = {density: os.path.relpath(atlas_name(density), css_dir).replace(os.sep, '/') for density in DENSITIES}
+    image_set = ', '.join(f'url("{urls[density]}") {density}x' for density in DENSITIES)
+    lines = [
+        "/* Generated by manage.py build_static (guilda_manager/seals.py): do not edit. */",
+        ".seal-sprite {",
+        "    display: block;",
+        f"    width: {SEAL_SIZE}px;",
+        f"    height: {SEAL_SIZE}px;",
+        f'    background-image: url("{urls[1]}");',
+        f"    background-image: -webkit-image-set({image_set});",
+        f"    background-image: image-set({image_set});",
+        f"    background-size: {SEAL_SIZE * len(ranks)}px {SEAL_SIZE}px;",
+        "    background-repeat: no-repeat;",
+        "}",
+    ]
+    lines += [
+        f".seal-sprite--{rank} {{ background-position: {-i * SEAL_SIZE}px 0; }}"
+        for i, rank in enumerate(ranks)
+    ]
+    os.makedirs(os.path.join(static_dir, css_dir), exist_ok=True)
+    with open(os.path.join(static_dir, CSS_PATH), 'w') as handle:
+        handle.write('\n'.join(lines) + '\n')
+    written.append(CSS_PATH)
+
+    if log:
+        for name in written:
+            log(name, os.path.getsize(os.path.join(static_dir, name)))
+    return written
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.core.exceptions import ValidationError as DjangoValidationError
-from .models import Guild, GuildBuilding, Building, Member, Quest, Upgrade, GuildUpgrade
+from .models import Guild, GuildBuilding, Building, Member, Quest, Upgrade, GuildUpgrade, Dispatch
 
 class BuildingSerializer(serializers.ModelSerializer):
     class Meta:
@@ -20,7 +20,30 @@ class MemberSerializer(serializers.ModelSerializer):
         model = Member
         fields = ['id', 'name', 'status', 'guild']
 
-class QuestSerializer(serializers.ModelSerializer):
+def requested_fields(request):
+    """Field names asked for with ``?fields=``, or None for every field."""
+    if request is None:
+        return None
+    raw = request.query_params.get('fields')
+    if not raw:
+        return None
+    return {name.strip() for name in raw.split(',') if name.strip()}
+
+class SparseFieldsMixin:
+    """
+    Limits the serialized fields to the comma-separated ``?fields=`` query
+    parameter of a read request, when present. Unknown names are ignored.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        requested = requested_fields(request) if request is not None and request.method == 'GET' else None
+        if requested is not None:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+class QuestSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     assigned_members_details = MemberSerializer(source='assigned_members', many=True, read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     rank_display = serializers.CharField(source='get_rank_display', read_only=True)
@@ -35,6 +58,16 @@ class QuestSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
 
+class DispatchSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = Dispatch
+        fields = [
+            'id', 'squad', 'mission', 'rank', 'npc_count', 'duration_days',
+            'start_date', 'target_date', 'status', 'status_display', 'result_log'
+        ]
+
 class GuildDashboardSerializer(serializers.ModelSerializer):
     active_buildings = GuildBuildingSerializer(source='guild_buildings', many=True, read_only=True)
 
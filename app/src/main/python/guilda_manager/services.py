@@ -1,4 +1,11 @@
+import hashlib
+import itertools
+import random
+import secrets
+import threading
 from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
 
 class GuildLevelService:
     """
@@ -28,3 +35,264 @@ class GuildLevelService:
             'base_member_slots': stats['member_slots'],
             'base_building_slots': stats['building_slots']
         }
+
+class GuildStatsService:
+    """
+    Computes every building-derived Guild stat with a single aggregate query
+    and memoizes the result on the Guild instance.
+
+    Each guild has a version counter that is bumped (see signals.py) whenever
+    one of its GuildBuilding/GuildUpgrade rows is created or deleted. The memo
+    is keyed by that version and by the guild level, so any stale entry is
+    recomputed on the next access, even on other instances of the same guild.
+
+    Guild querysets passed through annotate() carry the building aggregates
+    as SQL annotations; get_stats() builds the stats from them without a
+    query (once: a later invalidation falls back to the aggregate query).
+    """
+
+    VAULT_BUILDING = 'Caixa-Forte'
+    QUARTERS_BUILDING = 'Alojamentos Expandidos'
+
+    # Buildings that modify quest/dispatch resolution, matched by name or slug
+    MODIFIER_BUILDINGS = {
+        'war_room': ('Sala de Guerra', 'sala-de-guerra'),
+        'arsenal': ('Arsenal', 'arsenal'),
+        'cartography': ('Sala de Cartografia', 'sala-cartografia'),
+    }
+
+    ANNOTATION_PREFIX = 'stats_'
+
+    VAULT_GOLD_CAP_MULTIPLIER = Decimal('1.5')
+    QUARTERS_MEMBER_SLOTS_MULTIPLIER = 1.2
+
+    _versions = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def invalidate(cls, guild_id):
+        """Marks every memoized stats entry of the given guild as stale."""
+        with cls._lock:
+            cls._versions[guild_id] = cls._versions.get(guild_id, 0) + 1
+
+    @classmethod
+    def get_stats(cls, guild):
+        """Returns the (memoized) stats dict of a guild."""
+        key = (cls._versions.get(guild.pk, 0), guild.level)
+        memo = guild.__dict__.get('_stats_memo')
+        if memo is not None and memo[0] == key:
+            return memo[1]
+
+        facts = cls._annotated_facts(guild)
+        if facts is None:
+            facts = cls.aggregate_buildings(guild)
+        stats = cls.build_stats(guild.level, facts)
+        guild._stats_memo = (key, stats)
+        return stats
+
+    @classmethod
+    def annotate(cls, queryset):
+        """Annotates a Guild queryset with every building fact the stats depend on."""
+        return queryset.annotate(**{
+            f"{cls.ANNOTATION_PREFIX}{name}": aggregate
+            for name, aggregate in cls._aggregates('guild_buildings__').items()
+        })
+
+    @classmethod
+    def _annotated_facts(cls, guild):
+        """Pops the annotations added by annotate(), if any, as facts."""
+        names = [f"{cls.ANNOTATION_PREFIX}{name}" for name in cls._aggregates()]
+        if names[0] not in guild.__dict__:
+            return None
+        return cls._facts({
+            name[len(cls.ANNOTATION_PREFIX):]: guild.__dict__.pop(name) for name in names
+        })
+
+    @classmethod
+    def prime(cls, guilds):
+        """
+        Memoizes the stats of many guilds with one grouped aggregate query,
+        so code that walks several guilds does not pay one query per guild.
+        """
+        from .models import GuildBuilding
+
+        guilds = [guild for guild in guilds if guild is not None]
+        if not guilds:
+            return
+        rows = GuildBuilding.objects.filter(guild__in=guilds).values('guild_id').annotate(
+            **cls._aggregates()
+        ).order_by()
+        totals_by_guild = {row['guild_id']: row for row in rows}
+        for guild in guilds:
+            totals = totals_by_guild.get(guild.pk, {})
+            key = (cls._versions.get(guild.pk, 0), guild.level)
+            guild._stats_memo = (key, cls.build_stats(guild.level, cls._facts(totals)))
+
+    @classmethod
+    def aggregate_buildings(cls, guild):
+        """Loads every building fact the stats depend on in one query."""
+        return cls._facts(guild.guild_buildings.aggregate(**cls._aggregates()))
+
+    @classmethod
+    def _aggregates(cls, prefix=''):
+        """Aggregates over GuildBuilding rows; ``prefix`` is the path to them."""
+        def on_name(name):
+            return Q(**{f"{prefix}building__name": name})
+
+        modifier_counts = {
+            f"{modifier}_count": Count(
+                f"{prefix}id", filter=on_name(name) | Q(**{f"{prefix}building__slug": slug})
+            )
+            for modifier, (name, slug) in cls.MODIFIER_BUILDINGS.items()
+        }
+        return {
+            'used_building_slots': Sum(f"{prefix}building__slots_required"),
+            'building_count': Count(f"{prefix}id"),
+            'vault_count': Count(f"{prefix}id", filter=on_name(cls.VAULT_BUILDING)),
+            'quarters_count': Count(f"{prefix}id", filter=on_name(cls.QUARTERS_BUILDING)),
+            **modifier_counts,
+        }
+
+    @classmethod
+    def _facts(cls, totals):
+        """Turns aggregate totals (possibly empty: no buildings) into facts."""
+        return {
+            'used_building_slots': totals.get('used_building_slots') or 0,
+            'building_count': totals.get('building_count', 0),
+            'has_vault': totals.get('vault_count', 0) > 0,
+            'has_quarters': totals.get('quarters_count', 0) > 0,
+            'modifiers': {
+                modifier: totals.get(f"{modifier}_count", 0) > 0 for modifier in cls.MODIFIER_BUILDINGS
+            },
+        }
+
+    @classmethod
+    def build_stats(cls, level, facts):
+        """Derives the guild stats from its level and its building facts."""
+        base = GuildLevelService.get_base_stats(level)
+
+        max_gold_cap = base['base_gold_cap']
+        if facts['has_vault']:
+            max_gold_cap = max_gold_cap * cls.VAULT_GOLD_CAP_MULTIPLIER
+
+        max_member_slots = base['base_member_slots']
+        if facts['has_quarters']:
+            # Increase by 20%
+            max_member_slots = int(max_member_slots * cls.QUARTERS_MEMBER_SLOTS_MULTIPLIER)
+
+        return {
+            'base_stats': base,
+            'max_gold_cap': max_gold_cap,
+            'max_member_slots': max_member_slots,
+            'used_building_slots': facts['used_building_slots'],
+            'available_building_slots': base['base_building_slots'] - facts['used_building_slots'],
+            'building_count': facts['building_count'],
+            'modifiers': facts['modifiers'],
+        }
+
+
+def new_dice_seed():
+    """Random seed for a new guild dice stream (fits a signed 64-bit column)."""
+    return secrets.randbits(63)
+
+
+class DiceStream:
+    """
+    Deterministic dice for one resolution, identified by (seed, cursor): the
+    same pair always yields the same rolls, on any device and Python version
+    (random.Random seeded with a str is hashed with SHA-512).
+
+    Uniform draws are pre-drawn into a buffer, so rolling many dice costs
+    one Python call per buffer refill rather than one per die.
+    """
+
+    BUFFER_SIZE = 16
+
+    def __init__(self, seed, cursor):
+        self.seed = seed
+        self.cursor = cursor
+        self._random = random.Random(f"{seed}:{cursor}")
+        self._buffer = []
+        self._index = 0
+
+    def _uniform(self):
+        if self._index == len(self._buffer):
+            draw = self._random.random
+            self._buffer = [draw() for _ in range(self.BUFFER_SIZE)]
+            self._index = 0
+        value = self._buffer[self._index]
+        self._index += 1
+        return value
+
+    def roll(self, sides):
+        """Rolls one die with ``sides`` faces (1..sides)."""
+        return int(self._uniform() * sides) + 1
+
+    def rolls(self, count, sides):
+        return [self.roll(sides) for _ in range(count)]
+
+    def choice(self, options):
+        return options[int(self._uniform() * len(options))]
+
+    def weighted_choice(self, options, weights):
+        target = self._uniform() * sum(weights)
+        for option, cumulative in zip(options, itertools.accumulate(weights)):
+            if target < cumulative:
+                return option
+        return options[-1]
+
+    def sample(self, population, k):
+        """Picks ``k`` distinct items (partial Fisher-Yates shuffle)."""
+        pool = list(population)
+        k = min(max(k, 0), len(pool))
+        for i in range(k):
+            j = i + int(self._uniform() * (len(pool) - i))
+            pool[i], pool[j] = pool[j], pool[i]
+        return pool[:k]
+
+
+class DiceService:
+    """
+    Hands out dice streams from the per-guild seeded sequence.
+
+    Every guild has a seed and a cursor (Guild.dice_seed / dice_cursor).
+    Each resolution reserves the next cursor(s) and gets its own DiceStream;
+    recording (seed, cursor) next to the outcome is enough to replay every
+    roll with replay().
+    """
+
+    @classmethod
+    def streams(cls, guild, count=1):
+        """Reserves ``count`` consecutive cursors of the guild with one UPDATE."""
+        if guild is None:
+            # Not tied to a guild: fresh seed, nothing to record it on
+            seed = new_dice_seed()
+            return [DiceStream(seed, cursor) for cursor in range(count)]
+
+        from .models import Guild
+
+        with transaction.atomic():
+            Guild.objects.filter(pk=guild.pk).update(dice_cursor=F('dice_cursor') + count)
+            seed, end = Guild.objects.filter(pk=guild.pk).values_list('dice_seed', 'dice_cursor').get()
+        guild.dice_seed, guild.dice_cursor = seed, end
+        return [DiceStream(seed, cursor) for cursor in range(end - count, end)]
+
+    @classmethod
+    def stream(cls, guild):
+        return cls.streams(guild)[0]
+
+    @classmethod
+    def replay(cls, seed, cursor):
+        """Returns the stream a resolution recorded with (seed, cursor) used."""
+        return DiceStream(seed, cursor)
+
+
+def seal_layout(quest_id, title):
+    """
+    Wax seal placement of a quest card on the missions board: (rotation in
+    degrees, top offset, right offset in pixels), derived from the quest id
+    and title so it never changes between renders.
+    """
+    seed_hash = hashlib.md5(f"{quest_id}-{title}".encode('utf-8')).hexdigest()
+    rng = random.Random(int(seed_hash, 16))
+    return rng.randint(-20, 20), rng.randint(-10, 10), rng.randint(-10, 10)
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .hexmap import HexGrid
+from .models import GuildBuilding, GuildUpgrade, Hexagon, Map
+from .services import GuildStatsService
+
+@receiver(post_save, sender=GuildBuilding)
+@receiver(post_delete, sender=GuildBuilding)
+@receiver(post_save, sender=GuildUpgrade)
+@receiver(post_delete, sender=GuildUpgrade)
+def invalidate_guild_stats(sender, instance, **kwargs):
+    """Drops the memoized stats of the guild that owns the changed row."""
+    GuildStatsService.invalidate(instance.guild_id)
+
+@receiver(post_save, sender=Hexagon)
+@receiver(post_delete, sender=Hexagon)
+def invalidate_hex_grid(sender, instance, **kwargs):
+    """Drops the cached pathfinding grid of the hexagon's map."""
+    HexGrid.invalidate(instance.map_id)
+
+@receiver(post_save, sender=Map)
+@receiver(post_delete, sender=Map)
+def invalidate_map_grid(sender, instance, **kwargs):
+    HexGrid.invalidate(instance.pk)
@@ -0,0 +1,86 @@
+"""
+Web formats of the large static images.
+
+`manage.py build_static` writes, next to every PNG/JPG of the app static
+directory of at least MIN_BYTES, a WebP copy (and an AVIF one when Pillow
+has an AVIF encoder, e.g. with pillow-avif-plugin installed) unless the copy
+would not be smaller. The templates offer them through the static_images
+tags: {% image_sources %} inside a <picture>, before its <img> fallback,
+and {% image_url %} where only a URL fits (every Android WebView decodes
+WebP). An image with no copy is served as it is.
+"""
+import functools
+import os
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from PIL import Image
+
+try:
+    import pillow_avif  # noqa: F401 (registers the AVIF encoder)
+except ImportError:
+    pass
+
+STATIC_DIR = os.path.join(settings.BASE_DIR, 'guilda_manager', 'static')
+SOURCE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+MIN_BYTES = 64 * 1024
+
+# (extension, Pillow format, MIME type, save options), preferred first
+FORMATS = (
+    ('avif', 'AVIF', 'image/avif', {'quality': 60}),
+    ('webp', 'WEBP', 'image/webp', {'quality': 85, 'method': 6}),
+)
+
+
+def available_formats():
+    Image.init()
+    return [entry for entry in FORMATS if entry[1] in Image.SAVE]
+
+
+def variant_name(path, extension):
+    return f"{os.path.splitext(path)[0]}.{extension}"
+
+
+def convert_images(static_dir=STATIC_DIR, force=False, log=None):
+    """
+    Writes the missing or outdated web copies of the images of
+    ``static_dir`` and returns how many were written. ``log(name, extension,
+    source bytes, copy bytes or None)`` is called for each image converted
+    (None: the copy was not smaller and was dropped).
+    """
+    formats = available_formats()
+    written = 0
+    for root, _, names in os.walk(static_dir):
+        for name in sorted(names):
+            source = os.path.join(root, name)
+            if not name.lower().endswith(SOURCE_EXTENSIONS) or os.path.getsize(source) < MIN_BYTES:
+                continue
+            relative = os.path.relpath(source, static_dir).replace(os.sep, '/')
+            for extension, image_format, _, options in formats:
+                target = variant_name(source, extension)
+                if not force and os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+                    continue
+                with Image.open(source) as image:
+                    image.load()
+                    if image.mode not in ('RGB', 'RGBA'):
+                        image = image.convert('RGBA' if 'transparency' in image.info or 'A' in image.getbands() else 'RGB')
+                    image.save(target, image_format, **options)
+                size = os.path.getsize(source)
+                if os.path.getsize(target) >= size:
+                    os.remove(target)
+                    if log:
+                        log(relative, extension, size, None)
+                    continue
+                written += 1
+                if log:
+                    log(relative, extension, size, os.path.getsize(target))
+    return written
+
+
+@functools.lru_cache(maxsize=256)
+def image_variants(path):
+    """[(MIME type, static path)] of the web copies of ``path`` that exist, preferred first."""
+    return [
+        (mime_type, variant_name(path, extension))
+        for extension, _, mime_type, _ in FORMATS
+        if finders.find(variant_name(path, extension))
+    ]
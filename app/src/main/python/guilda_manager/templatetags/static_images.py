@@ -0,0 +1,23 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+from ..static_images import image_variants
+
+register = template.Library()
+
+
+@register.simple_tag
+def image_sources(path):
+    """<source> elements of the web copies of ``path``, for a <picture> before its <img>."""
+    return format_html_join('', '<source type="{}" srcset="{}">', (
+        (mime_type, static(variant)) for mime_type, variant in image_variants(path)
+    ))
+
+
+@register.simple_tag
+def image_url(path):
+    """URL of the WebP copy of ``path`` when there is one, of ``path`` otherwise."""
+    for mime_type, variant in image_variants(path):
+        if mime_type == 'image/webp':
+            return static(variant)
+    return static(path)
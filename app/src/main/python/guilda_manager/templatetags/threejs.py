@@ -0,0 +1,19 @@
+import json
+from django import template
+from django.utils.safestring import mark_safe
+from ..threejs import draco_decoder_path, import_map, vendored_manifest
+
+register = template.Library()
+
+
+@register.simple_tag
+def three_importmap():
+    """<script type="importmap"> for `three` and its addons (see threejs.py)."""
+    imports = json.dumps(import_map(vendored_manifest()), indent=4).replace('</', '<\\/')
+    return mark_safe(f'<script type="importmap">\n{imports}\n</script>')
+
+
+@register.simple_tag
+def three_draco_path():
+    """Decoder path for DRACOLoader.setDecoderPath() (see threejs.py)."""
+    return draco_decoder_path(vendored_manifest())
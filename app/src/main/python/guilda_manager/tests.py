@@ -3,8 +3,10 @@ from rest_framework.test import APIClient
 from rest_framework import status
 from decimal import Decimal
 from .models import Guild, Building, GuildBuilding, Member, Quest, Monster
-from .services import GuildLevelService
-from unittest.mock import patch
+from .scripted_dice import scripted_dice
+from .services import DiceService, GuildLevelService, GuildStatsService, seal_layout
+from .views import MISSOES_PAGE_SIZE
+from django.utils import timezone
 import random
 import hashlib
 from django.test import Client
@@ -60,6 +62,138 @@ class GuildModelTests(TestCase):
         self.assertEqual(self.guild.used_building_slots, 1)
 
 
+class GuildStatsServiceTests(TestCase):
+    def setUp(self):
+        self.guild = Guild.objects.create(name="Stats Guild", funds=Decimal('500.00'), level=2)
+        self.vault = Building.objects.create(
+            name="Caixa-Forte", slug="caixa-forte", description="Vault",
+            cost=Decimal('1000.00'), slots_required=1
+        )
+        self.quarters = Building.objects.create(
+            name="Alojamentos Expandidos", slug="alojamentos-expandidos", description="Quarters",
+            cost=Decimal('1000.00'), slots_required=1
+        )
+
+    def test_all_stats_cost_one_query(self):
+        GuildBuilding.objects.create(guild=self.guild, building=self.vault)
+        guild = Guild.objects.get(id=self.guild.id)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(guild.max_gold_cap, Decimal('7500'))
+            self.assertEqual(guild.max_member_slots, 10)
+            self.assertEqual(guild.used_building_slots, 1)
+            self.assertEqual(guild.available_building_slots, 1)
+            self.assertEqual(guild.max_gold_cap, Decimal('7500'))
+
+    def test_invalidated_on_building_change_from_other_instance(self):
+        guild = Guild.objects.get(id=self.guild.id)
+        self.assertEqual(guild.max_member_slots, 10)
+
+        guild_building = GuildBuilding.objects.create(
+            guild=Guild.objects.get(id=self.guild.id), building=self.quarters
+        )
+        self.assertEqual(guild.max_member_slots, 12)
+
+        guild_building.delete()
+        self.assertEqual(guild.max_member_slots, 10)
+
+    def test_invalidated_on_level_change(self):
+        self.assertEqual(self.guild.available_building_slots, 2)
+        self.guild.level = 3
+        self.assertEqual(self.guild.available_building_slots, 3)
+
+    def test_annotated_queryset_needs_no_stats_query(self):
+        GuildBuilding.objects.create(guild=self.guild, building=self.vault)
+        GuildBuilding.objects.create(guild=self.guild, building=self.quarters)
+        expected = Guild.objects.get(id=self.guild.id).stats
+
+        with self.assertNumQueries(1):
+            guild = GuildStatsService.annotate(Guild.objects.filter(id=self.guild.id)).get()
+            self.assertEqual(guild.stats, expected)
+
+        # The annotations are used once; changes after that are still seen
+        GuildBuilding.objects.filter(building=self.quarters).delete()
+        self.assertEqual(guild.max_member_slots, 10)
+
+    def test_sede_view_query_count_is_constant(self):
+        GuildBuilding.objects.create(guild=self.guild, building=self.vault)
+        GuildBuilding.objects.create(guild=self.guild, building=self.quarters)
+
+        # Guild lookup, stats aggregate and members count
+        with self.assertNumQueries(3):
+            response = self.client.get('/sede/')
+        self.assertEqual(response.status_code, 200)
+
+
+class DiceServiceTests(TestCase):
+    def setUp(self):
+        self.guild = Guild.objects.create(name="Dice Guild", dice_seed=42)
+
+    def test_stream_is_pinned_to_seed_and_cursor(self):
+        # Fixed values: a replay must give the same rolls on every device
+        self.assertEqual(DiceService.replay(42, 0).rolls(5, 20), [2, 9, 17, 14, 19])
+
+        stream = DiceService.replay(42, 0)
+        many = stream.rolls(40, 6)  # crosses the pre-drawn buffer
+        self.assertEqual(many, DiceService.replay(42, 0).rolls(40, 6))
+        self.assertNotEqual(many, DiceService.replay(42, 1).rolls(40, 6))
+
+    def test_streams_reserve_consecutive_cursors(self):
+        first = DiceService.stream(self.guild)
+        batch = DiceService.streams(self.guild, 3)
+
+        self.assertEqual([first.cursor] + [s.cursor for s in batch], [0, 1, 2, 3])
+        self.assertEqual({s.seed for s in batch}, {42})
+        self.guild.refresh_from_db()
+        self.assertEqual(self.guild.dice_cursor, 4)
+
+    def test_new_guilds_get_their_own_seed(self):
+        other = Guild.objects.create(name="Other")
+        self.assertNotEqual(other.dice_seed, Guild.objects.create(name="Third").dice_seed)
+
+    def test_delegation_records_a_replayable_stream(self):
+        member = Member.objects.create(name="Hero", guild=self.guild, status=Member.Status.ACTIVE)
+        quest = Quest.objects.create(title="Q", description="Desc", rank=Quest.Rank.F, guild=self.guild)
+        quest.assigned_members.add(member)
+
+        result = quest.resolve_delegation()
+
+        quest.refresh_from_db()
+        self.assertEqual((quest.dice_seed, quest.dice_cursor), (42, 0))
+        self.assertEqual(DiceService.replay(quest.dice_seed, quest.dice_cursor).roll(20), result['roll'])
+
+    def test_delegation_disaster_replays_the_same_victims(self):
+        # Seed 6, cursor 0 rolls a 1 then 3 deaths
+        self.guild.dice_seed = 6
+        self.guild.save()
+        members = [
+            Member.objects.create(name=f"Hero {i}", guild=self.guild, status=Member.Status.ACTIVE) for i in range(5)
+        ]
+        quest = Quest.objects.create(title="Q", description="Desc", rank=Quest.Rank.F, guild=self.guild)
+        # Assigned out of id order: the victims must not depend on it
+        quest.assigned_members.add(*reversed(members))
+
+        result = quest.resolve_delegation()
+
+        self.assertEqual((result['outcome'], result['dead_count']), ('DISASTER', 3))
+        quest.refresh_from_db()
+        stream = DiceService.replay(quest.dice_seed, quest.dice_cursor)
+        self.assertEqual(stream.roll(20), 1)
+        victims = stream.sample(members, stream.roll(6))
+        self.assertEqual(result['victims'], [member.name for member in victims])
+        self.assertEqual(
+            set(Member.objects.filter(status=Member.Status.DECEASED).values_list('name', flat=True)),
+            set(result['victims']),
+        )
+
+    def test_scripted_rolls(self):
+        with scripted_dice([3, 4]):
+            stream = DiceService.stream(self.guild)
+            self.assertEqual(stream.rolls(2, 20), [3, 4])
+            self.assertEqual(stream.sample(['a', 'b', 'c'], 2), ['a', 'b'])
+        self.guild.refresh_from_db()
+        self.assertEqual(self.guild.dice_cursor, 0)
+
 class GuildAPITests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -81,6 +215,18 @@ class GuildAPITests(TestCase):
             min_level_required=5
         )
 
+    def test_list_query_count_does_not_grow_with_guilds(self):
+        for i in range(10):
+            guild = Guild.objects.create(name=f"Guild {i}")
+            GuildBuilding.objects.create(guild=guild, building=self.building)
+
+        # Annotated guilds and prefetched buildings
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/guilds/')
+        self.assertEqual(len(response.data), 11)
+        self.assertEqual(response.data[1]['used_building_slots'], 1)
+        self.assertEqual(response.data[1]['active_buildings'][0]['building']['slug'], 'enfermaria')
+
     def test_retrieve_guild(self):
         response = self.client.get(f'/api/guilds/{self.guild.id}/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -161,8 +307,8 @@ class QuestTests(TestCase):
         )
         quest.assigned_members.add(self.member1)
 
-        # Mock random.randint to return 10 (Success)
-        with patch('random.randint', return_value=10):
+        # Script the dice to roll 10 (Success)
+        with scripted_dice(10):
             result = quest.resolve_delegation()
 
         self.assertEqual(result['outcome'], 'SUCCESS')
@@ -193,7 +339,7 @@ class QuestTests(TestCase):
         self.guild.funds = Decimal('1000.00')
         self.guild.save()
 
-        with patch('random.randint', return_value=10):
+        with scripted_dice(10):
             quest.resolve_delegation()
 
         self.guild.refresh_from_db()
@@ -214,9 +360,9 @@ class QuestTests(TestCase):
         )
         quest.assigned_members.add(self.member1)
 
-        # Mock randint. Call 1: 1 (Fail). Call 2: 10 (Success).
+        # Script the dice. Roll 1: 1 (Fail). Roll 2: 10 (Success).
         # War room takes max(1, 10) = 10 -> Success.
-        with patch('random.randint', side_effect=[1, 10]):
+        with scripted_dice([1, 10]):
             result = quest.resolve_delegation()
 
         self.assertEqual(result['outcome'], 'SUCCESS')
@@ -232,9 +378,9 @@ class QuestTests(TestCase):
         )
         quest.assigned_members.add(self.member1, self.member2)
 
-        # Mock randint. Return 1 (Fail).
-        # Then next call is for dead_count. Return 1.
-        with patch('random.randint', side_effect=[1, 1]):
+        # Script the dice. Roll 1 (Fail).
+        # Then next roll is for dead_count. Roll 1.
+        with scripted_dice([1, 1]):
              result = quest.resolve_delegation()
 
         self.assertEqual(result['outcome'], 'DISASTER')
@@ -259,7 +405,7 @@ class QuestAPITests(TestCase):
         )
 
     def test_delegate_endpoint(self):
-        with patch('random.randint', return_value=10):
+        with scripted_dice(10):
             response = self.client.post(f'/api/quests/{self.quest.id}/delegate/', {
                 'assigned_members': [self.member.id]
             })
@@ -284,6 +430,47 @@ class QuestAPITests(TestCase):
         self.quest.refresh_from_db()
         self.assertEqual(self.quest.status, Quest.Status.COMPLETED)
 
+    def test_list_follows_cursor_pages(self):
+        Quest.objects.bulk_create([
+            Quest(title=f"Quest {i}", description="Desc", rank=Quest.Rank.F, guild=self.guild) for i in range(4)
+        ])
+
+        ids = []
+        url = '/api/quests/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertLessEqual(len(response.data['results']), 2)
+            ids.extend(quest['id'] for quest in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(ids, list(Quest.objects.order_by('created_at', 'id').values_list('id', flat=True)))
+
+    def test_list_filters(self):
+        other = Guild.objects.create(name="Other")
+        Quest.objects.create(title="Other quest", description="Desc", rank=Quest.Rank.S, guild=other)
+        Quest.objects.create(title="Done", description="Desc", rank=Quest.Rank.F, guild=self.guild,
+                             status=Quest.Status.COMPLETED)
+
+        def titles(query):
+            return [quest['title'] for quest in self.client.get(f'/api/quests/?{query}').data['results']]
+
+        self.assertEqual(titles(f'guild={other.id}'), ["Other quest"])
+        self.assertEqual(titles('rank=S'), ["Other quest"])
+        self.assertEqual(titles('status=COMPLETED'), ["Done"])
+        self.assertEqual(titles(f'guild={self.guild.id}&status=OPEN'), ["API Quest"])
+        self.assertEqual(self.client.get('/api/quests/?rank=Z').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/api/quests/?guild=abc').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_projection_skips_members(self):
+        self.quest.assigned_members.add(self.member)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/quests/?fields=id,title,status_display')
+        self.assertEqual(response.data['results'], [{'id': self.quest.id, 'title': "API Quest", 'status_display': "Open"}])
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/quests/?fields=id,assigned_members_details')
+        self.assertEqual(response.data['results'][0]['assigned_members_details'][0]['name'], "Hero")
+
 class MissoesViewTests(TestCase):
     def setUp(self):
         self.client = Client()
@@ -316,6 +503,57 @@ class MissoesViewTests(TestCase):
             expected_rotation = rng.randint(-20, 20)
             self.assertEqual(q.seal_rotation, expected_rotation, "Seal rotation not deterministic")
 
+    def test_seal_layout_is_stored(self):
+        self.assertEqual(
+            (self.quest1.seal_rotation, self.quest1.seal_top_offset, self.quest1.seal_right_offset),
+            seal_layout(self.quest1.id, "Quest 1"),
+        )
+        self.quest1.refresh_from_db()
+        self.assertEqual(self.quest1.seal_rotation, seal_layout(self.quest1.id, "Quest 1")[0])
+
+        self.quest1.title = "Renamed"
+        self.quest1.save(update_fields=['title'])
+        self.quest1.refresh_from_db()
+        self.assertEqual(
+            (self.quest1.seal_rotation, self.quest1.seal_top_offset, self.quest1.seal_right_offset),
+            seal_layout(self.quest1.id, "Renamed"),
+        )
+
+    def test_bulk_created_quests_get_their_layout_on_render(self):
+        quest = Quest.objects.bulk_create([Quest(title="Bulk", guild=self.guild, rank='F', description="Desc")])[0]
+        self.assertIsNone(Quest.objects.get(pk=quest.pk).seal_rotation)
+
+        self.client.get('/missoes/')
+        self.assertEqual(Quest.objects.get(pk=quest.pk).seal_rotation, seal_layout(quest.pk, "Bulk")[0])
+
+    def test_board_shows_open_and_recent_quests_of_the_guild(self):
+        other = Guild.objects.create(name="Other")
+        Quest.objects.create(title="Other guild", guild=other, rank='F', description="Desc")
+        Quest.objects.create(title="Just done", guild=self.guild, rank='F', description="Desc",
+                             status=Quest.Status.COMPLETED)
+        old = Quest.objects.create(title="Long done", guild=self.guild, rank='F', description="Desc",
+                                   status=Quest.Status.COMPLETED)
+        Quest.objects.filter(pk=old.pk).update(updated_at=timezone.now() - timezone.timedelta(days=30))
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/missoes/')
+        self.assertEqual([q.title for q in response.context['quests']], ["Quest 2", "Quest 1", "Just done"])
+
+    def test_board_pages(self):
+        Quest.objects.bulk_create([
+            Quest(title=f"Extra {i}", guild=self.guild, rank='F', description="Desc") for i in range(MISSOES_PAGE_SIZE)
+        ])
+
+        first = self.client.get('/missoes/')
+        self.assertEqual(len(first.context['quests']), MISSOES_PAGE_SIZE)
+        self.assertIsNone(first.context['previous_page'])
+        self.assertEqual(first.context['next_page'], 2)
+
+        second = self.client.get('/missoes/?page=2')
+        self.assertEqual(len(second.context['quests']), 2)
+        self.assertEqual(second.context['previous_page'], 1)
+        self.assertIsNone(second.context['next_page'])
+
 class MonsterModelTests(TestCase):
     def test_monster_level_1(self):
         monster = Monster.objects.create(
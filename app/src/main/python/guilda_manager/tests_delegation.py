@@ -0,0 +1,95 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from .models import Guild, Building, GuildBuilding, Member, Quest
+from .scripted_dice import scripted_dice
+
+class DelegationPipelineTests(TestCase):
+    def setUp(self):
+        self.guild = Guild.objects.create(name="Pipeline Guild", funds=Decimal('1000.00'), level=1)
+        self.members = [
+            Member.objects.create(name=f"Hero{i}", guild=self.guild, status=Member.Status.ACTIVE)
+            for i in range(4)
+        ]
+        arsenal = Building.objects.create(name="Arsenal", slug="arsenal", description="Arsenal", cost=0)
+        war_room = Building.objects.create(name="Sala de Guerra", slug="sala-de-guerra", description="War Room", cost=0)
+        GuildBuilding.objects.create(guild=self.guild, building=arsenal)
+        GuildBuilding.objects.create(guild=self.guild, building=war_room)
+
+        self.quest = Quest.objects.create(
+            title="Pipeline Quest", description="Desc", rank=Quest.Rank.F, guild=self.guild,
+            gold_reward=Decimal('100.00'), operational_cost=Decimal('50.00')
+        )
+        self.quest.assigned_members.set(self.members)
+
+    def test_success_query_count(self):
+        quest = Quest.objects.get(id=self.quest.id)
+        # guild, modifiers, funds, dice record, claim, rewards, refresh + savepoints
+        with self.assertNumQueries(11), scripted_dice(10):
+            result = quest.resolve_delegation()
+
+        self.assertEqual(result['outcome'], 'SUCCESS')
+        self.guild.refresh_from_db()
+        # 1000 - (50 * 0.8) + 100
+        self.assertEqual(self.guild.funds, Decimal('1060.00'))
+
+    def test_disaster_marks_victims_in_one_update(self):
+        quest = Quest.objects.get(id=self.quest.id)
+        # guild, modifiers, funds, status, members, victims, refresh + savepoints
+        with self.assertNumQueries(9), scripted_dice([1, 1, 3]):
+            result = quest.resolve_delegation()
+
+        self.assertEqual(result['outcome'], 'DISASTER')
+        self.assertEqual(result['dead_count'], 3)
+        self.assertEqual(Member.objects.filter(status=Member.Status.DECEASED).count(), 3)
+        self.quest.refresh_from_db()
+        self.assertEqual(self.quest.status, Quest.Status.DISASTER)
+
+    def test_complete_quest_pays_only_once(self):
+        stale_copy = Quest.objects.get(id=self.quest.id)
+        self.quest.complete_quest()
+        stale_copy.complete_quest()
+
+        self.guild.refresh_from_db()
+        self.assertEqual(self.guild.funds, Decimal('1100.00'))
+        self.assertEqual(self.guild.gxp, 2)
+
+
+class DelegationConcurrencyTests(TransactionTestCase):
+    DELEGATIONS = 40
+    THREADS = 8
+
+    def test_parallel_delegations_keep_funds_exact(self):
+        guild = Guild.objects.create(name="Busy Guild", funds=Decimal('10000.00'), level=10)
+        member = Member.objects.create(name="Hero", guild=guild, status=Member.Status.ACTIVE)
+        quest_ids = []
+        for i in range(self.DELEGATIONS):
+            quest = Quest.objects.create(
+                title=f"Quest {i}", description="Desc", rank=Quest.Rank.E, guild=guild,
+                gold_reward=Decimal('25.50'), operational_cost=Decimal('10.00')
+            )
+            quest.assigned_members.add(member)
+            quest_ids.append(quest.id)
+
+        start = threading.Barrier(self.THREADS)
+
+        def delegate(quest_id):
+            try:
+                if quest_id in quest_ids[:self.THREADS]:
+                    start.wait(timeout=5)
+                return Quest.objects.get(id=quest_id).resolve_delegation()['outcome']
+            finally:
+                connection.close()
+
+        with scripted_dice(10):
+            with ThreadPoolExecutor(max_workers=self.THREADS) as pool:
+                outcomes = list(pool.map(delegate, quest_ids))
+
+        self.assertEqual(outcomes, ['SUCCESS'] * self.DELEGATIONS)
+        guild.refresh_from_db()
+        # 10000 + 40 * (25.50 - 10.00)
+        self.assertEqual(guild.funds, Decimal('10620.00'))
+        self.assertEqual(guild.gxp, self.DELEGATIONS * Quest.RANK_GXP_REWARDS['E'])
+        self.assertEqual(Quest.objects.filter(status=Quest.Status.COMPLETED).count(), self.DELEGATIONS)
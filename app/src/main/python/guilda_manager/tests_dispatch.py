@@ -1,8 +1,11 @@
-from django.test import TestCase
+import threading
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
 from django.utils import timezone
 from decimal import Decimal
-from unittest.mock import patch
 from .models import Guild, Squad, SquadRank, Member, Quest, Dispatch, Building, GuildBuilding
+from .scripted_dice import scripted_dice
+from .services import DiceService
 
 class DispatchModelTests(TestCase):
     def setUp(self):
@@ -38,7 +41,7 @@ class DispatchModelTests(TestCase):
     def test_resolve_success_squad(self):
         dispatch = Dispatch.objects.create(squad=self.squad, rank='F')
 
-        with patch('random.randint', return_value=10):
+        with scripted_dice(10):
             result = dispatch.resolve()
 
         self.assertEqual(result['roll'], 10)
@@ -53,16 +56,14 @@ class DispatchModelTests(TestCase):
         # Verify internal quest creation
         self.assertTrue(Quest.objects.filter(type=Quest.Type.INTERNAL, guild=self.guild).exists())
 
-        # Verify rewards distributed (GXP)
+        # The history quest is created COMPLETED, so complete_quest() pays no GXP
         self.guild.refresh_from_db()
-        # Quest Rank F gives 2 GXP by default if not specified, but here Dispatch created it with rank F.
-        # Dispatch code: quest.complete_quest() is called.
-        self.assertEqual(self.guild.gxp, 2)
+        self.assertEqual(self.guild.gxp, 0)
 
     def test_resolve_success_mission(self):
         dispatch = Dispatch.objects.create(mission=self.mission)
 
-        with patch('random.randint', return_value=10):
+        with scripted_dice(10):
             dispatch.resolve()
 
         self.assertEqual(dispatch.status, Dispatch.Status.COMPLETED)
@@ -76,8 +77,8 @@ class DispatchModelTests(TestCase):
     def test_resolve_disaster_squad(self):
         dispatch = Dispatch.objects.create(squad=self.squad)
 
-        # Mock roll=1 (Disaster) and deaths=2
-        with patch('random.randint', side_effect=[1, 2]):
+        # Script roll=1 (Disaster) and deaths=2
+        with scripted_dice([1, 2]):
             result = dispatch.resolve()
 
         self.assertEqual(dispatch.status, Dispatch.Status.DISASTER)
@@ -95,7 +96,7 @@ class DispatchModelTests(TestCase):
 
         dispatch = Dispatch.objects.create(mission=self.mission, npc_count=3)
 
-        with patch('random.randint', return_value=1): # Disaster
+        with scripted_dice(1): # Disaster
             dispatch.resolve()
 
         self.assertEqual(dispatch.status, Dispatch.Status.DISASTER)
@@ -113,10 +114,183 @@ class DispatchModelTests(TestCase):
 
         dispatch = Dispatch.objects.create(squad=self.squad)
 
-        # Mock rolls: 1 and 15. max(1, 15) = 15 -> Success
-        with patch('random.randint', side_effect=[1, 15]):
+        # Script rolls: 1 and 15. max(1, 15) = 15 -> Success
+        with scripted_dice([1, 15]):
             result = dispatch.resolve()
 
         self.assertTrue(result['has_war_room'])
         self.assertEqual(result['roll'], 15)
         self.assertEqual(dispatch.status, Dispatch.Status.COMPLETED)
+
+
+class DispatchBatchResolverTests(TestCase):
+    def setUp(self):
+        self.guild = Guild.objects.create(name="Batch Guild", funds=Decimal('1000.00'), level=1)
+        self.other_guild = Guild.objects.create(name="Other Guild", funds=Decimal('0.00'), level=1)
+        self.rank_f = SquadRank.objects.create(name="F", order=0, missions_required=0)
+        self.rank_e = SquadRank.objects.create(name="E", order=1, missions_required=2)
+        self.past = timezone.now() - timezone.timedelta(days=1)
+
+    def make_squad(self, guild, name, members=3):
+        squad = Squad.objects.create(name=name, guild=guild, rank=self.rank_f)
+        for i in range(members):
+            Member.objects.create(name=f"{name}-{i}", guild=guild, squad=squad, status=Member.Status.ACTIVE)
+        return squad
+
+    def make_due_dispatches(self, count):
+        squads = [self.make_squad(self.guild, "A"), self.make_squad(self.other_guild, "B")]
+        for i in range(count):
+            Dispatch.objects.create(squad=squads[i % 2], rank='F', start_date=self.past, duration_days=0)
+
+    def resolve_due(self, **kwargs):
+        from .resolution import DispatchResolver
+        return DispatchResolver().resolve_due(**kwargs)
+
+    def test_only_due_dispatches_are_resolved(self):
+        squad = self.make_squad(self.guild, "A")
+        due = Dispatch.objects.create(squad=squad, rank='F', start_date=self.past, duration_days=0)
+        future = Dispatch.objects.create(squad=squad, rank='F')
+
+        with scripted_dice(10):
+            summary = self.resolve_due()
+
+        self.assertEqual(summary['resolved'], 1)
+        self.assertEqual(summary['dispatches'][0]['id'], due.id)
+        due.refresh_from_db()
+        future.refresh_from_db()
+        self.assertEqual(due.status, Dispatch.Status.COMPLETED)
+        self.assertEqual(due.result_log, "Rolagem: 10. Sucesso! Recompensa entregue.")
+        self.assertEqual(future.status, Dispatch.Status.PENDING)
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        # Grows with the number of guilds (2 here), not of dispatches
+        self.make_due_dispatches(4)
+        with scripted_dice(10):
+            with self.assertNumQueries(12):
+                self.resolve_due()
+
+        Dispatch.objects.all().delete()
+        self.make_due_dispatches(40)
+        with scripted_dice(10):
+            with self.assertNumQueries(12):
+                summary = self.resolve_due()
+
+        self.assertEqual(summary['completed'], 40)
+
+    def test_successes_record_history_quests_and_promote_squads(self):
+        self.make_due_dispatches(4)
+
+        with scripted_dice(10):
+            self.resolve_due()
+
+        history = Quest.objects.filter(type=Quest.Type.INTERNAL, guild=self.guild)
+        self.assertEqual(history.count(), 2)
+        self.assertEqual(history.first().assigned_members.count(), 3)
+
+        # History quests are created COMPLETED: they pay nothing
+        self.guild.refresh_from_db()
+        self.assertEqual(self.guild.gxp, 0)
+        for squad in Squad.objects.all():
+            self.assertEqual(squad.missions_completed, 2)
+            self.assertEqual(squad.rank, self.rank_e)
+
+    def test_disasters_never_kill_the_same_member_twice(self):
+        squad = self.make_squad(self.guild, "A", members=3)
+        for _ in range(2):
+            Dispatch.objects.create(squad=squad, start_date=self.past, duration_days=0)
+
+        # Two critical failures, 2 then 6 deaths: only 3 members exist
+        with scripted_dice([1, 2, 1, 6]):
+            summary = self.resolve_due()
+
+        self.assertEqual([d['deaths'] for d in summary['dispatches']], [2, 1])
+        self.assertEqual(Member.objects.filter(status=Member.Status.DECEASED).count(), 3)
+        self.assertEqual(Dispatch.objects.filter(status=Dispatch.Status.DISASTER).count(), 2)
+
+    def test_mission_dispatched_twice_is_paid_once(self):
+        mission = Quest.objects.create(
+            title="Mission", description="Desc", rank=Quest.Rank.F, guild=self.guild,
+            gold_reward=Decimal('100.00'), gxp_reward=10
+        )
+        for _ in range(2):
+            Dispatch.objects.create(mission=mission, npc_count=1, start_date=self.past, duration_days=0)
+
+        with scripted_dice(10):
+            summary = self.resolve_due()
+
+        self.assertEqual(summary['completed'], 2)
+        self.guild.refresh_from_db()
+        self.assertEqual(self.guild.gxp, 10)
+        self.assertEqual(self.guild.funds, Decimal('1100.00'))
+
+    def test_each_dispatch_records_a_replayable_stream(self):
+        self.guild.dice_seed = 7
+        self.guild.save()
+        squad = self.make_squad(self.guild, "A")
+        for _ in range(3):
+            Dispatch.objects.create(squad=squad, start_date=self.past, duration_days=0)
+
+        summary = self.resolve_due()
+
+        for outcome in summary['dispatches']:
+            dispatch = Dispatch.objects.get(id=outcome['id'])
+            self.assertEqual(dispatch.dice_seed, 7)
+            self.assertEqual(DiceService.replay(dispatch.dice_seed, dispatch.dice_cursor).roll(20), outcome['roll'])
+        self.assertEqual(sorted(Dispatch.objects.values_list('dice_cursor', flat=True)), [0, 1, 2])
+
+    def test_api_and_command_resolve_due_dispatches(self):
+        from django.core.management import call_command
+        from io import StringIO
+
+        self.make_due_dispatches(2)
+        with scripted_dice(10):
+            response = self.client.post('/api/dispatches/resolve_due/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['resolved'], 2)
+
+        self.make_due_dispatches(3)
+        out = StringIO()
+        with scripted_dice(10):
+            call_command('resolve_dispatches', stdout=out)
+        self.assertIn("Resolved 3 dispatches", out.getvalue())
+
+
+class ConcurrentResolutionTests(TransactionTestCase):
+    def test_concurrent_resolve_due_resolves_each_dispatch_once(self):
+        from .resolution import DispatchResolver
+
+        guild = Guild.objects.create(name="Race Guild", funds=Decimal('0.00'), level=1)
+        squad = Squad.objects.create(name="Racers", guild=guild)
+        Member.objects.create(name="Racer", guild=guild, squad=squad, status=Member.Status.ACTIVE)
+        past = timezone.now() - timezone.timedelta(days=1)
+        for _ in range(5):
+            Dispatch.objects.create(squad=squad, rank='F', start_date=past, duration_days=0)
+
+        # Both resolvers have read the same due dispatches before either writes
+        barrier = threading.Barrier(2)
+
+        class RacingResolver(DispatchResolver):
+            def resolve(self, dispatches):
+                barrier.wait(timeout=5)
+                return super().resolve(dispatches)
+
+        summaries = []
+
+        def run():
+            try:
+                summaries.append(RacingResolver().resolve_due())
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run) for _ in range(2)]
+        with scripted_dice(10):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(sorted(summary['resolved'] for summary in summaries), [0, 5])
+        self.assertEqual(Dispatch.objects.filter(status=Dispatch.Status.COMPLETED).count(), 5)
+        self.assertEqual(Quest.objects.filter(type=Quest.Type.INTERNAL).count(), 5)
+        squad.refresh_from_db()
+        self.assertEqual(squad.missions_completed, 5)
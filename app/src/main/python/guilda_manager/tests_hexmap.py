@@ -0,0 +1,167 @@
+from django.test import TestCase
+from django.urls import reverse
+from .hexmap import HexGrid, Region, RegionError, distance, hex_range, hexagons_at, neighbors, ring
+from .models import Guild, Hexagon, Map, Pin
+
+
+class AxialTests(TestCase):
+    def test_distance_ring_and_range(self):
+        self.assertEqual(distance((0, 0), (2, -1)), 2)
+        self.assertEqual(distance((-3, 1), (2, 2)), 6)
+        for radius in range(4):
+            cells = ring((1, -2), radius)
+            self.assertEqual(len(set(cells)), max(1, 6 * radius))
+            self.assertTrue(all(distance((1, -2), cell) == radius for cell in cells))
+        self.assertEqual(len(hex_range((0, 0), 3)), 37)
+        self.assertEqual(set(neighbors(0, 0)), set(ring((0, 0), 1)))
+
+    def test_s_is_stored(self):
+        game_map = Map.objects.create(name="Mapa")
+        Hexagon.objects.bulk_create([Hexagon(map=game_map, q=2, r=-5)])
+        Hexagon.objects.create(map=game_map, q=-1, r=-1)
+        self.assertEqual(dict(Hexagon.objects.values_list('q', 's')), {2: 3, -1: 2})
+
+
+class RegionTests(TestCase):
+    def test_radius_region(self):
+        game_map = Map.objects.create(name="Mapa")
+        Hexagon.objects.bulk_create([
+            Hexagon(map=game_map, q=q, r=r) for q in range(-3, 4) for r in range(-3, 4)
+        ])
+
+        hexes = Region.around(0, 0, 2).filter(Hexagon.objects.filter(map=game_map))
+        coordinates = {(h.q, h.r) for h in hexes}
+        self.assertEqual(len(coordinates), 19)
+        self.assertTrue(all(max(abs(q), abs(r), abs(q + r)) <= 2 for q, r in coordinates))
+
+    def test_ring_region_and_bulk_lookup(self):
+        game_map = Map.objects.create(name="Mapa")
+        Hexagon.objects.bulk_create([Hexagon(map=game_map, q=q, r=r) for q, r in hex_range((0, 0), 4)])
+        hexagons = Hexagon.objects.filter(map=game_map)
+
+        found = {(h.q, h.r) for h in Region.around(1, 0, 2, ring=True).filter(hexagons)}
+        self.assertEqual(found, set(ring((1, 0), 2)))
+
+        with self.assertNumQueries(1):
+            at = hexagons_at(hexagons, [(0, 0), (3, -3), (9, 9)])
+        self.assertEqual(set(at), {(0, 0), (3, -3)})
+
+    def test_invalid_params(self):
+        with self.assertRaises(RegionError):
+            Region.from_params({'q_min': 0, 'q_max': 100, 'r_min': 0, 'r_max': 1})
+        with self.assertRaises(RegionError):
+            Region.from_params({'q': 0, 'r': 'x', 'radius': 1})
+        with self.assertRaises(RegionError):
+            Region.from_params({'q_min': 0})
+
+
+class HexRegionAPITests(TestCase):
+    def setUp(self):
+        self.map = Map.objects.create(name="Mapa", radius=20)
+        self.pin = Pin.objects.create(name="Torre", glb_path='torre.glb')
+        Hexagon.objects.create(map=self.map, q=0, r=0, title="Capital", pin=self.pin)
+        Hexagon.objects.create(map=self.map, q=1, r=-1, title="Vila")
+        Hexagon.objects.create(map=self.map, q=15, r=0, title="Longe")
+        self.url = reverse('hex-region-list')
+        self.params = {'map': self.map.id, 'q_min': -4, 'q_max': 4, 'r_min': -4, 'r_max': 4}
+
+    def test_region(self):
+        response = self.client.get(self.url, self.params)
+
+        self.assertEqual(response.status_code, 200)
+        hexes = {(h['q'], h['r']): h for h in response.json()['hexes']}
+        self.assertEqual(set(hexes), {(0, 0), (1, -1)})
+        self.assertEqual(hexes[(0, 0)]['pin_name'], "Torre")
+        self.assertEqual(hexes[(0, 0)]['model'], 'torre.glb')
+        self.assertIsNone(hexes[(1, -1)]['model'])
+
+    def test_etag_revalidation(self):
+        etag = self.client.get(self.url, self.params)['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Another region's edit keeps this region's ETag
+        Hexagon.objects.filter(q=15).get().save()
+        self.assertEqual(self.client.get(self.url, self.params)['ETag'], etag)
+
+        hexagon = Hexagon.objects.get(q=1, r=-1)
+        hexagon.title = "Aldeia"
+        hexagon.save()
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_pin_changes_change_the_etag(self):
+        etag = self.client.get(self.url, self.params)['ETag']
+        self.pin.name = "Fortaleza"
+        self.pin.save()
+        renamed = self.client.get(self.url, self.params)['ETag']
+        self.assertNotEqual(renamed, etag)
+
+        self.pin.delete()
+        self.assertNotEqual(self.client.get(self.url, self.params)['ETag'], renamed)
+
+    def test_invalid_region(self):
+        response = self.client.get(self.url, {'q': 0, 'r': 0, 'radius': 500})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('radius', response.json())
+
+
+class HexGridTests(TestCase):
+    def test_path_around_a_wall(self):
+        # A wall along q = 0 with one gap, at r = 3
+        wall = [(0, r) for r in range(-4, 5) if r != 3]
+        grid = HexGrid(4, wall)
+
+        path = grid.path((-2, 0), (2, 0))
+        self.assertEqual(path[0], (-2, 0))
+        self.assertEqual(path[-1], (2, 0))
+        self.assertIn((0, 3), path)
+        self.assertTrue(all(distance(a, b) == 1 for a, b in zip(path, path[1:])))
+        self.assertFalse(set(path) & set(wall))
+
+        self.assertIsNone(grid.path((-2, 0), (0, 0)))   # Blocked
+        self.assertIsNone(grid.path((-2, 0), (9, 0)))   # Off the map
+        self.assertIsNone(HexGrid(4, wall + [(0, 3)]).path((-2, 0), (2, 0)))
+
+    def test_cached_per_map_until_it_changes(self):
+        game_map = Map.objects.create(name="Mapa", radius=3)
+        grid = HexGrid.for_map(game_map)
+        with self.assertNumQueries(0):
+            self.assertIs(HexGrid.for_map(game_map), grid)
+
+        Hexagon.objects.create(map=game_map, q=1, r=0, blocked=True)
+        grid = HexGrid.for_map(game_map)
+        self.assertFalse(grid.passable((1, 0)))
+
+        game_map.radius = 6
+        game_map.save()
+        self.assertTrue(HexGrid.for_map(game_map).contains((6, 0)))
+
+    def test_path_api(self):
+        game_map = Map.objects.create(name="Mapa", radius=3)
+        Hexagon.objects.create(map=game_map, q=1, r=0, blocked=True)
+
+        response = self.client.get(reverse('hex-region-path'),
+                                   {'map': game_map.id, 'from_q': 0, 'from_r': 0, 'to_q': 2, 'to_r': 0})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['distance'], 3)
+
+        response = self.client.get(reverse('hex-region-path'),
+                                   {'map': game_map.id, 'from_q': 0, 'from_r': 0, 'to_q': 1, 'to_r': 0})
+        self.assertEqual(response.status_code, 404)
+
+    def test_move_party_checks_reachability(self):
+        guild = Guild.objects.create(name="Guilda")
+        game_map = Map.objects.create(name="Mapa", radius=3)
+        Hexagon.objects.create(map=game_map, q=1, r=0, blocked=True)
+        url = reverse('mestre_action', kwargs={'action': 'move_party'})
+
+        response = self.client.post(url, {'q': 2, 'r': 0})
+        self.assertEqual(response.json()['distance'], 3)
+        self.assertEqual(self.client.post(url, {'q': 1, 'r': 0}).status_code, 400)
+        self.assertEqual(self.client.post(url, {'q': 9, 'r': 0}).status_code, 400)
+        guild.refresh_from_db()
+        self.assertEqual((guild.party_q, guild.party_r), (2, 0))
@@ -0,0 +1,110 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from .map_images import FOG_DEFAULT, background_for, fog_palette, level_sizes
+from .models import Guild, Map
+
+
+def jpeg(size, color=(200, 40, 40)):
+    buffer = io.BytesIO()
+    image = Image.new('RGB', size, color)
+    # Green bottom-left quarter, to check the fog cells sample where they should
+    image.paste((40, 200, 40), (0, size[1] // 2, size[0] // 2, size[1]))
+    image.save(buffer, 'JPEG', quality=95)
+    return buffer.getvalue()
+
+
+class MapImageTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.guild = Guild.objects.create(name="Guilda")
+        self.url = reverse('mestre_action', kwargs={'action': 'upload_map'})
+
+    def upload(self, content, name='mapa.jpg'):
+        return self.client.post(self.url, {'map_image': SimpleUploadedFile(name, content, content_type='image/jpeg')})
+
+    def test_level_sizes(self):
+        self.assertEqual(level_sizes((4000, 2000)), [(2048, 1024), (1024, 512), (512, 256), (256, 128)])
+        # Smaller than the first level: kept at its size, never upscaled
+        self.assertEqual(level_sizes((600, 300)), [(600, 300), (512, 256), (256, 128)])
+
+    def test_fog_palette_matches_the_map_third(self):
+        image = Image.open(io.BytesIO(jpeg((400, 400))))
+        palette = fog_palette(image)
+
+        self.assertEqual(len(palette), 16)
+        # Border cells are outside the map
+        self.assertEqual(palette[0], list(FOG_DEFAULT))
+        self.assertEqual(palette[15], list(FOG_DEFAULT))
+        # Row 1 is the bottom of the image (v goes up): green on the left, red on the right
+        red, green = palette[1 * 4 + 2], palette[1 * 4 + 1]
+        self.assertGreater(green[1], 150)
+        self.assertGreater(red[0], 150)
+        self.assertGreater(palette[2 * 4 + 1][0], 150)
+
+    def test_upload_processes_the_background(self):
+        response = self.upload(jpeg((2400, 1200)))
+
+        self.assertEqual(response.status_code, 200)
+        game_map = Map.objects.get()
+        meta = game_map.background_meta
+        self.assertEqual([level['width'] for level in meta['levels']], [2048, 1024, 512, 256])
+        self.assertEqual((meta['tiles']['columns'], meta['tiles']['rows']), (4, 2))
+        for name in [level['name'] for level in meta['levels']] + meta['tiles']['names']:
+            with Image.open(os.path.join(self.media_root, name)) as image:
+                self.assertEqual(image.format, 'WEBP')
+
+        background = response.json()['map']['background']
+        self.assertTrue(background['url'].endswith('/1024.webp'))
+        self.assertEqual(len(background['fog']), 16)
+        self.assertTrue(background_for(game_map, 300)['url'].endswith('/256.webp'))
+
+        page = self.client.get(reverse('mapa'))
+        self.assertEqual(page.context['map_background']['width'], 2048)
+        self.assertContains(page, 'id="map-background"')
+
+    def test_reupload_removes_the_previous_variants(self):
+        self.upload(jpeg((800, 600)))
+        first = Map.objects.get().background_meta
+        self.upload(jpeg((800, 600), color=(10, 10, 200)))
+        second = Map.objects.get().background_meta
+
+        self.assertNotEqual(first['sha256'], second['sha256'])
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, first['levels'][0]['name'])))
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, second['levels'][0]['name'])))
+
+    def test_invalid_image_keeps_the_previous_background(self):
+        self.upload(jpeg((300, 300)))
+        previous = Map.objects.get().background_image.name
+
+        response = self.upload(b'not an image', name='mapa.png')
+        self.assertEqual(response.status_code, 400)
+        game_map = Map.objects.get()
+        self.assertEqual(game_map.background_image.name, previous)
+        self.assertEqual(game_map.background_meta['source'], previous)
+
+    def test_decompression_bomb_is_rejected(self):
+        self.upload(jpeg((300, 300)))
+        previous = Map.objects.get().background_image.name
+
+        # Over twice the limit Pillow refuses to open it
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000):
+            response = self.upload(jpeg((300, 300), color=(10, 10, 200)))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Map.objects.get().background_image.name, previous)
+
+    def test_unprocessed_background_is_served_as_uploaded(self):
+        game_map = Map.objects.create(name="Reino", background_image='maps/antigo.jpg')
+        background = background_for(game_map)
+        self.assertEqual(background['url'], game_map.background_image.url)
+        self.assertIsNone(background['fog'])
@@ -1,5 +1,5 @@
 from django.test import TestCase
-from .models import Guild, Squad, Dispatch, Member, Quest, SquadRank
+from .models import Guild, Squad, Dispatch, Member, Quest, SquadRank, Hexagon
 from django.utils import timezone
 import random
 
@@ -83,3 +83,69 @@ class MestreTestCase(TestCase):
 
         # Verify guild is deleted
         self.assertFalse(Guild.objects.exists())
+
+
+class MestreActionAPITests(TestCase):
+    def setUp(self):
+        self.guild = Guild.objects.create(name="Test Guild", level=1, funds=100)
+        self.rank = SquadRank.objects.create(name='Recruta', order=1, missions_required=0, min_guild_level=1)
+        self.squad = Squad.objects.create(name="Alpha Squad", guild=self.guild, rank=self.rank)
+
+    def post(self, action, data=None):
+        return self.client.post(f'/mestre/acoes/{action}/', data or {})
+
+    def test_edit_squad_returns_only_the_squad(self):
+        response = self.post('edit_squad', {'squad_id': self.squad.id, 'name': "Bravo"})
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertTrue(body['success'])
+        self.assertEqual(body['message'], "Esquadrão Bravo atualizado.")
+        self.assertEqual(body['squad'], {
+            'id': self.squad.id, 'name': "Bravo", 'rank_id': self.rank.id,
+            'rank_name': 'Recruta', 'missions_completed': 0,
+        })
+        self.assertEqual(set(body), {'success', 'message', 'squad'})
+
+    def test_manage_gold_returns_the_treasury(self):
+        response = self.post('manage_gold', {'operation': 'add', 'amount': '50'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(float(response.json()['treasury']['funds']), 150)
+        self.guild.refresh_from_db()
+        self.assertEqual(self.guild.funds, 150)
+
+    def test_update_hex_and_move_party(self):
+        response = self.post('update_hex', {'q': 2, 'r': -1, 'title': "Vila", 'description': ''})
+        self.assertEqual(response.json()['hexagon']['title'], "Vila")
+        self.assertTrue(Hexagon.objects.filter(q=2, r=-1, title="Vila").exists())
+
+        response = self.post('move_party', {'q': 2, 'r': -1})
+        self.assertEqual((response.json()['q'], response.json()['r']), (2, -1))
+        self.guild.refresh_from_db()
+        self.assertEqual((self.guild.party_q, self.guild.party_r), (2, -1))
+
+    def test_invalid_input_is_a_json_error(self):
+        response = self.post('move_party', {'q': 'x'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'success': False, 'error': "Coordenadas inválidas para mover a comitiva."})
+
+        response = self.post('edit_squad', {'squad_id': 999})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.json()['success'])
+
+        response = self.post('unknown')
+        self.assertEqual(response.status_code, 404)
+
+    def test_delete_guild_returns_the_redirect(self):
+        response = self.post('delete_guild')
+        self.assertEqual(response.json(), {'success': True, 'redirect': '/entry/'})
+        self.assertFalse(Guild.objects.exists())
+
+    def test_get_is_not_allowed(self):
+        self.assertEqual(self.client.get('/mestre/acoes/config/').status_code, 405)
+
+    def test_legacy_ajax_post_to_console(self):
+        response = self.client.post('/mestre/', {'action': 'move_party', 'q': 1, 'r': 1},
+                                    HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.json()['q'], 1)
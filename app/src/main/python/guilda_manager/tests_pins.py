@@ -1,6 +1,11 @@
-from django.test import TestCase
-from .models import Guild, Pin
+import os
+import tempfile
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+from .models import Guild, Hexagon, Map, Pin
 from django.urls import reverse
+from . import gltf
+from .pins import OPTIMIZED_DIR, PinCatalog, build_manifest, file_sha256, load_manifest, pin_model
 
 class PinManagementTestCase(TestCase):
     def setUp(self):
@@ -44,3 +49,143 @@ class PinManagementTestCase(TestCase):
         # unless running in an environment where static files are missing.
         # But based on list_files earlier, they exist.
         self.assertTrue(len(response.context['available_pins']) > 0)
+
+
+def _grid_glb(size=20):
+    """Unquantized GLB of a size x size grid of quads on a wavy surface."""
+    import math
+    positions, normals, indices = [], [], []
+    for row in range(size + 1):
+        for column in range(size + 1):
+            positions += [column / size, math.sin(column / 3) * 0.1, row / size]
+            normals += [0.0, 1.0, 0.0]
+    for row in range(size):
+        for column in range(size):
+            a = row * (size + 1) + column
+            indices += [a, a + size + 1, a + 1, a + 1, a + size + 1, a + size + 2]
+    document = {'asset': {'version': '2.0'}, 'scene': 0, 'scenes': [{'nodes': [0]}],
+                'nodes': [{'mesh': 0, 'name': 'Grid'}], 'materials': [{'name': 'Stone'}]}
+    meshes = [{'name': 'Grid', 'primitives': [
+        {'attributes': {'POSITION': positions, 'NORMAL': normals}, 'indices': indices, 'material': 0},
+    ]}]
+    return gltf.encode(document, b'', meshes, quantize=False)
+
+
+class PinOptimizationTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.pins_dir = tmp.name
+        with open(os.path.join(self.pins_dir, 'grid.glb'), 'wb') as handle:
+            handle.write(_grid_glb())
+        with open(os.path.join(self.pins_dir, 'broken.glb'), 'wb') as handle:
+            handle.write(b'not a glb')
+
+    def test_build_manifest(self):
+        manifest = build_manifest(self.pins_dir, ratios=(1.0, 0.25))
+
+        entry = manifest['pins']['grid.glb']
+        self.assertEqual(entry['triangles'], 800)
+        lod0, lod1 = entry['variants']
+        self.assertEqual(lod0['triangles'], 800)
+        self.assertLess(lod0['bytes'], entry['bytes'])
+        self.assertTrue(200 <= lod1['triangles'] < 800)
+        self.assertIn('error', manifest['pins']['broken.glb'])
+        self.assertEqual(load_manifest(self.pins_dir), manifest)
+
+    def test_quantized_variant_keeps_the_geometry(self):
+        build_manifest(self.pins_dir, ratios=(1.0,))
+        with open(os.path.join(self.pins_dir, 'grid.glb'), 'rb') as handle:
+            source = gltf.load_meshes(*gltf.read_glb(handle.read()))
+        with open(os.path.join(self.pins_dir, OPTIMIZED_DIR, 'grid.lod0.glb'), 'rb') as handle:
+            document, binary = gltf.read_glb(handle.read())
+        optimized = gltf.load_meshes(document, binary)
+
+        self.assertEqual(document['extensionsRequired'], [gltf.QUANTIZATION])
+        grid = next(node for node in document['nodes'] if 'mesh' in node)
+        offset, scale = grid['translation'], grid['scale'][0]
+        original = source[0]['primitives'][0]['attributes']['POSITION']
+        quantized = optimized[0]['primitives'][0]['attributes']['POSITION']
+        for index, (value, stored) in enumerate(zip(original, quantized)):
+            self.assertAlmostEqual(stored * scale + offset[index % 3], value, delta=scale)
+        self.assertEqual(optimized[0]['primitives'][0]['indices'], source[0]['primitives'][0]['indices'])
+
+    def test_unchanged_models_are_not_rebuilt(self):
+        build_manifest(self.pins_dir, ratios=(1.0, 0.25))
+        with patch('guilda_manager.pins.optimize_pin') as optimize:
+            build_manifest(self.pins_dir, ratios=(1.0, 0.25))
+        optimize.assert_not_called()
+
+    def test_pin_model_serves_the_lightest_adequate_variant(self):
+        build_manifest(self.pins_dir, ratios=(1.0, 0.25))
+        self.assertEqual(pin_model('grid.glb', 10000, self.pins_dir), 'optimized/grid.lod0.glb')
+        self.assertEqual(pin_model('grid.glb', 500, self.pins_dir), 'optimized/grid.lod1.glb')
+        self.assertEqual(pin_model('grid.glb', 10, self.pins_dir), 'optimized/grid.lod1.glb')
+        self.assertEqual(pin_model('broken.glb', 10, self.pins_dir), 'broken.glb')
+        self.assertEqual(pin_model('missing.glb', 10, self.pins_dir), 'missing.glb')
+
+    @override_settings(PIN_MAP_MAX_TRIANGLES=1000)
+    def test_map_regions_serve_variants(self):
+        build_manifest(self.pins_dir, ratios=(1.0, 0.25))
+        game_map = Map.objects.create(name="Mapa")
+        Hexagon.objects.create(map=game_map, q=0, r=0, pin=Pin.objects.create(name="Grid", glb_path='grid.glb'))
+
+        with patch('guilda_manager.pins.PINS_DIR', self.pins_dir):
+            response = self.client.get(reverse('hex-region-list'), {'q': 0, 'r': 0, 'radius': 1})
+        self.assertEqual(response.json()['hexes'][0]['model'], 'optimized/grid.lod0.glb')
+
+
+class PinCatalogTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.pins_dir = tmp.name
+        with open(os.path.join(self.pins_dir, 'grid.glb'), 'wb') as handle:
+            handle.write(_grid_glb())
+        PinCatalog.invalidate()
+        self.addCleanup(PinCatalog.invalidate)
+
+    def test_entries(self):
+        entry, = PinCatalog.entries(self.pins_dir)
+        self.assertEqual(entry['name'], 'grid.glb')
+        self.assertEqual(entry['triangles'], 800)
+        self.assertEqual(entry['sha256'], file_sha256(os.path.join(self.pins_dir, 'grid.glb')))
+        for axis, (low, high) in enumerate(zip(entry['bounds']['min'], entry['bounds']['max'])):
+            self.assertAlmostEqual(low, [0, -0.1, 0][axis], places=2)
+            self.assertAlmostEqual(high, [1, 0.1, 1][axis], places=2)
+        self.assertEqual(entry['variants'], [])
+
+    def test_scans_once_until_the_directory_changes(self):
+        with patch.object(PinCatalog, '_scan', wraps=PinCatalog._scan) as scan:
+            PinCatalog.entries(self.pins_dir)
+            PinCatalog.entries(self.pins_dir)
+            self.assertEqual(scan.call_count, 1)
+
+            with patch.object(PinCatalog, 'RECHECK_SECONDS', 0):
+                PinCatalog.entries(self.pins_dir)
+                self.assertEqual(scan.call_count, 1)
+
+                with open(os.path.join(self.pins_dir, 'copy.glb'), 'wb') as handle:
+                    handle.write(_grid_glb(4))
+                os.utime(self.pins_dir, ns=(0, os.stat(self.pins_dir).st_mtime_ns + 1))
+                names = [entry['name'] for entry in PinCatalog.entries(self.pins_dir)]
+        self.assertEqual(scan.call_count, 2)
+        self.assertEqual(names, ['copy.glb', 'grid.glb'])
+
+    def test_optimizing_refreshes_the_variants(self):
+        PinCatalog.entries(self.pins_dir)
+        build_manifest(self.pins_dir, ratios=(1.0,))
+        with patch.object(PinCatalog, 'RECHECK_SECONDS', 0):
+            entry, = PinCatalog.entries(self.pins_dir)
+        self.assertEqual(entry['variants'][0]['file'], 'optimized/grid.lod0.glb')
+
+    def test_api_and_mestre_use_the_catalog(self):
+        Guild.objects.create(name="Guild")
+        with patch('guilda_manager.pins.PINS_DIR', self.pins_dir):
+            response = self.client.get(reverse('pin-asset-list'))
+            self.assertEqual([entry['name'] for entry in response.json()], ['grid.glb'])
+
+            with patch('os.listdir') as listdir:
+                response = self.client.get(reverse('mestre'))
+            listdir.assert_not_called()
+        self.assertEqual(response.context['available_pins'][0]['name'], 'grid.glb')
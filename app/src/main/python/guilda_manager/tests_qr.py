@@ -0,0 +1,82 @@
+import io
+import os
+import shutil
+import tempfile
+from django.test import TestCase, override_settings
+from PIL import Image
+from .models import Guild
+from .qr import BORDER, QRCode, QRCache, alignment_positions, rs_divisor, rs_remainder
+
+
+class EncoderTests(TestCase):
+    def test_reed_solomon(self):
+        # ISO/IEC 18004 example: "HELLO WORLD", version 1-M
+        data = [32, 91, 11, 120, 209, 114, 220, 77, 67, 64, 236, 17, 236, 17, 236, 17]
+        self.assertEqual(rs_remainder(data, rs_divisor(10)), [196, 35, 39, 119, 235, 215, 231, 226, 93, 23])
+
+    def test_format_and_version_bits(self):
+        code = QRCode('HELLO WORLD', 'M')
+        self.assertEqual(code.version, 1)
+        self.assertEqual(format(code.format_bits(0), '015b'), '101010000010010')
+        self.assertEqual(format(QRCode('HELLO WORLD', 'L').format_bits(4), '015b'), '110011000101111')
+
+        code = QRCode('x' * 120)
+        self.assertEqual(code.version, 7)
+        self.assertEqual(format(code.version_bits(), '018b'), '000111110010010100')
+        self.assertEqual(alignment_positions(7), [6, 22, 38])
+
+    def test_guild_code_matrix(self):
+        code = QRCode('ABC-1234')
+        self.assertEqual((code.version, code.size), (1, 21))
+        # Finder patterns and the dark module
+        for x, y in ((0, 0), (14, 0), (0, 14)):
+            self.assertTrue(all(code.modules[y][x + i] for i in range(7)))
+            self.assertFalse(code.modules[y + 1][x + 1])
+            self.assertTrue(code.modules[y + 3][x + 3])
+        self.assertTrue(code.modules[13][8])
+        # Byte mode when the text is not alphanumeric
+        self.assertEqual(QRCode('guilda ruum').version, 1)
+
+
+class GuildQRViewTests(TestCase):
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        settings_override = override_settings(QR_CACHE_DIR=cache_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.cache_dir = cache_dir
+        QRCache.clear_memory()
+        self.addCleanup(QRCache.clear_memory)
+        self.guild = Guild.objects.create(name="Guilda QR", code='ABC-1234')
+
+    def test_qr_code_url_is_local(self):
+        self.assertEqual(self.guild.qr_code_url, '/share-guild/qr/ABC-1234.svg')
+
+    def test_svg_rendered_once_and_revalidated(self):
+        response = self.client.get(self.guild.qr_code_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+        self.assertTrue(response.content.startswith(b'<svg '))
+        self.assertIn(b'viewBox="0 0 29 29"', response.content)
+        etag = response['ETag']
+        self.assertEqual(os.listdir(self.cache_dir), [etag.strip('"') + '.svg'])
+
+        response = self.client.get(self.guild.qr_code_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        # From the disk once the memory is gone
+        QRCache.clear_memory()
+        self.assertEqual(self.client.get(self.guild.qr_code_url)['ETag'], etag)
+
+    def test_png(self):
+        response = self.client.get('/share-guild/qr/ABC-1234.png')
+        self.assertEqual(response['Content-Type'], 'image/png')
+        with Image.open(io.BytesIO(response.content)) as image:
+            self.assertEqual(image.size, ((21 + 2 * BORDER) * 8,) * 2)
+            self.assertEqual(image.convert('L').getpixel((BORDER * 8, BORDER * 8)), 0)
+
+    def test_unknown_code_or_format(self):
+        self.assertEqual(self.client.get('/share-guild/qr/XYZ-0000.svg').status_code, 404)
+        self.assertEqual(self.client.get('/share-guild/qr/ABC-1234.gif').status_code, 404)
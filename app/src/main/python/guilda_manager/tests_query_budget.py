@@ -0,0 +1,171 @@
+import shutil
+import tempfile
+from decimal import Decimal
+from django.test import TestCase, override_settings
+from django.urls import URLPattern, URLResolver, reverse
+from django.utils import timezone
+from config import urls as project_urls
+from .models import (
+    Guild, Building, GuildBuilding, Member, Quest, Squad, SquadRank, Dispatch,
+    Monster, Map, Hexagon, Pin, Upgrade, GuildUpgrade,
+)
+
+
+# Maximum number of queries of a GET on each URL of config/urls.py (by URL
+# name), measured by QueryMetricsMiddleware with the fixtures below. A view
+# whose queries grow with the data blows its budget.
+BUDGETS = {
+    'root': 1,
+    'landing': 0,
+    'entry_portal': 1,
+    'create_guild': 0,
+    'sync_guild': 0,
+    'share_guild': 1,
+    'guild_qr': 1,
+    'sede': 3,
+    'missoes': 3,  # + seal layouts of the bulk-created quests, first render only
+    'construcoes': 0,
+    'construcoes_projetos': 3,
+    'construcoes_infra': 3,
+    'construcoes_upgrades': 6,
+    'mestre': 11,
+    'mestre_action': 0,  # POST only: 405
+    'mapa': 2,
+    'bestiario': 0,
+    'bestiario_list': 5,
+    'bestiario_rememoracao': 1,
+    'bestiario_create': 0,
+    'bestiario_edit': 1,
+    'admin:index': 0,
+    'api-root': 0,
+    'guild-list': 2,
+    'guild-detail': 2,
+    'quest-list': 2,
+    'quest-detail': 2,
+    'dispatch-list': 1,
+    'dispatch-detail': 1,
+    'pin-asset-list': 0,
+    'hex-region-list': 3,  # first map, region ETag, hexes
+    'hex-region-path': 3,  # first map, map, blocked hexes (first call only)
+}
+
+
+@override_settings(QUERY_METRICS=True)
+class QueryBudgetTests(TestCase):
+    QUESTS = 1000
+    MEMBERS = 500
+    BUILDINGS = 50
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guild = Guild.objects.create(name="Budget Guild", funds=Decimal('1000.00'), level=5)
+        buildings = Building.objects.bulk_create([
+            Building(name=f"Building {i}", slug=f"building-{i}", description="Desc", cost=100 + i)
+            for i in range(cls.BUILDINGS)
+        ])
+        GuildBuilding.objects.bulk_create([
+            GuildBuilding(guild=cls.guild, building=building) for building in buildings[:cls.BUILDINGS // 2]
+        ])
+        upgrades = Upgrade.objects.bulk_create([
+            Upgrade(name=f"Upgrade {i}", description="Desc", cost=10, required_building=buildings[i])
+            for i in range(20)
+        ])
+        GuildUpgrade.objects.bulk_create([GuildUpgrade(guild=cls.guild, upgrade=upgrade) for upgrade in upgrades[:5]])
+
+        rank = SquadRank.objects.create(name="F", order=0)
+        squads = [Squad.objects.create(name=f"Squad {i}", guild=cls.guild, rank=rank) for i in range(10)]
+        Member.objects.bulk_create([
+            Member(name=f"Member {i}", guild=cls.guild, squad=squads[i % 10] if i < 100 else None)
+            for i in range(cls.MEMBERS)
+        ])
+
+        ranks = Quest.Rank.values
+        statuses = [Quest.Status.OPEN, Quest.Status.COMPLETED]
+        cls.quests = Quest.objects.bulk_create([
+            Quest(
+                title=f"Quest {i}", description="Desc", rank=ranks[i % len(ranks)], guild=cls.guild,
+                status=statuses[i % 2], gxp_reward=5,
+            )
+            for i in range(cls.QUESTS)
+        ])
+        Dispatch.objects.bulk_create([
+            Dispatch(squad=squads[i % 10], rank='F', target_date=timezone.now()) for i in range(50)
+        ] + [
+            Dispatch(mission=cls.quests[i], npc_count=2, target_date=timezone.now()) for i in range(50)
+        ])
+
+        cls.monster = Monster.objects.bulk_create([
+            Monster(name=f"Monster {i}", slug=f"monster-{i}", size="Medium", description="Desc",
+                    monster_type="Beast", challenge_level=Decimal('1.0'))
+            for i in range(50)
+        ])[0]
+
+        pins = Pin.objects.bulk_create([Pin(name=f"Pin {i}", glb_path=f"pin{i}.glb") for i in range(10)])
+        game_map = Map.objects.create(name="Mapa")
+        Hexagon.objects.bulk_create([
+            Hexagon(map=game_map, q=q, r=r, title=f"{q},{r}", pin=pins[(q + r) % 10] if q % 3 == 0 else None)
+            for q in range(-7, 8) for r in range(-7, 8)
+        ])
+
+    def setUp(self):
+        # The QR codes rendered by guild_qr stay out of MEDIA_ROOT
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        settings_override = override_settings(QR_CACHE_DIR=cache_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def url_for(self, name):
+        kwargs = {}
+        if name == 'bestiario_edit':
+            kwargs = {'slug': self.monster.slug}
+        elif name == 'guild-detail':
+            kwargs = {'pk': self.guild.pk}
+        elif name == 'quest-detail':
+            kwargs = {'pk': self.quests[0].pk}
+        elif name == 'dispatch-detail':
+            kwargs = {'pk': Dispatch.objects.values_list('pk', flat=True).first()}
+        elif name == 'mestre_action':
+            kwargs = {'action': 'config'}
+        elif name == 'guild_qr':
+            kwargs = {'code': self.guild.code, 'fmt': 'svg'}
+        url = reverse(name, kwargs=kwargs)
+        if name == 'hex-region-list':
+            url += '?q_min=-8&q_max=8&r_min=-8&r_max=8'
+        elif name == 'hex-region-path':
+            url += '?from_q=-4&from_r=0&to_q=4&to_r=0'
+        return url
+
+    def test_every_url_has_a_budget(self):
+        self.assertEqual(set(_budgeted_url_names()) - set(BUDGETS), set())
+
+    def test_query_budgets(self):
+        for name, budget in BUDGETS.items():
+            with self.subTest(url=name):
+                response = self.client.get(self.url_for(name))
+                self.assertLess(response.status_code, 500)
+                self.assertLessEqual(int(response['X-Query-Count']), budget)
+
+
+def _budgeted_url_names():
+    """Names of every GET-able URL of config/urls.py (API actions are POST)."""
+    names = []
+    for pattern in project_urls.urlpatterns:
+        if isinstance(pattern, URLPattern) and pattern.name:
+            names.append(pattern.name)
+        elif isinstance(pattern, URLResolver):
+            if pattern.namespace == 'admin':
+                names.append('admin:index')
+                continue
+            for name in _names(pattern.url_patterns):
+                if name == 'api-root' or name.endswith(('-list', '-detail')):
+                    names.append(name)
+    return names
+
+
+def _names(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _names(pattern.url_patterns)
+        elif pattern.name:
+            yield pattern.name
@@ -0,0 +1,62 @@
+import re
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from .hexmap import Region
+from .models import Building, Dispatch, Guild, GuildUpgrade, Hexagon, Map, Member, Quest, Upgrade
+from .resolution import DispatchResolver
+
+# A table read without an index search: "SCAN <table>", optionally walking a
+# whole index ("USING INDEX ..."). "SEARCH <table> USING ..." is fine.
+FULL_SCAN_RE = re.compile(r'^SCAN (guilda_manager_\w+)')
+
+
+class HotQueryPlanTests(TestCase):
+    """EXPLAIN QUERY PLAN of the hot filter paths: none may scan its table."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guild = Guild.objects.create(name="Plan Guild")
+        cls.building = Building.objects.create(name="Arsenal", slug="arsenal", description="", cost=100)
+        cls.upgrade = Upgrade.objects.create(name="Forja", description="", cost=10)
+        cls.map = Map.objects.create(name="Reino")
+
+    def plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertNoFullScan(self, queryset):
+        plan = self.plan(queryset)
+        scans = [detail for detail in plan if FULL_SCAN_RE.match(detail)]
+        self.assertEqual(scans, [], '\n'.join(plan))
+
+    def test_hot_queries(self):
+        now = timezone.now()
+        hot_queries = {
+            'pending dispatches (mestre_view)':
+                Dispatch.objects.filter(status=Dispatch.Status.PENDING).order_by('target_date'),
+            'due dispatches': DispatchResolver.due_dispatches(now),
+            'open quests (mestre_view)':
+                Quest.objects.filter(status=Quest.Status.OPEN).order_by('rank', 'title'),
+            'completed quests by rank (mestre_view)':
+                Quest.objects.filter(status=Quest.Status.COMPLETED).values('rank').order_by('rank'),
+            'guild quests by status': self.guild.quests.filter(status=Quest.Status.OPEN),
+            'active members': self.guild.members.filter(status=Member.Status.ACTIVE),
+            'building check': self.guild.guild_buildings.filter(building=self.building),
+            'upgrade check': GuildUpgrade.objects.filter(guild=self.guild, upgrade=self.upgrade),
+            # hex-regions: the (map, q, r) unique index
+            'hex range': Region(-8, 8, -8, 8).filter(Hexagon.objects.filter(map=self.map)),
+            'hex radius': Region.around(0, 0, 5).filter(Hexagon.objects.filter(map=self.map)),
+        }
+        for name, queryset in hot_queries.items():
+            with self.subTest(query=name):
+                self.assertNoFullScan(queryset)
+
+    def test_pending_dispatches_need_no_sort(self):
+        plan = self.plan(Dispatch.objects.filter(status=Dispatch.Status.PENDING).order_by('target_date'))
+        self.assertFalse(any('TEMP B-TREE' in detail for detail in plan), plan)
+
+    def test_detects_a_full_scan(self):
+        self.assertTrue(any(FULL_SCAN_RE.match(detail) for detail in self.plan(Quest.objects.filter(description='x'))))
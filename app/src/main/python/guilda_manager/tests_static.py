@@ -0,0 +1,148 @@
+import os
+import random
+import shutil
+import tempfile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.templatetags.static import static
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+from .models import Quest
+from .seals import CSS_PATH, SEALS_DIR, atlas_name, build_atlas
+from .static_images import MIN_BYTES, convert_images, image_variants
+from .threejs import (
+    BUNDLE_PATH, CDN_URL, DRACO_CDN_URL, DRACO_DIR, DRACO_FILES, VendorError, copy_draco, draco_decoder_path,
+    entry_source, import_map, scan_templates,
+)
+
+
+class StaticImageTests(SimpleTestCase):
+    def test_convert_images(self):
+        static_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_dir)
+        rng = random.Random(3)
+        noise = Image.frombytes('RGB', (320, 320), bytes(rng.randrange(256) for _ in range(320 * 320 * 3)))
+        noise.save(os.path.join(static_dir, 'big.png'))
+        Image.new('RGB', (8, 8)).save(os.path.join(static_dir, 'small.png'))
+        self.assertGreater(os.path.getsize(os.path.join(static_dir, 'big.png')), MIN_BYTES)
+
+        self.assertEqual(convert_images(static_dir), 1)
+        with Image.open(os.path.join(static_dir, 'big.webp')) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (320, 320)))
+        self.assertFalse(os.path.exists(os.path.join(static_dir, 'small.webp')))
+        # Up to date: nothing to do
+        self.assertEqual(convert_images(static_dir), 0)
+
+    def test_picture_sources(self):
+        self.assertEqual(image_variants('guilda_manager/images/SELOS/S.png'),
+                         [('image/webp', 'guilda_manager/images/SELOS/S.webp')])
+        html = Template(
+            "{% load static_images %}{% image_sources 'guilda_manager/images/SELOS/S.png' %}"
+            "|{% image_url 'guilda_manager/images/waxseal.png' %}|{% image_url 'guilda_manager/images/logo_gdr.svg' %}"
+        ).render(Context())
+        self.assertEqual(html, (
+            '<source type="image/webp" srcset="/static/guilda_manager/images/SELOS/S.webp">'
+            '|/static/guilda_manager/images/waxseal.webp|/static/guilda_manager/images/logo_gdr.svg'
+        ))
+
+
+class SealAtlasTests(SimpleTestCase):
+    def test_build_atlas(self):
+        static_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_dir)
+        os.makedirs(os.path.join(static_dir, SEALS_DIR))
+        for i, rank in enumerate(Quest.Rank.values):
+            Image.new('RGBA', (300, 300), (i * 30, 0, 0, 255)).save(os.path.join(static_dir, SEALS_DIR, f"{rank}.png"))
+
+        build_atlas(static_dir)
+
+        with Image.open(os.path.join(static_dir, atlas_name(2))) as atlas:
+            self.assertEqual(atlas.size, (128 * 7, 128))
+            # F first, S last, in Quest.Rank order
+            self.assertLess(atlas.getpixel((64, 64))[0], 10)
+            self.assertGreater(atlas.getpixel((6 * 128 + 64, 64))[0], 170)
+        with open(os.path.join(static_dir, CSS_PATH)) as handle:
+            css = handle.read()
+        self.assertIn('url("../images/SELOS/atlas-2x.webp") 2x', css)
+        self.assertIn('.seal-sprite--S { background-position: -384px 0; }', css)
+
+
+class ThreeVendorTests(SimpleTestCase):
+    def test_scan_templates(self):
+        core, addons = scan_templates()
+        self.assertTrue({'Scene', 'WebGLRenderer', 'DataTexture', 'MOUSE'} <= core)
+        self.assertEqual(addons['three/addons/controls/MapControls.js'], {'MapControls'})
+        self.assertEqual(addons['three/addons/loaders/GLTFLoader.js'], {'GLTFLoader'})
+
+    def test_entry_exports_only_what_is_used(self):
+        three_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, three_dir)
+        os.makedirs(os.path.join(three_dir, 'examples', 'jsm', 'loaders'))
+        open(os.path.join(three_dir, 'examples', 'jsm', 'loaders', 'DRACOLoader.js'), 'w').close()
+
+        source = entry_source(three_dir, {'Scene', 'Mesh'}, {'three/addons/loaders/DracoLoader.js': {'DRACOLoader'}})
+        self.assertEqual(source, (
+            "export { Mesh, Scene } from 'three';\n"
+            "export { DRACOLoader } from 'three/examples/jsm/loaders/DRACOLoader.js';\n"
+        ))
+        with self.assertRaises(VendorError):
+            entry_source(three_dir, {'Scene'}, {'three/addons/controls/MapControls.js': {'MapControls'}})
+
+    def test_import_map(self):
+        self.assertEqual(import_map(None)['imports']['three'], f"{CDN_URL}/build/three.module.js")
+        imports = import_map({'bundle': BUNDLE_PATH, 'specifiers': ['three', 'three/addons/loaders/GLTFLoader.js']})['imports']
+        self.assertEqual(set(imports.values()), {f"/static/{BUNDLE_PATH}"})
+        self.assertIn('three/addons/loaders/GLTFLoader.js', imports)
+
+        html = Template("{% load threejs %}{% three_importmap %}").render(Context())
+        self.assertTrue(html.startswith('<script type="importmap">'))
+        self.assertIn('"three": ', html)
+
+
+    def test_draco_decoder_is_vendored_with_the_bundle(self):
+        three_dir, static_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, three_dir)
+        self.addCleanup(shutil.rmtree, static_dir)
+        with self.assertRaises(VendorError):
+            copy_draco(three_dir, static_dir)
+
+        decoders = os.path.join(three_dir, 'examples', 'jsm', 'libs', 'draco', 'gltf')
+        os.makedirs(decoders)
+        for name in DRACO_FILES:
+            with open(os.path.join(decoders, name), 'w') as handle:
+                handle.write(name)
+        copy_draco(three_dir, static_dir)
+        self.assertEqual(sorted(os.listdir(os.path.join(static_dir, DRACO_DIR))), sorted(DRACO_FILES))
+
+        self.assertEqual(draco_decoder_path(None), DRACO_CDN_URL)
+        self.assertEqual(draco_decoder_path({'bundle': BUNDLE_PATH}), DRACO_CDN_URL)
+        self.assertEqual(draco_decoder_path({'bundle': BUNDLE_PATH, 'draco': DRACO_DIR}), f"/static/{DRACO_DIR}")
+
+
+class HashedStaticFilesTests(SimpleTestCase):
+    def test_collected_files_are_hashed_compressed_and_immutable(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        with override_settings(STATIC_ROOT=static_root):
+            call_command('collectstatic', interactive=False, verbosity=0)
+
+            url = static('guilda_manager/images/party_token.svg')
+            self.assertRegex(url, r'^/static/guilda_manager/images/party_token\.[0-9a-f]{12}\.svg$')
+            self.assertTrue(os.path.exists(os.path.join(static_root, url[len('/static/'):] + '.gz')))
+
+            # The seal atlas CSS points to the hashed atlases
+            with open(os.path.join(static_root, static(CSS_PATH)[len('/static/'):])) as handle:
+                self.assertRegex(handle.read(), r'atlas-2x\.[0-9a-f]{12}\.webp"\) 2x')
+
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertIn('immutable', response['Cache-Control'])
+
+            # Unhashed names are still served (by the finders), revalidated
+            response = self.client.get('/static/guilda_manager/images/party_token.svg')
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('immutable', response['Cache-Control'])
+
+        # Without a manifest the names are left as they are
+        self.assertEqual(static('guilda_manager/images/party_token.svg'), '/static/guilda_manager/images/party_token.svg')
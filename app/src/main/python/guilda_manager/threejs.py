@@ -0,0 +1,202 @@
+"""
+Three.js, vendored.
+
+The 3D pages (landing, mapa, upgrades) import ``three`` and its addons
+through an import map. `manage.py vendor_three` bundles, with esbuild, only
+what those templates use into one minified ES module,
+static/guilda_manager/vendor/three.bundle.min.js: the ``THREE.<name>`` they
+reference and the named imports of each ``three/addons/...`` module, scanned
+from the templates, so the rest of the library is tree-shaken away.
+three.json next to it lists the specifiers the bundle stands for.
+
+{% three_importmap %} (templatetags/threejs.py) maps ``three`` and every one
+of those specifiers to the bundle, served by WhiteNoise like any static file
+(hashed and immutable once build_static has run): the 3D pages load one
+local request instead of a module graph from unpkg, and work offline. Until
+the bundle is built the import map points to unpkg, as before.
+
+The landing model is Draco-compressed: DRACOLoader fetches its WebAssembly
+decoder at run time, from the decoder path. vendor_three copies the glTF
+decoder of the same package into static/guilda_manager/vendor/draco/, and
+{% three_draco_path %} points DRACOLoader there; gstatic until then.
+
+Neither is committed: they are built by vendor_three, which needs Node.js
+and the npm registry, before build_static (see README.md).
+"""
+import functools
+import json
+import os
+import re
+import shutil
+import subprocess
+import tarfile
+import tempfile
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+
+THREE_VERSION = '0.160.0'
+ESBUILD_VERSION = '0.19.12'
+CDN_URL = f"https://unpkg.com/three@{THREE_VERSION}"
+
+APP_DIR = os.path.join(settings.BASE_DIR, 'guilda_manager')
+STATIC_DIR = os.path.join(APP_DIR, 'static')
+TEMPLATES_DIR = os.path.join(APP_DIR, 'templates')
+BUNDLE_PATH = 'guilda_manager/vendor/three.bundle.min.js'
+MANIFEST_PATH = 'guilda_manager/vendor/three.json'
+# Loaded by name from one directory (decoder path + file name): not hashed
+DRACO_DIR = 'guilda_manager/vendor/draco/'
+DRACO_FILES = ('draco_wasm_wrapper.js', 'draco_decoder.wasm')
+DRACO_CDN_URL = 'https://www.gstatic.com/draco/versioned/decoders/1.5.7/'
+
+ADDONS_PREFIX = 'three/addons/'
+CORE_NAME_RE = re.compile(r'\bTHREE\.([A-Za-z_$][\w$]*)')
+ADDON_IMPORT_RE = re.compile(r"""import\s*\{([^}]*)\}\s*from\s*['"](three/addons/[^'"]+)['"]""")
+
+
+class VendorError(RuntimeError):
+    """The bundle could not be built (package or esbuild missing, unknown export)."""
+
+
+def scan_templates(templates_dir=TEMPLATES_DIR):
+    """({core names}, {addon specifier: {names}}) used by the templates."""
+    core, addons = set(), {}
+    for root, _, names in os.walk(templates_dir):
+        for name in sorted(names):
+            if not name.endswith('.html'):
+                continue
+            with open(os.path.join(root, name), encoding='utf-8') as handle:
+                text = handle.read()
+            core.update(CORE_NAME_RE.findall(text))
+            for imported, specifier in ADDON_IMPORT_RE.findall(text):
+                addons.setdefault(specifier, set()).update(
+                    part.split(' as ')[0].strip() for part in imported.split(',') if part.strip()
+                )
+    return core, addons
+
+
+def addon_file(three_dir, specifier):
+    """
+    Path of addon ``specifier`` in the package (examples/jsm), matched
+    case-insensitively when there is no exact match: the browser resolves
+    the import map by specifier, but the file must exist for esbuild.
+    """
+    path = os.path.join(three_dir, 'examples', 'jsm')
+    for part in specifier[len(ADDONS_PREFIX):].split('/'):
+        entries = os.listdir(path) if os.path.isdir(path) else []
+        match = part if part in entries else next((e for e in entries if e.lower() == part.lower()), None)
+        if match is None:
+            raise VendorError(f"{specifier} is not in the three package at {three_dir}")
+        path = os.path.join(path, match)
+    return path
+
+
+def entry_source(three_dir, core, addons):
+    """The module esbuild bundles: re-exports of exactly the names used."""
+    lines = [f"export {{ {', '.join(sorted(core))} }} from 'three';"]
+    for specifier in sorted(addons):
+        path = os.path.relpath(addon_file(three_dir, specifier), three_dir).replace(os.sep, '/')
+        lines.append(f"export {{ {', '.join(sorted(addons[specifier]))} }} from 'three/{path}';")
+    return '\n'.join(lines) + '\n'
+
+
+def run(command, cwd):
+    try:
+        return subprocess.run(command, cwd=cwd, check=True, capture_output=True, text=True).stdout
+    except FileNotFoundError:
+        raise VendorError(f"{command[0]} was not found: Node.js (npm/npx) is needed to build the bundle")
+    except subprocess.CalledProcessError as error:
+        output = error.stderr.strip() or error.stdout.strip()
+        raise VendorError(f"{' '.join(command[:2])} failed (exit {error.returncode})" + (f": {output}" if output else ''))
+
+
+def fetch_package(workdir, version=THREE_VERSION):
+    """Downloads three@``version`` with `npm pack` and returns its directory."""
+    tarball = run(['npm', 'pack', f"three@{version}", '--pack-destination', workdir, '--silent'], workdir).strip()
+    with tarfile.open(os.path.join(workdir, tarball.splitlines()[-1])) as archive:
+        archive.extractall(workdir, filter='data')
+    return os.path.join(workdir, 'package')
+
+
+def build_bundle(three_dir=None, esbuild=None, static_dir=STATIC_DIR, templates_dir=TEMPLATES_DIR):
+    """
+    Builds the bundle and its manifest into ``static_dir`` and returns the
+    manifest. ``three_dir`` is an unpacked ``three`` npm package (downloaded
+    with npm when None); ``esbuild`` the esbuild command (npx by default).
+    """
+    core, addons = scan_templates(templates_dir)
+    if not core and not addons:
+        raise VendorError("No template uses three")
+
+    output = os.path.join(static_dir, BUNDLE_PATH)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix='guilda-three-') as workdir:
+        three_dir = os.path.abspath(three_dir or fetch_package(workdir))
+        with open(os.path.join(three_dir, 'package.json')) as handle:
+            version = json.load(handle)['version']
+
+        # Bare 'three' imports (ours and the addons') resolve to the package
+        os.makedirs(os.path.join(workdir, 'node_modules'))
+        os.symlink(three_dir, os.path.join(workdir, 'node_modules', 'three'))
+        entry = os.path.join(workdir, 'entry.js')
+        with open(entry, 'w') as handle:
+            handle.write(entry_source(three_dir, core, addons))
+
+        command = esbuild.split() if esbuild else ['npx', '--yes', f"esbuild@{ESBUILD_VERSION}"]
+        run(command + [
+            entry, '--bundle', '--minify', '--format=esm', '--target=es2020',
+            '--legal-comments=eof', f"--outfile={output}",
+        ], workdir)
+
+        draco = 'DRACOLoader' in set().union(*addons.values()) and copy_draco(three_dir, static_dir)
+
+    manifest = {
+        'version': version,
+        'bundle': BUNDLE_PATH,
+        'specifiers': ['three'] + sorted(addons),
+        'exports': sorted(core.union(*addons.values())),
+        'bytes': os.path.getsize(output),
+    }
+    if draco:
+        manifest['draco'] = DRACO_DIR
+    with open(os.path.join(static_dir, MANIFEST_PATH), 'w') as handle:
+        json.dump(manifest, handle, indent=2)
+        handle.write('\n')
+    return manifest
+
+
+def copy_draco(three_dir, static_dir=STATIC_DIR):
+    """Copies the package's glTF Draco decoder (examples/jsm/libs/draco/gltf) to DRACO_DIR."""
+    source = os.path.join(three_dir, 'examples', 'jsm', 'libs', 'draco', 'gltf')
+    target = os.path.join(static_dir, DRACO_DIR)
+    os.makedirs(target, exist_ok=True)
+    for name in DRACO_FILES:
+        if not os.path.exists(os.path.join(source, name)):
+            raise VendorError(f"{name} is not in the three package at {three_dir}")
+        shutil.copyfile(os.path.join(source, name), os.path.join(target, name))
+    return True
+
+
+@functools.lru_cache(maxsize=1)
+def vendored_manifest():
+    """three.json of the built bundle, or None (read once per process)."""
+    path = finders.find(MANIFEST_PATH)
+    if not path or not finders.find(BUNDLE_PATH):
+        return None
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def import_map(manifest):
+    """The import map of the 3D pages: the bundle when built, unpkg otherwise."""
+    if manifest is None:
+        return {'imports': {'three': f"{CDN_URL}/build/three.module.js", ADDONS_PREFIX: f"{CDN_URL}/examples/jsm/"}}
+    url = static(manifest['bundle'])
+    return {'imports': {specifier: url for specifier in manifest['specifiers']}}
+
+
+def draco_decoder_path(manifest):
+    """DRACOLoader's decoder path: the vendored decoder when built, gstatic otherwise."""
+    if manifest is None or 'draco' not in manifest:
+        return DRACO_CDN_URL
+    return settings.STATIC_URL + manifest['draco']
@@ -1,12 +1,15 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import GuildViewSet, QuestViewSet
+from .api import GuildViewSet, QuestViewSet, DispatchViewSet, PinAssetViewSet, HexRegionViewSet
 from django.conf import settings
 from django.conf.urls.static import static
 
 router = DefaultRouter()
 router.register(r'guilds', GuildViewSet, basename='guild')
 router.register(r'quests', QuestViewSet, basename='quest')
+router.register(r'dispatches', DispatchViewSet, basename='dispatch')
+router.register(r'pin-assets', PinAssetViewSet, basename='pin-asset')
+router.register(r'hex-regions', HexRegionViewSet, basename='hex-region')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,109 +1,23 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.http import Http404, HttpResponse, JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_POST
 from django.core import signing
 from django.utils import timezone
+from django.db.models import Case, Q, When
+from django.utils.http import parse_etags
 from django.utils.text import slugify
-from decimal import Decimal
-from rest_framework import viewsets, status, decorators
-from rest_framework.response import Response
 from django.templatetags.static import static
-from .models import Guild, Quest, Member, Monster, Squad, Dispatch, SquadRank, Building, Map, Hexagon, Pin, Upgrade, GuildUpgrade
+from .models import Guild, Quest, Monster, Squad, Dispatch, SquadRank, Building, Map, Pin, Upgrade, GuildUpgrade
 from .forms import MonsterForm
-from .serializers import GuildDashboardSerializer, BuildConstructionSerializer, QuestSerializer, MemberSerializer, UpgradePurchaseSerializer
-import hashlib
-import random
-import os
-from django.conf import settings
+from .pins import PinCatalog
+from .map_images import background_for
+from .qr import RENDERERS, QRCache
+from .mestre_actions import MESTRE_MAP_SIZE, run_action
+from .services import DiceService
+from config import lazy_urls
 from types import SimpleNamespace
 
-class GuildViewSet(viewsets.ModelViewSet):
-    queryset = Guild.objects.all()
-    serializer_class = GuildDashboardSerializer
-
-    @decorators.action(detail=True, methods=['post'])
-    def construct_building(self, request, pk=None):
-        """
-        Handles the purchase of a building.
-        Expects 'building_slug' in the request data.
-        """
-        guild = self.get_object()
-        serializer = BuildConstructionSerializer(data=request.data, context={'guild': guild})
-
-        if serializer.is_valid():
-            serializer.save()
-            # Return the updated guild dashboard
-            guild.refresh_from_db()
-            dashboard_serializer = self.get_serializer(guild)
-            return Response(dashboard_serializer.data, status=status.HTTP_201_CREATED)
-
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-    @decorators.action(detail=True, methods=['post'])
-    def purchase_upgrade(self, request, pk=None):
-        """
-        Handles the purchase of an upgrade.
-        Expects 'upgrade_id' in the request data.
-        """
-        guild = self.get_object()
-        serializer = UpgradePurchaseSerializer(data=request.data, context={'guild': guild})
-
-        if serializer.is_valid():
-            serializer.save()
-            return Response({"success": True}, status=status.HTTP_201_CREATED)
-
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-class QuestViewSet(viewsets.ModelViewSet):
-    queryset = Quest.objects.all()
-    serializer_class = QuestSerializer
-
-    @decorators.action(detail=True, methods=['post'])
-    def delegate(self, request, pk=None):
-        quest = self.get_object()
-
-        # Check if already delegated or completed
-        if quest.status not in [Quest.Status.OPEN, Quest.Status.IN_PROGRESS]:
-             return Response({"error": "Quest cannot be delegated in its current status."}, status=status.HTTP_400_BAD_REQUEST)
-
-        member_ids = request.data.get('assigned_members', [])
-        if not member_ids:
-            return Response({"error": "No members assigned."}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Verify members exist and belong to the guild
-        # Filter by guild to ensure they belong to the same guild as the quest
-        members = Member.objects.filter(id__in=member_ids, guild=quest.guild)
-
-        # Note: We don't strict check len(members) == len(member_ids) because duplications or invalid IDs might be passed.
-        # But for safety, we should ensure at least one valid member.
-        if not members.exists():
-             return Response({"error": "Invalid members provided."}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Assign members
-        quest.assigned_members.set(members)
-        quest.status = Quest.Status.DELEGATED
-        quest.save()
-
-        # Resolve logic
-        result = quest.resolve_delegation()
-
-        # Serialize updated quest
-        serializer = self.get_serializer(quest)
-        return Response({
-            "quest": serializer.data,
-            "delegation_result": result
-        }, status=status.HTTP_200_OK)
-
-    @decorators.action(detail=True, methods=['patch'])
-    def complete(self, request, pk=None):
-        quest = self.get_object()
-
-        if quest.status == Quest.Status.COMPLETED:
-             return Response({"error": "Quest already completed."}, status=status.HTTP_400_BAD_REQUEST)
-
-        quest.complete_quest()
-
-        serializer = self.get_serializer(quest)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-
 def root_routing_view(request):
     if Guild.objects.exists():
         return redirect('sede')
@@ -163,6 +77,17 @@ def share_guild_view(request):
         return redirect('entry_portal')
     return render(request, 'guilda_manager/share_guild.html', {'guild': guild})
 
+def guild_qr_view(request, code, fmt):
+    # Rendered once per code (guilda_manager/qr.py); the ETag never changes for a code
+    if fmt not in RENDERERS or not Guild.objects.filter(code=code).exists():
+        raise Http404
+    key, content_type, content = QRCache.get(code, fmt)
+    etag = f'"{key}"'
+    headers = {'ETag': etag, 'Cache-Control': 'max-age=86400'}
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        return HttpResponse(status=304, headers=headers)
+    return HttpResponse(content, content_type=content_type, headers=headers)
+
 def landing_view(request):
     return render(request, 'guilda_manager/landing.html')
 
@@ -174,15 +99,19 @@ def sede_view(request):
     max_xp = 100  # Placeholder as per design
     xp_percent = min((guild.gxp / max_xp) * 100, 100)
 
+    # Single aggregate query for every building-derived stat
+    stats = guild.stats
+
     members_count = guild.members.count()
-    members_max = guild.max_member_slots
+    members_max = stats['max_member_slots']
     members_percent = min((members_count / members_max) * 100, 100) if members_max > 0 else 0
 
-    constructions_count = guild.guild_buildings.count()
-    constructions_max = guild.base_stats['base_building_slots']
+    constructions_count = stats['building_count']
+    constructions_max = stats['base_stats']['base_building_slots']
     constructions_percent = min((constructions_count / constructions_max) * 100, 100) if constructions_max > 0 else 0
 
-    treasury_percent = min((guild.funds / guild.max_gold_cap) * 100, 100) if guild.max_gold_cap > 0 else 0
+    max_gold_cap = stats['max_gold_cap']
+    treasury_percent = min((guild.funds / max_gold_cap) * 100, 100) if max_gold_cap > 0 else 0
 
     context = {
         'guild': guild,
@@ -199,32 +128,46 @@ def sede_view(request):
 
     return render(request, 'guilda_manager/sede.html', context)
 
+# Missions board: contracts per carousel page, and how long settled
+# contracts stay on the board
+MISSOES_PAGE_SIZE = 20
+MISSOES_RECENT_DAYS = 7
+
 def missoes_view(request):
     guild = Guild.objects.first()
     if not guild:
         return redirect('entry_portal')
 
-    quests = Quest.objects.all()
-
-    for quest in quests:
-        # Create a deterministic seed based on quest ID and title
-        seed_str = f"{quest.id}-{quest.title}"
-        seed_hash = hashlib.md5(seed_str.encode('utf-8')).hexdigest()
-        seed_int = int(seed_hash, 16)
-
-        rng = random.Random(seed_int)
-
-        # Rotation: Random between -20 and 20 degrees
-        quest.seal_rotation = rng.randint(-20, 20)
-
-        # Position offsets: Random between -10 and 10 pixels
-        quest.seal_top_offset = rng.randint(-10, 10)
-        quest.seal_right_offset = rng.randint(-10, 10)
-
-        # Seal Image Path
-        quest.seal_image_path = f"guilda_manager/images/SELOS/{quest.rank}.png"
-
-    return render(request, 'guilda_manager/missoes.html', {'quests': quests, 'guild': guild})
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+
+    # Open contracts of the guild first, then the ones settled recently
+    recent = timezone.now() - timezone.timedelta(days=MISSOES_RECENT_DAYS)
+    board = guild.quests.filter(Q(status=Quest.Status.OPEN) | Q(updated_at__gte=recent)).order_by(
+        Case(When(status=Quest.Status.OPEN, then=0), default=1), '-created_at', '-id'
+    )
+
+    # One extra row tells whether there is a next page, without a COUNT
+    offset = (page - 1) * MISSOES_PAGE_SIZE
+    quests = list(board[offset:offset + MISSOES_PAGE_SIZE + 1])
+    has_next = len(quests) > MISSOES_PAGE_SIZE
+    quests = quests[:MISSOES_PAGE_SIZE]
+
+    # Seal layouts are stored on save; quests created in bulk (dispatch
+    # history) get theirs on their first render.
+    missing = [quest for quest in quests if quest.seal_rotation is None and quest.set_seal_layout()]
+    if missing:
+        Quest.objects.bulk_update(missing, Quest.SEAL_FIELDS)
+
+    return render(request, 'guilda_manager/missoes.html', {
+        'quests': quests,
+        'guild': guild,
+        'page': page,
+        'previous_page': page - 1 if page > 1 else None,
+        'next_page': page + 1 if has_next else None,
+    })
 
 def construcoes_view(request):
     return render(request, 'guilda_manager/construcoes_hub.html')
@@ -238,7 +181,7 @@ def construcoes_projetos_view(request):
     built_ids = guild.guild_buildings.values_list('building_id', flat=True)
 
     # Available buildings are those NOT built
-    buildings = Building.objects.exclude(id__in=built_ids).order_by('cost')
+    buildings = Building.objects.exclude(id__in=built_ids).prefetch_related('powers').order_by('cost')
 
     context = {
         'guild': guild,
@@ -252,7 +195,7 @@ def construcoes_infra_view(request):
     if not guild:
          return redirect('entry_portal')
 
-    constructions = guild.guild_buildings.select_related('building').all().order_by('-built_at')
+    constructions = guild.guild_buildings.select_related('building').prefetch_related('building__powers').order_by('-built_at')
 
     context = {
         'guild': guild,
@@ -467,6 +410,7 @@ def bestiario_rememoracao_view(request):
 
         elif action == 'roll':
             monster_id = request.POST.get('monster_id')
+            dice = DiceService.stream(Guild.objects.first())
             is_immediate = request.POST.get('is_immediate') == 'on'
             use_tonic = request.POST.get('use_tonic') == 'on'
 
@@ -501,18 +445,18 @@ def bestiario_rememoracao_view(request):
 
                 if not d20_roll_raw:
                     if use_tonic:
-                        r1 = random.randint(1, 20)
-                        r2 = random.randint(1, 20)
+                        r1 = dice.roll(20)
+                        r2 = dice.roll(20)
                         d20_roll = max(r1, r2)
                         tonic_rolls = [r1, r2]
                     else:
-                        d20_roll = random.randint(1, 20)
+                        d20_roll = dice.roll(20)
                     auto_rolled = True
                 else:
                     try:
                         d20_roll = int(d20_roll_raw)
                     except (ValueError, TypeError):
-                        d20_roll = random.randint(1, 20)
+                        d20_roll = dice.roll(20)
                     auto_rolled = False
 
                 total_check = d20_roll + bonus
@@ -533,7 +477,7 @@ def bestiario_rememoracao_view(request):
                     result_type = "Falha Grave"
 
             # Roll Memory Dice
-            dice_pool = [random.randint(1, 6) for _ in range(pool_size)]
+            dice_pool = dice.rolls(pool_size, 6)
             dice_pool.sort(reverse=True)
 
             # Analyze Dice
@@ -569,6 +513,8 @@ def bestiario_rememoracao_view(request):
                 'auto_rolled': auto_rolled,
                 'has_result': True,
                 'is_immediate': is_immediate,
+                'dice_seed': dice.seed,
+                'dice_cursor': dice.cursor,
             })
 
     return render(request, 'guilda_manager/bestiario_rememoracao.html', context)
@@ -663,332 +609,18 @@ def mestre_view(request):
     context = {}
 
     if request.method == 'POST':
-        action = request.POST.get('action')
-
-        if action == 'dispatch':
-            try:
-                npc_count = int(request.POST.get('npc_count', 0))
-                duration = int(request.POST.get('duration', 1))
-            except ValueError:
-                npc_count = 0
-                duration = 1
-
-            mission_id = request.POST.get('mission_id')
-
-            active_members_count = guild.members.filter(status=Member.Status.ACTIVE).count()
-
-            if npc_count <= 0:
-                 context['error_message'] = "Número de NPCs inválido."
-            elif npc_count > active_members_count:
-                 context['error_message'] = f"Número de NPCs excede o total de membros ativos ({active_members_count})."
-            elif not mission_id:
-                 context['error_message'] = "Missão não selecionada."
-            else:
-                mission = get_object_or_404(Quest, id=mission_id)
-
-                Dispatch.objects.create(
-                    mission=mission,
-                    npc_count=npc_count,
-                    duration_days=duration,
-                    status=Dispatch.Status.PENDING,
-                    rank=mission.rank
-                )
-
-                mission.status = Quest.Status.DELEGATED
-                mission.save()
-
-                context['success_message'] = f"Despacho iniciado para missão '{mission.title}' com {npc_count} NPCs!"
-
-        elif action == 'resolve':
-            dispatch_id = request.POST.get('dispatch_id')
-            dispatch = get_object_or_404(Dispatch, id=dispatch_id)
-
-            outcome = dispatch.resolve()
-
-            if outcome:
-                msg = f"Resultado: Rolagem {outcome['roll']}."
-                if outcome['deaths'] > 0:
-                    msg += f" {outcome['deaths']} Baixas: {', '.join(outcome['dead_names'])}."
-                else:
-                    msg += " Sucesso!"
-                context['success_message'] = msg
-            else:
-                context['error_message'] = "Não foi possível resolver o despacho (status inválido)."
-
-        elif action == 'create_quick_mission':
-            # Quick Mission Templates
-            templates = [
-                {"title": "Escolta de Caravana", "desc": "Proteger uma caravana de mercadores viajando por estradas perigosas."},
-                {"title": "Caça aos Goblins", "desc": "Um grupo de goblins está saqueando fazendas próximas. Elimine-os."},
-                {"title": "Entrega Urgente", "desc": "Entregar uma mensagem sigilosa para um nobre em uma cidade vizinha."},
-                {"title": "Investigação na Floresta", "desc": "Lenhadores relataram sons estranhos e luzes na floresta sombria."},
-                {"title": "Limpeza de Porão", "desc": "Ratos gigantes invadiram o porão da taverna local."},
-            ]
-            template = random.choice(templates)
-
-            # Random Rank (weighted towards lower ranks)
-            rank = random.choices(['F', 'E', 'D'], weights=[50, 30, 20], k=1)[0]
-
-            # Calculate Rewards based on Rank
-            gxp = Quest.RANK_GXP_REWARDS.get(rank, 5)
-            gold = gxp * 10  # Simple formula: 1 GXP = 10 Gold
-            duration = random.randint(1, 3)  # 1-3 days for quick missions
-
-            Quest.objects.create(
-                title=template['title'],
-                description=template['desc'],
-                rank=rank,
-                gxp_reward=gxp,
-                gold_reward=gold,
-                duration_days=duration,
-                guild=guild,
-                type=Quest.Type.EXTERNAL,
-                status=Quest.Status.OPEN
-            )
-            context['success_message'] = f"Missão Rápida '{template['title']}' criada com sucesso!"
-
-        elif action == 'create_custom_mission':
-            title = request.POST.get('title')
-            description = request.POST.get('description')
-            rank = request.POST.get('rank')
-            duration_raw = request.POST.get('duration')
-            gold_raw = request.POST.get('reward_gold', 0)
-            gxp_raw = request.POST.get('reward_xp', 0)
-
-            valid_numbers = True
-            try:
-                gold = float(gold_raw)
-                gxp = int(gxp_raw)
-                duration = int(duration_raw)
-            except (ValueError, TypeError):
-                valid_numbers = False
-                context['error_message'] = "Valores numéricos inválidos."
-
-            if valid_numbers and title and description:
-                Quest.objects.create(
-                    title=title,
-                    description=description,
-                    rank=rank,
-                    gxp_reward=gxp,
-                    gold_reward=gold,
-                    duration_days=duration,
-                    guild=guild,
-                    type=Quest.Type.EXTERNAL,
-                    status=Quest.Status.OPEN
-                )
-                context['success_message'] = f"Missão Personalizada '{title}' criada com sucesso!"
-            else:
-                if not context.get('error_message'):
-                     context['error_message'] = "Título e descrição são obrigatórios."
-
-                context['form_data'] = {
-                    'title': title,
-                    'description': description,
-                    'rank': rank,
-                    'duration': duration_raw,
-                    'reward_gold': gold_raw,
-                    'reward_xp': gxp_raw
-                }
-                context['force_tab'] = 'contratos'
-                context['force_mission_view'] = 'custom'
-
-        elif action == 'config':
-            guild.legal_status = request.POST.get('legal_status')
-            guild.moral_alignment = request.POST.get('moral_alignment')
-            guild.save()
-            context['success_message'] = "Configurações da Guilda atualizadas."
-
-        elif action == 'manage_gold':
-            try:
-                amount = float(request.POST.get('amount', 0))
-                operation = request.POST.get('operation')
-
-                if amount < 0:
-                     context['error_message'] = "O valor deve ser positivo."
-                else:
-                    if operation == 'add':
-                        current_funds = guild.funds
-                        max_cap = guild.max_gold_cap
-
-                        if current_funds >= max_cap:
-                             context['error_message'] = "O tesouro já está cheio!"
-                        else:
-                            new_funds = current_funds + Decimal(amount)
-                            if new_funds > max_cap:
-                                guild.funds = max_cap
-                                context['success_message'] = f"Tesouro adicionado. (Limitado ao teto de {max_cap} T$)"
-                            else:
-                                guild.funds = new_funds
-                                context['success_message'] = f"{amount} T$ adicionados ao tesouro."
-                            guild.save()
-
-                    elif operation == 'remove':
-                        current_funds = guild.funds
-                        new_funds = current_funds - Decimal(amount)
-
-                        if new_funds < 0:
-                            guild.funds = 0
-                            context['success_message'] = "Tesouro removido. (Fundos zerados)"
-                        else:
-                            guild.funds = new_funds
-                            context['success_message'] = f"{amount} T$ removidos do tesouro."
-                        guild.save()
-
-            except ValueError:
-                context['error_message'] = "Valor inválido."
-
-        elif action == 'delete_guild':
-            guild.delete()
-            return redirect('entry_portal')
-
-        # --- Squad CRUD ---
-        elif action == 'create_squad':
-            name = request.POST.get('name')
-            if name:
-                # Assign lowest rank by default
-                initial_rank = SquadRank.objects.order_by('order').first()
-                Squad.objects.create(name=name, guild=guild, rank=initial_rank)
-                context['success_message'] = f"Esquadrão {name} criado."
-
-        elif action == 'delete_squad':
-            squad_id = request.POST.get('squad_id')
-            Squad.objects.filter(id=squad_id).delete()
-            context['success_message'] = "Esquadrão removido."
-
-        elif action == 'edit_squad':
-            squad_id = request.POST.get('squad_id')
-            name = request.POST.get('name')
-            rank_id = request.POST.get('rank_id')
-            squad = get_object_or_404(Squad, id=squad_id)
-            if name: squad.name = name
-            if rank_id: squad.rank_id = rank_id
-            squad.save()
-            context['success_message'] = f"Esquadrão {squad.name} atualizado."
-
-        # --- Rank CRUD ---
-        elif action == 'create_rank':
-            name = request.POST.get('name')
-            order = request.POST.get('order')
-            missions = request.POST.get('missions')
-            guild_level = request.POST.get('guild_level')
-
-            if name and order:
-                SquadRank.objects.create(
-                    name=name,
-                    order=order,
-                    missions_required=missions or 0,
-                    min_guild_level=guild_level or 1
-                )
-                context['success_message'] = f"Patente {name} criada."
-
-        elif action == 'delete_rank':
-            rank_id = request.POST.get('rank_id')
-            try:
-                SquadRank.objects.filter(id=rank_id).delete()
-                context['success_message'] = "Patente removida."
-            except Exception as e:
-                context['error_message'] = "Não foi possível remover a patente (pode estar em uso)."
-
-        elif action == 'edit_rank':
-            rank_id = request.POST.get('rank_id')
-            rank_obj = get_object_or_404(SquadRank, id=rank_id)
-            rank_obj.name = request.POST.get('name')
-            rank_obj.order = request.POST.get('order')
-            rank_obj.missions_required = request.POST.get('missions')
-            rank_obj.min_guild_level = request.POST.get('guild_level')
-            rank_obj.save()
-            context['success_message'] = f"Patente {rank_obj.name} atualizada."
-
-        elif action == 'update_hex':
-            try:
-                q = int(request.POST.get('q'))
-                r = int(request.POST.get('r'))
-                title = request.POST.get('title')
-                description = request.POST.get('description')
-                pin_id = request.POST.get('pin_id')
-
-                # Ensure map exists
-                game_map = Map.objects.first()
-                if not game_map:
-                    # Create default if missing (should be handled by setup script but safety first)
-                    game_map = Map.objects.create(name="Reino", background_image="guilda_manager/placeholder.png")
-
-                hex_obj, created = Hexagon.objects.get_or_create(
-                    map=game_map,
-                    q=q,
-                    r=r
-                )
-
-                hex_obj.title = title
-                hex_obj.description = description
-
-                if pin_id:
-                    hex_obj.pin = Pin.objects.get(id=pin_id)
-                else:
-                    hex_obj.pin = None
-
-                hex_obj.save()
-                context['success_message'] = f"Hexágono ({q}, {r}) atualizado com sucesso."
-                context['force_tab'] = 'mapa'
-
-            except (ValueError, Pin.DoesNotExist):
-                context['error_message'] = "Erro ao atualizar hexágono. Dados inválidos."
-
-        elif action == 'upload_map':
-            if 'map_image' in request.FILES:
-                image_file = request.FILES['map_image']
-
-                game_map = Map.objects.first()
-                if not game_map:
-                    game_map = Map(name="Reino")
-
-                game_map.background_image = image_file
-                game_map.save()
-                context['success_message'] = "Imagem do mapa atualizada com sucesso!"
-                context['force_tab'] = 'mapa'
-            else:
-                context['error_message'] = "Nenhuma imagem selecionada."
-
-        elif action == 'create_pin':
-            name = request.POST.get('name')
-            glb_path = request.POST.get('glb_path')
-            if name and glb_path:
-                Pin.objects.create(name=name, glb_path=glb_path)
-                context['success_message'] = f"Pin '{name}' criado com sucesso."
-                context['force_tab'] = 'mapa'
-            else:
-                context['error_message'] = "Nome e modelo são obrigatórios."
-
-        elif action == 'delete_pin':
-            pin_id = request.POST.get('pin_id')
-            try:
-                Pin.objects.filter(id=pin_id).delete()
-                context['success_message'] = "Pin removido com sucesso."
-                context['force_tab'] = 'mapa'
-            except Exception:
-                context['error_message'] = "Erro ao remover pin."
-
-        elif action == 'move_party':
-            try:
-                q = int(request.POST.get('q'))
-                r = int(request.POST.get('r'))
-                guild.party_q = q
-                guild.party_r = r
-                guild.save()
-
-                # AJAX Handling
-                if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-                    from django.http import JsonResponse
-                    return JsonResponse({'success': True, 'q': q, 'r': r, 'message': "Comitiva movida com sucesso."})
-
-                context['success_message'] = "A comitiva moveu-se para um novo local."
-                context['force_tab'] = 'mapa'
-            except (ValueError, TypeError):
-                msg = "Coordenadas inválidas para mover a comitiva."
-                if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-                    from django.http import JsonResponse
-                    return JsonResponse({'success': False, 'error': msg})
-                context['error_message'] = msg
+        result = run_action(request.POST.get('action'), guild, request.POST, request.FILES)
+        if result is not None:
+            if result.redirect:
+                return redirect(result.redirect)
+            # Legacy AJAX callers of this URL get the same JSON as mestre_action_view
+            if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+                return JsonResponse(result.as_json())
+            if result.message:
+                context['success_message'] = result.message
+            if result.error:
+                context['error_message'] = result.error
+            context.update(result.context)
 
     # Data for Template
     squads = Squad.objects.select_related('rank').all().order_by('-rank__order', 'name')
@@ -1008,35 +640,21 @@ def mestre_view(request):
         if r not in quest_stats:
             quest_stats[r] = 0
 
-    # Map Data for Mestre View
+    # Map Data for Mestre View (hex details come from /api/hex-regions/)
     game_map = Map.objects.first()
-    map_hexes = []
     map_image_url = static('guilda_manager/placeholder.png')
+    map_background = None
 
-    # Need full hex details for editing
     if game_map:
         if game_map.background_image and game_map.background_image.name != 'guilda_manager/placeholder.png':
-             map_image_url = game_map.background_image.url
-
-        hexes = Hexagon.objects.filter(map=game_map).select_related('pin')
-        for h in hexes:
-            map_hexes.append({
-                'q': h.q,
-                'r': h.r,
-                'title': h.title,
-                'description': h.description,
-                'pin_id': h.pin.id if h.pin else None,
-                'pin_name': h.pin.name if h.pin else None
-            })
+             # Processed level (and tiles) instead of the uploaded photo
+             map_background = background_for(game_map, MESTRE_MAP_SIZE)
+             map_image_url = map_background['url']
 
     pins = Pin.objects.all().order_by('name')
 
-    # List available GLB files for pins
-    pins_dir = os.path.join(settings.BASE_DIR, 'guilda_manager/static/guilda_manager/pins')
-    available_pins = []
-    if os.path.exists(pins_dir):
-        available_pins = [f for f in os.listdir(pins_dir) if f.lower().endswith('.glb')]
-    available_pins.sort()
+    # GLB files available for pins (cached catalog, no filesystem access per request)
+    available_pins = PinCatalog.entries()
 
     context.update({
         'guild': guild,
@@ -1052,36 +670,55 @@ def mestre_view(request):
         'moral_alignments': Guild.MoralAlignment.choices,
         'now': timezone.now(),
         'game_map': game_map,
-        'map_hexes': map_hexes,
-        'map_image_url': map_image_url
+        'map_image_url': map_image_url,
+        'map_background': map_background,
+        'region_url': lazy_urls.reverse('hex-region-list'),
     })
 
     return render(request, 'guilda_manager/mestre.html', context)
 
+@require_POST
+def mestre_action_view(request, action):
+    """
+    Runs one console action and answers with JSON holding only what it
+    changed, so mestre.html updates in place instead of reloading the page.
+    """
+    guild = Guild.objects.first()
+    if not guild:
+        return JsonResponse({'success': False, 'error': "Nenhuma guilda encontrada."}, status=404)
+
+    try:
+        result = run_action(action, guild, request.POST, request.FILES)
+    except Http404:
+        return JsonResponse({'success': False, 'error': "Registro não encontrado."}, status=404)
+    if result is None:
+        return JsonResponse({'success': False, 'error': "Ação desconhecida."}, status=404)
+
+    payload = result.as_json()
+    if result.redirect:
+        payload['redirect'] = reverse(result.redirect)
+    return JsonResponse(payload, status=200 if result.error is None else 400)
+
 
 def mapa_view(request):
     game_map = Map.objects.first()
     guild = Guild.objects.first() # Ensure guild is available
-    locations = []
     map_image_url = static('guilda_manager/placeholder.png')
+    map_background = None
 
+    # Hexes are streamed by the page from /api/hex-regions/ as the camera pans
     if game_map:
         if game_map.background_image and game_map.background_image.name != 'guilda_manager/placeholder.png':
-             map_image_url = game_map.background_image.url
-
-        hexes = Hexagon.objects.filter(map=game_map).select_related('pin')
-        for h in hexes:
-            loc = {
-                'q': h.q,
-                'r': h.r,
-                'title': h.title,
-                'description': h.description,
-            }
-            if h.pin:
-                loc['model'] = h.pin.glb_path
-            locations.append(loc)
-
-    context = {'locations': locations, 'map_image_url': map_image_url}
+             # Texture-sized level and precomputed fog palette (map_images.py)
+             map_background = background_for(game_map)
+             map_image_url = map_background['url']
+
+    context = {
+        'map_image_url': map_image_url,
+        'map_background': map_background,
+        # The API URLconf may still be deferred on a cold start
+        'region_url': lazy_urls.reverse('hex-region-list'),
+    }
     if game_map:
         context['map'] = game_map
     if guild: